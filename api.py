@@ -3,39 +3,92 @@
 Flask API for processing Excel files and returning resume data
 """
 
-from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
+from flask import Flask, Request, request, jsonify, send_from_directory, Response, stream_with_context
 import os
+import base64
 import tempfile
 import json
+import threading
 import time
-from werkzeug.utils import secure_filename
-from get_all_resumen import get_all_resumen, get_all_resumen_text_only, get_all_resumen_with_details
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from get_all_resumen import resumen_items, resumen_text_items, resumen_detail_items
 from gpt_matcher import GPTConstructionMatcher
+from openai import OpenAI
+from parse_cache import ParseCache
+from parse_jobs import ParseJobManager
+from session_backends import open_backend
+from session_store import SessionStore
+from upload_cache import UploadCache
+from warmup import Warmup
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+class UploadRequest(Request):
+    """Request whose uploaded files stay in memory up to UPLOAD_SPOOL_MB"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Werkzeug spills uploads above 500KB to disk, keep them in memory
+        # instead; only uploads above the spool size go to one temporary file
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MB * 1024 * 1024, mode='rb+')
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 
 # Configuration
 DATABASE_PATH = os.getenv('DATABASE_PATH', '/Users/danielsamuel/PycharmProjects/RAG/correct_sample/DATABSE.xlsx')
+# Several workbooks (e.g. regional databases) are listed separated by os.pathsep:
+# they are parsed concurrently at start-up and searched as one database
+DATABASE_PATHS = DATABASE_PATH.split(os.pathsep)
+DATABASE = DATABASE_PATHS if len(DATABASE_PATHS) > 1 else DATABASE_PATH
 MATERIALS_LIST_PATH = os.getenv('MATERIALS_LIST_PATH', '/Users/danielsamuel/PycharmProjects/RAG/materials_list.txt')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 UPLOAD_FOLDER = tempfile.gettempdir()
 
-# Session storage for uploaded materials lists
-# In production, use Redis or database
-uploaded_lists = {}
+# Uploads up to UPLOAD_SPOOL_MB are parsed from memory, larger ones (up to
+# MAX_UPLOAD_MB) from a single spooled temporary file, never both at once
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', '128'))
+UPLOAD_SPOOL_MB = int(os.getenv('UPLOAD_SPOOL_MB', '32'))
+
+# Descriptions of one /api/search/batch request matched at a time, and at most per request
+SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', '8'))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+
+# Seconds between keep-alive writes while a search waits on GPT: writing is how
+# a closed connection is noticed, and the search then cancels its GPT call
+SEARCH_HEARTBEAT_SECONDS = float(os.getenv('SEARCH_HEARTBEAT_SECONDS', '1'))
+SSE_HEARTBEAT = ': keep-alive\n\n'
+
+# Where uploaded materials lists live: 'local' (this process only),
+# 'sqlite:///path/sessions.db' (processes of one host) or 'redis://host:6379/0'
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'local')
+
+# Parsed uploads by content hash, shared by the three /api/upload endpoints
+upload_cache = UploadCache()
+
+# Background parses of uploads (/api/jobs), in worker processes
+parse_jobs = ParseJobManager(upload_cache=upload_cache)
 
 # Initialize GPT matcher (will be lazy-loaded)
 gpt_matcher = None
 materials_list_text = None
+openai_client = None
+
+# Serializes the lazy loads, so the warm-up and early requests build each object once
+init_lock = threading.RLock()
+
+# Chapter tree of the default database (lazy-loaded)
+chapter_index = None
+chapter_material_codes = None
 
 # Configure upload settings
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'bc3'}
 ALLOWED_TEXT_EXTENSIONS = {'txt'}
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
 
 
 def allowed_file(filename):
@@ -48,100 +101,377 @@ def allowed_text_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_TEXT_EXTENSIONS
 
 
-def load_materials_list():
-    """Load the materials list text file"""
+def database_available():
+    """True if every workbook of the default database exists (it is optional)"""
+    return all(os.path.exists(path) for path in DATABASE_PATHS)
+
+
+def load_materials_list(progress=None):
+    """Load the materials list text file, brought up to date with the database first"""
     global materials_list_text
-    if materials_list_text is None:
-        if not os.path.exists(MATERIALS_LIST_PATH):
-            # Generate it if it doesn't exist
-            from generate_materials_list import generate_materials_text_file
-            generate_materials_text_file(DATABASE_PATH, MATERIALS_LIST_PATH)
-        
-        with open(MATERIALS_LIST_PATH, 'r', encoding='utf-8') as f:
-            materials_list_text = f.read()
+    with init_lock:
+        if materials_list_text is None:
+            if not os.path.exists(MATERIALS_LIST_PATH):
+                from generate_materials_list import update_materials_text_file
+                update_materials_text_file(DATABASE, MATERIALS_LIST_PATH, progress=progress)
+            elif database_available():
+                if os.access(MATERIALS_LIST_PATH, os.W_OK):
+                    # Only the entries changed since the database version it was built from are rewritten
+                    from generate_materials_list import update_materials_text_file
+                    try:
+                        update_materials_text_file(DATABASE, MATERIALS_LIST_PATH, progress=progress)
+                    except OSError as e:
+                        print(f"Could not update {MATERIALS_LIST_PATH}, using it as is: {e}")
+                else:
+                    # e.g. mounted read-only (see docker-compose.yml)
+                    print(f"{MATERIALS_LIST_PATH} is read-only, using it as is")
+            
+            with open(MATERIALS_LIST_PATH, 'r', encoding='utf-8') as f:
+                materials_list_text = f.read()
     
     return materials_list_text
 
 
-def get_gpt_matcher():
+def get_openai_client():
+    """Lazy-load the OpenAI client shared by all matchers"""
+    global openai_client
+    if openai_client is None:
+        openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return openai_client
+
+
+def get_gpt_matcher(progress=None):
     """Lazy-load and return the GPT matcher"""
     global gpt_matcher
     if gpt_matcher is None:
-        gpt_matcher = GPTConstructionMatcher(
-            api_key=OPENAI_API_KEY,
-            model="gpt-4.1-2025-04-14"
-        )
-        # Load materials list
-        list_text = load_materials_list()
-        gpt_matcher.parse_list(list_text)
+        with init_lock:
+            if gpt_matcher is None:
+                matcher = GPTConstructionMatcher(
+                    api_key=OPENAI_API_KEY,
+                    model="gpt-4.1-2025-04-14",
+                    client=get_openai_client()
+                )
+                # Load materials list
+                list_text = load_materials_list(progress)
+                matcher.parse_list(list_text)
+                # Published once parsed, other threads never see an empty matcher
+                gpt_matcher = matcher
     return gpt_matcher
 
 
-@app.route('/api/upload', methods=['POST'])
-def upload_file():
+def new_session_matcher():
+    """Empty matcher for an uploaded materials list"""
+    return GPTConstructionMatcher(api_key=OPENAI_API_KEY, model="gpt-4o", client=get_openai_client())
+
+
+# Uploaded materials lists, parsed once and kept with their matcher
+# (bounded by SESSION_STORE_SIZE, SESSION_TTL and SESSION_STORE_MB),
+# shared between workers through SESSION_BACKEND
+session_store = SessionStore(new_session_matcher, backend=open_backend(SESSION_BACKEND))
+
+
+def get_chapter_index(progress=None):
+    """Lazy-load the chapter tree of the default database and the códigos of its materials"""
+    global chapter_index, chapter_material_codes
+    if chapter_index is None:
+        with init_lock:
+            if chapter_index is None:
+                materials, index = ParseCache().load_indexed_materials(DATABASE, progress=progress)
+                chapter_material_codes = [m.codigo for m in materials]
+                chapter_index = index
+    return chapter_index
+
+
+def get_chapter_materials(chapter):
     """
-    Upload an Excel file and get all resume data as text
+    Return the materials in a chapter (including sub-chapters)
+    
+    Materials are identified by position rather than código alone, since a
+    código can be listed in several chapters: the set holds (number, código)
+    pairs, number being the 1-based entry of the materials list.
+    """
+    index = get_chapter_index()
+    return {(i + 1, chapter_material_codes[i]) for i in index.materials_in(chapter)}
+
+
+def warm_chapter_index(progress=None):
+    """Build the chapter index when the default database is available"""
+    if database_available():
+        get_chapter_index(progress)
+
+
+# Builds the default catalog and indexes at start-up, /api/ready reports it
+warmup = Warmup([
+    ('catalog', get_gpt_matcher),
+    ('chapter_index', warm_chapter_index),
+])
+
+
+def preload():
+    """
+    Build the default materials list, its matcher and the chapter index now
+    rather than on the first search (see wsgi.py)
+    
+    A failed warm-up does not stop the server: uploads keep being served,
+    /api/ready answers 503 and each probe tries the warm-up again.
     
     Returns:
-        JSON response with resume data formatted as text
+        True if search is warm
+    """
+    if not warmup.run():
+        print(f"Warm-up failed, search is unavailable until it succeeds: {warmup.error}")
+        return False
+    print(f"Preloaded {len(gpt_matcher.items)} materials from {MATERIALS_LIST_PATH}")
+    if chapter_index is not None:
+        print(f"Preloaded the chapter index of {DATABASE_PATH} ({len(chapter_index.chapters)} chapters)")
+    return True
+
+
+def parse_upload(file):
+    """
+    Parse an uploaded database straight from its upload stream
+    
+    The stream is seekable (see UploadRequest), and its filename picks the
+    parser, so no copy is written to disk. Uploads with the same bytes are
+    parsed once and served from upload_cache by every upload endpoint.
+    
+    Returns:
+        Tuple of (upload id, materials), the id reads them again from /api/uploads/<upload_id>
+    """
+    return upload_cache.load(file)
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """JSON error for uploads above MAX_CONTENT_LENGTH"""
+    return jsonify({'error': f'File too large. Maximum upload size is {MAX_UPLOAD_MB} MB'}), 413
+
+
+def get_upload_file():
+    """
+    Validate the 'file' part of an upload request
+    
+    Returns:
+        Tuple of (file, None), or (None, error response) when it is missing or not allowed
     """
     # Check if file is present
     if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+        return None, (jsonify({'error': 'No file provided'}), 400)
     
     file = request.files['file']
     
     # Check if file is selected
     if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+        return None, (jsonify({'error': 'No file selected'}), 400)
     
     # Check if file type is allowed
     if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed. Please upload .xlsx or .xls file'}), 400
+        return None, (jsonify({'error': 'File type not allowed. Please upload .xlsx, .xls or .bc3 file'}), 400)
     
-    try:
-        # Save file to temporary location
-        filename = secure_filename(file.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            temp_path = tmp_file.name
-            file.save(temp_path)
-        
-        # Process the file
-        resumenes = get_all_resumen(temp_path)
-        
-        # Format as text
-        text_output = []
-        text_output.append(f"Total materials: {len(resumenes)}")
-        text_output.append("=" * 80)
+    return file, None
+
+
+def format_resumen_text(resumenes, total=None, start=1):
+    """Text output of /api/upload"""
+    text_output = []
+    text_output.append(f"Total materials: {len(resumenes) if total is None else total}")
+    text_output.append("=" * 80)
+    text_output.append("")
+    
+    for i, item in enumerate(resumenes, start):
+        text_output.append(f"{i}. Codigo: {item['codigo']}")
+        text_output.append(f"   Resumen: {item['resumen']}")
         text_output.append("")
+    
+    return "\n".join(text_output)
+
+
+def format_text_only_text(resumen_texts, total=None, start=1):
+    """Text output of /api/upload/text-only"""
+    text_output = []
+    text_output.append(f"Total materials: {len(resumen_texts) if total is None else total}")
+    text_output.append("=" * 80)
+    text_output.append("")
+    
+    for i, resumen in enumerate(resumen_texts, start):
+        text_output.append(f"{i}. {resumen}")
+        text_output.append("")
+    
+    return "\n".join(text_output)
+
+
+def format_details_text(resumen_details, total=None, start=1):
+    """Text output of /api/upload/details"""
+    text_output = []
+    text_output.append(f"Total materials: {len(resumen_details) if total is None else total}")
+    text_output.append("=" * 80)
+    text_output.append("")
+    
+    for i, item in enumerate(resumen_details, start):
+        text_output.append(f"{i}. Codigo: {item['codigo']}")
+        text_output.append(f"   Tipo: {item['tipo']}")
+        text_output.append(f"   Unidad: {item['ud']}")
+        text_output.append(f"   Resumen: {item['resumen']}")
+        text_output.append(f"   Precio: {item['precio']}€")
+        text_output.append(f"   Sub-materials: {item['num_sub_materials']}")
+        text_output.append("")
+    
+    return "\n".join(text_output)
+
+
+# Upload views: projection of the parsed materials, its text output and
+# the fields of its items (text-only items are plain strings)
+UPLOAD_VIEWS = {
+    'resumen': (resumen_items, format_resumen_text, ('codigo', 'resumen')),
+    'text-only': (resumen_text_items, format_text_only_text, ()),
+    'details': (resumen_detail_items, format_details_text,
+                ('codigo', 'tipo', 'ud', 'resumen', 'precio', 'num_sub_materials')),
+}
+
+# Largest page of a paged upload response
+MAX_PAGE_SIZE = 5000
+
+# Materials projected at a time while streaming NDJSON
+NDJSON_CHUNK_SIZE = 500
+
+
+def encode_cursor(offset):
+    """Opaque cursor pointing at the material after the current page"""
+    return base64.urlsafe_b64encode(f'offset:{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Offset of a cursor made by encode_cursor"""
+    try:
+        kind, offset = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+        if kind != 'offset' or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+
+def get_upload_options(view):
+    """
+    Paging, field and format options of an upload request
+    
+    Read from the query string or the form fields sent with the file:
+        - limit: Page size (default: all materials, at most MAX_PAGE_SIZE when given)
+        - cursor: next_cursor of the previous page
+        - fields: Comma-separated item fields to return (not for text-only)
+        - text: '0' leaves out the text output
+        - format: 'json' (default) or 'ndjson' to stream one item per line
+    
+    Raises:
+        ValueError: If an option is invalid
+    """
+    values = request.values
+    options = {
+        'offset': decode_cursor(values['cursor']) if values.get('cursor') else 0,
+        'limit': None,
+        'fields': None,
+        'text': values.get('text', '1').lower() not in ('0', 'false', 'no'),
+        'format': values.get('format', 'json'),
+    }
+    
+    if values.get('limit'):
+        try:
+            options['limit'] = int(values['limit'])
+        except ValueError:
+            raise ValueError(f"Invalid limit: {values['limit']}")
+        if not 1 <= options['limit'] <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    
+    if values.get('fields'):
+        options['fields'] = [name.strip() for name in values['fields'].split(',') if name.strip()]
+        unknown = [name for name in options['fields'] if name not in UPLOAD_VIEWS[view][2]]
+        if unknown:
+            raise ValueError(f"Unknown fields for view {view}: {', '.join(unknown)}")
+    
+    if options['format'] not in ('json', 'ndjson'):
+        raise ValueError(f"Unknown format: {options['format']}")
+    
+    return options
+
+
+def upload_view_response(view, materials, upload_id, options):
+    """
+    Answer with one page (or all) of an upload view
+    
+    Only the requested page is projected, and NDJSON is streamed in chunks,
+    so a large database never becomes one big response body in memory.
+    """
+    project, format_text, _ = UPLOAD_VIEWS[view]
+    total = len(materials)
+    offset = min(options['offset'], total)
+    end = total if options['limit'] is None else min(total, offset + options['limit'])
+    next_cursor = encode_cursor(end) if end < total else None
+    
+    def select(item):
+        if options['fields'] is None:
+            return item
+        return {name: item[name] for name in options['fields']}
+    
+    if options['format'] == 'ndjson':
+        def generate():
+            for start in range(offset, end, NDJSON_CHUNK_SIZE):
+                for item in project(materials[start:min(end, start + NDJSON_CHUNK_SIZE)]):
+                    yield json.dumps(select(item), ensure_ascii=False) + '\n'
         
-        for i, item in enumerate(resumenes, 1):
-            text_output.append(f"{i}. Codigo: {item['codigo']}")
-            text_output.append(f"   Resumen: {item['resumen']}")
-            text_output.append("")
-        
-        result_text = "\n".join(text_output)
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
-        
-        return jsonify({
-            'success': True,
-            'count': len(resumenes),
-            'text': result_text,
-            'data': resumenes
-        }), 200
+        headers = {'X-Total-Count': str(total)}
+        if upload_id:
+            headers['X-Upload-Id'] = upload_id
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=headers)
+    
+    data = project(materials[offset:end])
+    body = {
+        'success': True,
+        'count': total,
+        'upload_id': upload_id,
+        'offset': offset,
+        'next_cursor': next_cursor,
+    }
+    if options['text']:
+        body['text'] = format_text(data, total=total, start=offset + 1)
+    body['data'] = [select(item) for item in data]
+    return jsonify(body), 200
+
+
+def upload_response(view):
+    """Parse the uploaded file and answer with one upload view"""
+    file, error = get_upload_file()
+    if error:
+        return error
+    
+    try:
+        options = get_upload_options(view)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Process the file straight from the upload stream
+        upload_id, materials = parse_upload(file)
+        return upload_view_response(view, materials, upload_id, options)
         
     except Exception as e:
-        # Clean up temporary file if it exists
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        
         return jsonify({
             'error': f'Error processing file: {str(e)}'
         }), 500
 
 
+@app.route('/api/upload', methods=['POST'])
+def upload_file():
+    """
+    Upload an Excel file and get all resume data as text
+    
+    Returns:
+        JSON response with resume data formatted as text
+    """
+    return upload_response('resumen')
+
+
 @app.route('/api/upload/text-only', methods=['POST'])
 def upload_file_text_only():
     """
@@ -150,129 +480,120 @@ def upload_file_text_only():
     Returns:
         JSON response with resume text only
     """
-    # Check if file is present
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
+    return upload_response('text-only')
+
+
+@app.route('/api/upload/details', methods=['POST'])
+def upload_file_with_details():
+    """
+    Upload an Excel file and get all resume data with full details
     
-    # Check if file is selected
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    Returns:
+        JSON response with complete material details
+    """
+    return upload_response('details')
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_parse_job():
+    """
+    Upload a database and parse it in the background
     
-    # Check if file type is allowed
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed. Please upload .xlsx or .xls file'}), 400
+    Returns:
+        202 with the job id, poll /api/jobs/<job_id> for progress
+    """
+    file, error = get_upload_file()
+    if error:
+        return error
     
     try:
-        # Save file to temporary location
-        filename = secure_filename(file.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            temp_path = tmp_file.name
-            file.save(temp_path)
-        
-        # Process the file
-        resumen_texts = get_all_resumen_text_only(temp_path)
-        
-        # Format as text
-        text_output = []
-        text_output.append(f"Total materials: {len(resumen_texts)}")
-        text_output.append("=" * 80)
-        text_output.append("")
-        
-        for i, resumen in enumerate(resumen_texts, 1):
-            text_output.append(f"{i}. {resumen}")
-            text_output.append("")
-        
-        result_text = "\n".join(text_output)
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
-        
-        return jsonify({
-            'success': True,
-            'count': len(resumen_texts),
-            'text': result_text,
-            'data': resumen_texts
-        }), 200
-        
+        job = parse_jobs.submit(file, file.filename)
     except Exception as e:
-        # Clean up temporary file if it exists
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        
         return jsonify({
-            'error': f'Error processing file: {str(e)}'
+            'error': f'Error starting parse job: {str(e)}'
         }), 500
+    
+    return jsonify(dict(job.to_dict(), success=True)), 202
 
 
-@app.route('/api/upload/details', methods=['POST'])
-def upload_file_with_details():
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def parse_job_status(job_id):
     """
-    Upload an Excel file and get all resume data with full details
+    Status and progress of a parse job
     
     Returns:
-        JSON response with complete material details
+        JSON with status ('queued', 'running', 'done', 'failed'), the last
+        progress event (phase, rows, rows_per_sec) and the material count
     """
-    # Check if file is present
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+    job = parse_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def parse_job_result(job_id):
+    """
+    Result of a finished parse job
     
-    file = request.files['file']
+    Query parameters:
+        view: 'resumen' (default), 'text-only' or 'details', same bodies as
+            /api/upload, /api/upload/text-only and /api/upload/details
+        limit, cursor, fields, text, format: Paging and format options (see get_upload_options)
     
-    # Check if file is selected
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    Returns:
+        JSON result, 409 while the job is still running, 404 once the result
+        left the upload cache
+    """
+    job = parse_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
     
-    # Check if file type is allowed
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed. Please upload .xlsx or .xls file'}), 400
+    view = request.args.get('view', 'resumen')
+    if view not in UPLOAD_VIEWS:
+        return jsonify({'error': f'Unknown view: {view}'}), 400
+    try:
+        options = get_upload_options(view)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if job.status == 'failed':
+        return jsonify({'error': f'Error processing file: {job.error}'}), 500
+    if job.status != 'done':
+        return jsonify(dict(job.to_dict(), error='Job not finished yet')), 409
+    
+    materials = parse_jobs.result(job)
+    if materials is None:
+        return jsonify({'error': 'Job result expired, please upload the file again'}), 404
+    
+    return upload_view_response(view, materials, job.key, options)
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def uploaded_materials(upload_id):
+    """
+    Read a previous upload again, e.g. its next page, without re-sending the file
+    
+    Query parameters:
+        view: 'resumen' (default), 'text-only' or 'details'
+        limit, cursor, fields, text, format: Paging and format options (see get_upload_options)
     
+    Returns:
+        Same JSON as the matching /api/upload endpoint, 404 once the upload left the cache
+    """
+    view = request.args.get('view', 'resumen')
+    if view not in UPLOAD_VIEWS:
+        return jsonify({'error': f'Unknown view: {view}'}), 400
     try:
-        # Save file to temporary location
-        filename = secure_filename(file.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            temp_path = tmp_file.name
-            file.save(temp_path)
-        
-        # Process the file
-        resumen_details = get_all_resumen_with_details(temp_path)
-        
-        # Format as text
-        text_output = []
-        text_output.append(f"Total materials: {len(resumen_details)}")
-        text_output.append("=" * 80)
-        text_output.append("")
-        
-        for i, item in enumerate(resumen_details, 1):
-            text_output.append(f"{i}. Codigo: {item['codigo']}")
-            text_output.append(f"   Tipo: {item['tipo']}")
-            text_output.append(f"   Unidad: {item['ud']}")
-            text_output.append(f"   Resumen: {item['resumen']}")
-            text_output.append(f"   Precio: {item['precio']}€")
-            text_output.append(f"   Sub-materials: {item['num_sub_materials']}")
-            text_output.append("")
-        
-        result_text = "\n".join(text_output)
-        
-        # Clean up temporary file
-        os.unlink(temp_path)
-        
-        return jsonify({
-            'success': True,
-            'count': len(resumen_details),
-            'text': result_text,
-            'data': resumen_details
-        }), 200
-        
-    except Exception as e:
-        # Clean up temporary file if it exists
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        
-        return jsonify({
-            'error': f'Error processing file: {str(e)}'
-        }), 500
+        options = get_upload_options(view)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    materials = upload_cache.get(upload_id)
+    if materials is None:
+        return jsonify({'error': 'Unknown or expired upload, please upload the file again'}), 404
+    
+    return upload_view_response(view, materials, upload_id, options)
 
 
 @app.route('/api/upload-list', methods=['POST'])
@@ -301,25 +622,19 @@ def upload_materials_list():
         # Read file content
         content = file.read().decode('utf-8')
         
-        # Generate session ID
-        import uuid
-        session_id = str(uuid.uuid4())
-        
-        # Store in memory (in production, use Redis or database)
-        uploaded_lists[session_id] = content
+        # Parse once, searches on the session reuse the parsed items
+        try:
+            catalog = session_store.create(content)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
         
-        # Parse to count materials
-        lines = content.split('\n')
-        material_count = 0
-        for line in lines:
-            line = line.strip()
-            if line and line[0].isdigit() and '.' in line:
-                material_count += 1
+        material_count = len(catalog.items)
         
         return jsonify({
             'success': True,
-            'session_id': session_id,
+            'session_id': catalog.id,
             'material_count': material_count,
+            'expires_in': session_store.ttl,
             'message': f'Loaded {material_count} materials successfully'
         }), 200
         
@@ -329,6 +644,101 @@ def upload_materials_list():
         }), 500
 
 
+def get_search_scope(session_id, chapter):
+    """
+    Uploaded list and chapter filter of a search
+    
+    Returns:
+        Tuple of (session catalog or None for the default list,
+        set of chapter materials or None, see get_chapter_materials)
+    
+    Raises:
+        ValueError: If the chapter is unknown, or combined with an uploaded list
+    """
+    # Uploaded list of the session, the default list when unknown or expired
+    catalog = session_store.get(session_id) if session_id else None
+    
+    # Restrict candidates to one chapter of the default database
+    chapter_materials = None
+    if chapter:
+        if catalog is not None:
+            raise ValueError('Chapter filtering is only available for the default database')
+        chapter_materials = get_chapter_materials(chapter)
+    
+    return catalog, chapter_materials
+
+
+# Outcomes of searches: completed, failed or cancelled (client gone before the answer)
+search_outcomes = Counter()
+search_outcomes_lock = threading.Lock()
+
+
+def record_search(outcome, query, started, count=1):
+    """Count the outcome of searches, logging the cancelled ones"""
+    with search_outcomes_lock:
+        search_outcomes[outcome] += count
+    if outcome == 'cancelled':
+        print(f"Search cancelled after {time.time() - started:.1f}s, client disconnected: {query[:80]!r}")
+
+
+def wait_for_search(future, heartbeat):
+    """
+    Wait for a search running in another thread, yielding heartbeat every
+    SEARCH_HEARTBEAT_SECONDS meanwhile (use with 'yield from')
+    
+    Returns:
+        The search result
+    """
+    while True:
+        try:
+            return future.result(timeout=SEARCH_HEARTBEAT_SECONDS)
+        except FutureTimeoutError:
+            yield heartbeat
+
+
+def format_search_result(description, result):
+    """
+    Final payload of one search: text output and matches (confidence on a 0-1 scale)
+    
+    Args:
+        description: Searched description
+        result: find_best_match result without an error
+    """
+    # Format as text
+    text_output = []
+    text_output.append(f"Search query: {description}")
+    text_output.append(f"Found {len(result['matches'])} matching materials")
+    text_output.append("=" * 80)
+    text_output.append("")
+    
+    # Prepare results data
+    results_data = []
+    for i, match in enumerate(result['matches'], 1):
+        text_output.append(f"{i}. Codigo: {match['code']}")
+        text_output.append(f"   Description: {match['description']}")
+        text_output.append(f"   Confidence Score: {match['confidence_score']}/100")
+        text_output.append(f"   Reasoning: {match['reasoning']}")
+        text_output.append("")
+        
+        results_data.append({
+            'number': match['number'],
+            'codigo': match['code'],
+            'resumen': match['description'],
+            'confidence_score': match['confidence_score'] / 100,  # Convert to 0-1 scale
+            'reasoning': match['reasoning']
+        })
+    
+    return {
+        'success': True,
+        'query': description,
+        'count': len(results_data),
+        'text': "\n".join(text_output),
+        'data': results_data,
+        'model_used': result.get('model_used', 'gpt-4o'),
+        'total_tokens': result.get('total_tokens', 0)
+    }
+
+
 @app.route('/api/search', methods=['POST'])
 def search_materials():
     """
@@ -339,6 +749,7 @@ def search_materials():
         - description: Text description to search for
         - top_k: Number of results to return (default: 5)
         - session_id: Session ID from materials list upload (optional)
+        - chapter: Chapter código to restrict the search to (optional, default database only)
     
     Returns:
         Server-Sent Events stream with progress and final results
@@ -352,91 +763,289 @@ def search_materials():
     description = data.get('description', '').strip()
     top_k = data.get('top_k', 5)
     session_id = data.get('session_id', None)
+    chapter = data.get('chapter', None)
     
     if not description:
         return jsonify({'error': 'Description cannot be empty'}), 400
     
+    try:
+        catalog, chapter_materials = get_search_scope(session_id, chapter)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error preparing the search: {str(e)}'}), 500
+    
     def generate():
         """Generator function to stream progress"""
+        started = time.time()
+        cancel = threading.Event()
+        # Left as is when the client disconnects and the generator is closed at a yield
+        outcome = 'cancelled'
         try:
             # Step 1: Initialize
             yield f"data: {json.dumps({'type': 'log', 'message': '🔧 Initializing GPT matcher...', 'step': 1, 'total': 3})}\n\n"
             
             # Check if using uploaded list or default
-            if session_id and session_id in uploaded_lists:
-                # Use uploaded list
-                list_text = uploaded_lists[session_id]
-                matcher = GPTConstructionMatcher(api_key=OPENAI_API_KEY, model="gpt-4o")
-                matcher.parse_list(list_text)
+            if catalog is not None:
+                # Use uploaded list, already parsed
+                matcher = catalog.matcher
             else:
                 # Use default list
                 matcher = get_gpt_matcher()
             
-            yield f"data: {json.dumps({'type': 'log', 'message': f'✅ Loaded {len(matcher.items)} materials', 'step': 2, 'total': 3})}\n\n"
+            candidates = matcher.items
+            if chapter_materials is not None:
+                candidates = [item for item in matcher.items if (item.number, item.code) in chapter_materials]
+                yield f"data: {json.dumps({'type': 'log', 'message': f'✅ Loaded {len(candidates)} materials in chapter {chapter}', 'step': 2, 'total': 3})}\n\n"
+            else:
+                yield f"data: {json.dumps({'type': 'log', 'message': f'✅ Loaded {len(matcher.items)} materials', 'step': 2, 'total': 3})}\n\n"
+            
+            if not candidates:
+                outcome = 'failed'
+                yield f"data: {json.dumps({'type': 'error', 'message': f'Error: No materials found in chapter {chapter}'})}\n\n"
+                return
             
             # Step 2: Call GPT (this is where the actual work happens)
             yield f"data: {json.dumps({'type': 'log', 'message': '🤖 Querying GPT-4o...', 'step': 3, 'total': 3})}\n\n"
             
-            result = matcher.find_best_match(description, top_k=top_k)
+            # GPT runs in its own thread while this one keeps writing heartbeats
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search')
+            future = executor.submit(matcher.find_best_match, description, top_k, candidates, None, cancel)
+            executor.shutdown(wait=False)
+            result = yield from wait_for_search(future, SSE_HEARTBEAT)
             
             if 'error' in result:
+                outcome = 'failed'
                 error_msg = f"Error: {result['error']}"
                 yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
                 return
             
-            # Format as text
-            text_output = []
-            text_output.append(f"Search query: {description}")
-            text_output.append(f"Found {len(result['matches'])} matching materials")
-            text_output.append("=" * 80)
-            text_output.append("")
-            
-            # Prepare results data
-            results_data = []
-            for i, match in enumerate(result['matches'], 1):
-                text_output.append(f"{i}. Codigo: {match['code']}")
-                text_output.append(f"   Description: {match['description']}")
-                text_output.append(f"   Confidence Score: {match['confidence_score']}/100")
-                text_output.append(f"   Reasoning: {match['reasoning']}")
-                text_output.append("")
-                
-                results_data.append({
-                    'number': match['number'],
-                    'codigo': match['code'],
-                    'resumen': match['description'],
-                    'confidence_score': match['confidence_score'] / 100,  # Convert to 0-1 scale
-                    'reasoning': match['reasoning']
-                })
-            
-            result_text = "\n".join(text_output)
-            
             # Send final results
-            final_data = {
-                'type': 'complete',
-                'success': True,
-                'query': description,
-                'count': len(results_data),
-                'text': result_text,
-                'data': results_data,
-                'model_used': result.get('model_used', 'gpt-4o'),
-                'total_tokens': result.get('total_tokens', 0)
-            }
+            outcome = 'completed'
+            final_data = {'type': 'complete', **format_search_result(description, result)}
             
             yield f"data: {json.dumps(final_data)}\n\n"
             
         except Exception as e:
+            outcome = 'failed'
             error_message = f"Error: {str(e)}"
             yield f"data: {json.dumps({'type': 'error', 'message': error_message})}\n\n"
+        finally:
+            if outcome == 'cancelled':
+                # Closes the GPT stream and its connection, the generation stops upstream
+                cancel.set()
+            record_search(outcome, description, started)
     
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 
+@app.route('/api/search/batch', methods=['POST'])
+def search_materials_batch():
+    """
+    Search many descriptions at once (e.g. every partida of a budget)
+    
+    Identical descriptions are matched once, up to SEARCH_CONCURRENCY at a time,
+    and results are streamed as they complete, each with the position of its
+    description in the request.
+    
+    Accepts JSON body with:
+        - descriptions: List of text descriptions to search for
+        - top_k: Number of results per description (default: 5)
+        - session_id: Session ID from materials list upload (optional)
+        - chapter: Chapter código to restrict the search to (optional, default database only)
+        - concurrency: Searches run at once (optional, at most SEARCH_CONCURRENCY)
+        - format: 'sse' (default) or 'ndjson'
+    
+    Returns:
+        Stream of events: 'start', then one 'result' or 'error' per description
+        (in completion order, with its 'index'), then 'complete'
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('descriptions'), list):
+        return jsonify({'error': 'No descriptions provided'}), 400
+    
+    descriptions = data['descriptions']
+    top_k = data.get('top_k', 5)
+    session_id = data.get('session_id', None)
+    chapter = data.get('chapter', None)
+    stream_format = data.get('format', 'sse')
+    
+    if not descriptions:
+        return jsonify({'error': 'No descriptions provided'}), 400
+    if len(descriptions) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} descriptions per batch'}), 400
+    if stream_format not in ('sse', 'ndjson'):
+        return jsonify({'error': f'Unknown format: {stream_format}'}), 400
+    try:
+        concurrency = max(1, min(int(data.get('concurrency', SEARCH_CONCURRENCY)), SEARCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': f"Invalid concurrency: {data.get('concurrency')}"}), 400
+    
+    # Positions of each distinct description
+    positions = {}
+    for index, description in enumerate(descriptions):
+        if not isinstance(description, str) or not description.strip():
+            return jsonify({'error': f'Description {index} cannot be empty'}), 400
+        positions.setdefault(description.strip(), []).append(index)
+    
+    try:
+        catalog, chapter_materials = get_search_scope(session_id, chapter)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error preparing the search: {str(e)}'}), 500
+    
+    def encode(event):
+        if stream_format == 'ndjson':
+            return json.dumps(event) + '\n'
+        return f"data: {json.dumps(event)}\n\n"
+    
+    # Blank lines are skipped by NDJSON readers
+    heartbeat = '\n' if stream_format == 'ndjson' else SSE_HEARTBEAT
+    
+    def generate():
+        """Generator function streaming results as searches complete"""
+        start = time.time()
+        cancel = threading.Event()
+        executor = None
+        pending = set()
+        try:
+            matcher = catalog.matcher if catalog is not None else get_gpt_matcher()
+            candidates = matcher.items
+            if chapter_materials is not None:
+                candidates = [item for item in matcher.items if (item.number, item.code) in chapter_materials]
+            
+            if not candidates:
+                yield encode({'type': 'error', 'message': f'Error: No materials found in chapter {chapter}'})
+                return
+            
+            # The items part of the prompt is the same for every description, format it once
+            items_text = matcher.items_text() if candidates is matcher.items else matcher.format_items(candidates)
+            
+            yield encode({'type': 'start', 'total': len(descriptions), 'unique': len(positions),
+                          'materials': len(candidates)})
+            
+            executor = ThreadPoolExecutor(max_workers=min(concurrency, len(positions)),
+                                          thread_name_prefix='batch-search')
+            futures = {
+                executor.submit(matcher.find_best_match, description, top_k, candidates, items_text, cancel): description
+                for description in positions
+            }
+            pending = set(futures)
+            
+            errors = 0
+            total_tokens = 0
+            while pending:
+                done, pending = wait(pending, timeout=SEARCH_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                if not done:
+                    yield heartbeat
+                
+                for future in done:
+                    description = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'error': str(e)}
+                
+                    if 'error' in result:
+                        errors += len(positions[description])
+                        record_search('failed', description, start, len(positions[description]))
+                    else:
+                        total_tokens += result.get('total_tokens', 0)
+                        payload = format_search_result(description, result)
+                        record_search('completed', description, start, len(positions[description]))
+                
+                    for index in positions[description]:
+                        if 'error' in result:
+                            yield encode({'type': 'error', 'index': index, 'query': description,
+                                          'message': f"Error: {result['error']}"})
+                        else:
+                            yield encode({'type': 'result', 'index': index, **payload})
+            
+            yield encode({
+                'type': 'complete',
+                'total': len(descriptions),
+                'unique': len(positions),
+                'errors': errors,
+                'total_tokens': total_tokens,
+                'elapsed': round(time.time() - start, 3)
+            })
+            
+        except GeneratorExit:
+            # Client gone: running GPT calls are aborted, the others never start
+            cancel.set()
+            raise
+        except Exception as e:
+            yield encode({'type': 'error', 'message': f"Error: {str(e)}"})
+        finally:
+            if pending:
+                # Searches left behind by a disconnect are cancelled, by an error failed
+                outcome = 'cancelled' if cancel.is_set() else 'failed'
+                cancel.set()
+                record_search(outcome, f'batch of {len(descriptions)} descriptions', start,
+                              sum(len(positions[futures[future]]) for future in pending))
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'text/event-stream'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@app.route('/api/search/stats', methods=['GET'])
+def search_stats():
+    """
+    Search outcomes since start-up (this worker)
+    
+    Returns:
+        JSON with completed, failed and cancelled search counts
+    """
+    with search_outcomes_lock:
+        counts = {outcome: search_outcomes[outcome] for outcome in ('completed', 'failed', 'cancelled')}
+    return jsonify({'success': True, **counts}), 200
+
+
+@app.route('/api/chapters', methods=['GET'])
+def list_chapters():
+    """
+    Chapter tree of the default database
+    
+    Returns:
+        JSON with nested chapters (codigo, resumen, num_materials, children)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'chapters': get_chapter_index().to_tree()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'error': f'Error loading chapters: {str(e)}'
+        }), 500
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'API is running'}), 200
 
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness endpoint: 200 once search is warm, 503 while warming up
+    
+    Starts the warm-up if nothing did yet (or starts it over after a failure),
+    so the first probe of a load balancer warms the instance up.
+    
+    Returns:
+        JSON with the warm-up status, running step, parse progress and step timings
+    """
+    if not warmup.ready:
+        warmup.start()
+    return jsonify(warmup.to_dict()), 200 if warmup.ready else 503
+
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     """Serve static files"""
@@ -449,6 +1058,17 @@ def serve_frontend():
     return send_from_directory('.', 'index.html')
 
 
+# Parameters of the upload endpoints in /api/docs
+UPLOAD_DOC_PARAMETERS = {
+    'file': 'Excel file (.xlsx or .xls) or FIEBDC-3 file (.bc3)',
+    'limit': f'Page size, 1-{MAX_PAGE_SIZE} (optional, default: all materials)',
+    'cursor': 'next_cursor of the previous page (optional)',
+    'fields': 'Comma-separated item fields to return (optional)',
+    'text': "'0' to leave out the text output (optional)",
+    'format': "'json' (default) or 'ndjson' to stream one item per line"
+}
+
+
 @app.route('/api/docs', methods=['GET'])
 def api_docs():
     """API documentation endpoint"""
@@ -459,38 +1079,91 @@ def api_docs():
                 'method': 'GET',
                 'description': 'Health check endpoint'
             },
+            '/api/ready': {
+                'method': 'GET',
+                'description': 'Readiness: 200 once the catalog and indexes are built, 503 while warming up',
+                'returns': 'JSON with status, running step, parse progress and step timings'
+            },
             '/api/upload': {
                 'method': 'POST',
                 'description': 'Upload Excel file and get resume data with codes',
-                'parameters': {
-                    'file': 'Excel file (.xlsx or .xls)'
-                },
+                'parameters': UPLOAD_DOC_PARAMETERS,
                 'returns': 'JSON with text output and data array'
             },
             '/api/upload/text-only': {
                 'method': 'POST',
                 'description': 'Upload Excel file and get resume text only (no codes)',
-                'parameters': {
-                    'file': 'Excel file (.xlsx or .xls)'
-                },
+                'parameters': UPLOAD_DOC_PARAMETERS,
                 'returns': 'JSON with text output and data array'
             },
             '/api/upload/details': {
                 'method': 'POST',
                 'description': 'Upload Excel file and get full material details',
+                'parameters': UPLOAD_DOC_PARAMETERS,
+                'returns': 'JSON with text output and detailed data array'
+            },
+            '/api/uploads/<upload_id>': {
+                'method': 'GET',
+                'description': 'Read a previous upload again (e.g. its next page) by the upload_id of its response',
                 'parameters': {
-                    'file': 'Excel file (.xlsx or .xls)'
+                    'view': "'resumen' (default), 'text-only' or 'details'",
+                    'limit, cursor, fields, text, format': 'Same as the upload endpoints'
                 },
-                'returns': 'JSON with text output and detailed data array'
+                'returns': 'Same JSON as the matching upload endpoint, 404 once expired'
+            },
+            '/api/jobs': {
+                'method': 'POST',
+                'description': 'Upload a database and parse it in a background worker process',
+                'parameters': {
+                    'file': 'Excel file (.xlsx or .xls) or FIEBDC-3 file (.bc3)'
+                },
+                'returns': 'JSON with job_id and status (202)'
+            },
+            '/api/jobs/<job_id>': {
+                'method': 'GET',
+                'description': 'Status and progress of a parse job',
+                'returns': 'JSON with status, progress (phase, rows, rows_per_sec) and count'
+            },
+            '/api/jobs/<job_id>/result': {
+                'method': 'GET',
+                'description': 'Result of a finished parse job',
+                'parameters': {
+                    'view': "'resumen' (default), 'text-only' or 'details'"
+                },
+                'returns': 'Same JSON as the matching /api/upload endpoint, 409 until done'
             },
             '/api/search': {
                 'method': 'POST',
                 'description': 'Search for materials using natural language description',
                 'parameters': {
                     'description': 'Text description to search for',
-                    'top_k': 'Number of results to return (default: 5)'
+                    'top_k': 'Number of results to return (default: 5)',
+                    'chapter': 'Chapter código to restrict the search to (optional)'
                 },
                 'returns': 'JSON with matching materials and similarity scores'
+            },
+            '/api/search/batch': {
+                'method': 'POST',
+                'description': 'Search many descriptions at once, identical ones are matched once',
+                'parameters': {
+                    'descriptions': f'List of text descriptions (at most {MAX_BATCH_SIZE})',
+                    'top_k': 'Number of results per description (optional, default: 5)',
+                    'session_id': 'Session ID from /api/upload-list (optional)',
+                    'chapter': 'Chapter código to restrict the search to (optional)',
+                    'concurrency': f'Searches run at once (optional, at most {SEARCH_CONCURRENCY})',
+                    'format': "'sse' (default) or 'ndjson'"
+                },
+                'returns': "Stream of 'start', one 'result' or 'error' per description in completion order (with its 'index'), then 'complete'"
+            },
+            '/api/search/stats': {
+                'method': 'GET',
+                'description': 'Search outcomes of this worker: completed, failed and cancelled (client disconnected)',
+                'returns': 'JSON with the count of each outcome'
+            },
+            '/api/chapters': {
+                'method': 'GET',
+                'description': 'Chapter tree of the default database',
+                'returns': 'JSON with nested chapters and material counts'
             }
         },
         'usage': {
@@ -501,5 +1174,8 @@ def api_docs():
 
 
 if __name__ == '__main__':
+    # The reloader runs this file twice, warm up in the serving process only
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup.start()
     app.run(debug=True, host='0.0.0.0', port=5001)
 
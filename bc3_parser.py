@@ -0,0 +1,318 @@
+"""
+FIEBDC-3 (BC3) parser for construction price databases
+Streams concepts (~C), decompositions (~D) and texts (~T) line by line and
+builds the same MainMaterial/SubMaterial model as ExcelDatabaseParser
+"""
+import codecs
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from chapter_index import ChapterIndex
+from excel_parser import MainMaterial, SubMaterial
+from material_export import write_json
+from parse_progress import ParseProgress
+from price_rollup import round_cents
+from workbook_readers import Source, open_binary
+
+# Character sets named in the ~V record
+ENCODINGS = {
+    'ANSI': 'cp1252',
+    '850': 'cp850',
+    '437': 'cp437',
+    'UTF-8': 'utf-8',
+}
+DEFAULT_ENCODING = 'cp1252'
+
+# Concept type (last field of ~C) -> Tipo as shown in the Excel export
+CONCEPT_TYPES = {
+    '1': 'Mano de obra',
+    '2': 'Maquinaria',
+    '3': 'Material',
+}
+
+
+@dataclass
+class Concept:
+    """A ~C record with its ~D decomposition and ~T text"""
+    codigo: str
+    ud: Optional[str] = None
+    resumen: str = ''
+    precio: Optional[float] = None
+    tipo: str = '0'
+    is_chapter: bool = False
+    is_root: bool = False
+    text: Optional[str] = None
+    # (child código, cantidad = factor x rendimiento)
+    children: List[Tuple[str, float]] = field(default_factory=list)
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value) if value.strip() else None
+    except ValueError:
+        return None
+
+
+def _strip_code(codigo: str) -> Tuple[str, int]:
+    """Return the código without its '#' chapter marks and the number of marks"""
+    stripped = codigo.strip().rstrip('#')
+    return stripped, len(codigo.strip()) - len(stripped)
+
+
+def iter_records(lines: Iterable[bytes]) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Split the lines of a BC3 file into (record type, fields) tuples
+    
+    Records start with '~' and may continue over several lines (long ~T texts).
+    The character set is taken from the ~V record, which comes first, unless
+    the file starts with a UTF-8 byte order mark.
+    """
+    encoding = DEFAULT_ENCODING
+    has_bom = False
+    record: Optional[str] = None
+    
+    def parse(text: str) -> Tuple[str, List[str]]:
+        fields = text[3:].split('|') if len(text) > 2 else []
+        if fields and fields[-1] == '':
+            fields.pop()
+        return text[1:2].upper(), fields
+    
+    for number, raw in enumerate(lines):
+        # Stripped before decoding: in cp1252 the BOM would read as 'ï»¿' and hide '~V'
+        if number == 0 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+            encoding = 'utf-8'
+            has_bom = True
+        line = raw.decode(encoding, errors='replace').rstrip('\r\n')
+        if line.startswith('~'):
+            if record is not None:
+                yield parse(record)
+            record = line
+            if line[1:2].upper() == 'V' and not has_bom:
+                fields = parse(line)[1]
+                charset = fields[4].strip().upper() if len(fields) > 4 else ''
+                encoding = ENCODINGS.get(charset, encoding)
+        elif record is not None:
+            record += '\n' + line
+    
+    if record is not None:
+        yield parse(record)
+
+
+class Bc3DatabaseParser:
+    """Parser for FIEBDC-3 (.bc3) construction price databases"""
+    
+    def __init__(self, bc3_path: Source, fields: Optional[Iterable[str]] = None,
+                 progress: Optional[ParseProgress] = None):
+        """
+        Args:
+            bc3_path: Path to the .bc3 file, or a seekable binary file object
+            fields: MainMaterial fields the caller needs, sub-materials are only
+                built when 'sub_materials' is requested. None builds everything.
+            progress: Receives phase timings and record progress (see parse_progress)
+        """
+        self.bc3_path = bc3_path
+        self.progress = progress or ParseProgress()
+        self.fields = set(fields) if fields is not None else None
+        self.concepts: Dict[str, Concept] = {}
+        self.materials: List[MainMaterial] = []
+        self.chapters: Dict[str, str] = {}  # chapter código -> resumen
+        self._prices: Dict[str, float] = {}
+    
+    @property
+    def wants_sub_materials(self) -> bool:
+        """True if sub-materials have to be built"""
+        return self.fields is None or 'sub_materials' in self.fields
+    
+    def load_bc3(self):
+        """Read the concepts, decompositions and texts of the file"""
+        self.concepts = {}
+        self._prices = {}
+        
+        def concept(codigo: str) -> Concept:
+            if codigo not in self.concepts:
+                self.concepts[codigo] = Concept(codigo)
+            return self.concepts[codigo]
+        
+        with open_binary(self.bc3_path) as f, self.progress.phase('read') as phase:
+            for count, (kind, fields) in enumerate(iter_records(f), 1):
+                phase.advance(count)
+                if not fields:
+                    continue
+                if kind == 'C':
+                    codigo, marks = _strip_code(fields[0].split('\\')[0])
+                    c = concept(codigo)
+                    c.is_chapter = marks > 0
+                    c.is_root = marks > 1
+                    c.ud = fields[1].strip() or None if len(fields) > 1 else None
+                    c.resumen = fields[2].strip() if len(fields) > 2 else ''
+                    c.precio = _number(fields[3].split('\\')[0]) if len(fields) > 3 else None
+                    c.tipo = fields[5].strip() if len(fields) > 5 and fields[5].strip() else '0'
+                elif kind == 'D':
+                    parent = concept(_strip_code(fields[0])[0])
+                    parts = fields[1].split('\\') if len(fields) > 1 else []
+                    parent.children = []
+                    for i in range(0, len(parts) - 2, 3):
+                        child = _strip_code(parts[i])[0]
+                        if not child:
+                            continue
+                        factor = _number(parts[i + 1])
+                        rendimiento = _number(parts[i + 2])
+                        parent.children.append((
+                            child,
+                            (1.0 if factor is None else factor) * (1.0 if rendimiento is None else rendimiento)
+                        ))
+                elif kind == 'T':
+                    concept(_strip_code(fields[0])[0]).text = fields[1].strip() if len(fields) > 1 else ''
+        
+        print(f"Loaded BC3 with {len(self.concepts)} concepts")
+    
+    def _tipo(self, c: Concept) -> Optional[str]:
+        if c.ud == '%' or '%' in c.codigo:
+            return None
+        if c.tipo in CONCEPT_TYPES:
+            return CONCEPT_TYPES[c.tipo]
+        return 'Partida' if c.children else 'Sin clasificar'
+    
+    def price_of(self, codigo: str, visiting: Tuple[str, ...] = ()) -> float:
+        """Price of a concept: its ~C price, or the sum of its decomposition when it has none"""
+        if codigo in self._prices:
+            return self._prices[codigo]
+        c = self.concepts.get(codigo)
+        if c is None:
+            return 0.0
+        if c.precio is not None or not c.children or codigo in visiting:
+            precio = c.precio or 0.0
+        else:
+            precio = sum(line[6] or 0.0 for line in self._lines(c, visiting + (codigo,)))
+            precio = float(round_cents(precio))
+        self._prices[codigo] = precio
+        return precio
+    
+    def _lines(self, c: Concept, visiting: Tuple[str, ...] = ()) -> List[Tuple]:
+        """
+        Decomposition lines of a concept as export rows (código, tipo, ud, resumen, cantidad, precio, importe)
+        
+        A percentage line ('%' código) is computed on the lines above it whose
+        código starts with the part before the '%' (all of them for a bare '%').
+        Percentages are in percent points, as in the Excel export.
+        """
+        lines = []
+        for child_code, cantidad in c.children:
+            child = self.concepts.get(child_code, Concept(child_code))
+            if child.ud == '%' or '%' in child_code:
+                prefix = child_code.split('%')[0].lower()
+                base = float(round_cents(sum(
+                    line[6] or 0.0 for line in lines if str(line[0]).lower().startswith(prefix)
+                )))
+                importe = float(round_cents(cantidad / 100 * base))
+                lines.append((child_code, None, '%', child.resumen, cantidad, base, importe))
+                continue
+            precio = self.price_of(child_code, visiting)
+            importe = float(round_cents(cantidad * precio))
+            lines.append((child_code, self._tipo(child), child.ud, child.resumen, cantidad, precio, importe))
+        return lines
+    
+    def _sub_material_rows(self, c: Concept, visiting: Tuple[str, ...] = ()) -> List[Tuple]:
+        """
+        Rows below a partida in the Excel export layout: the description, each
+        line followed by the decomposition of decomposed resources (crews) and
+        their closing row, and the closing row of the partida
+        """
+        rows = []
+        if c.text:
+            rows.append((None, None, None, c.text, None, None, None))
+        
+        def add_lines(concept: Concept, path: Tuple[str, ...]):
+            for line in self._lines(concept, path):
+                rows.append(line)
+                child = self.concepts.get(line[0])
+                if child is not None and child.children and not child.is_chapter and line[0] not in path:
+                    add_lines(child, path + (line[0],))
+                    rows.append((None, None, None, line[0]) + line[4:])
+        
+        add_lines(c, visiting + (c.codigo,))
+        rows.append((None, None, None, c.codigo, None, self.price_of(c.codigo), None))
+        return rows
+    
+    def _partida_codes(self) -> Iterator[Tuple[str, Tuple[str, ...]]]:
+        """
+        Yield (partida código, chapter path) in chapter order
+        
+        Partidas are the non-chapter children of chapters. Files without
+        chapters list every decomposed concept no other concept uses.
+        """
+        chapters = [c for c in self.concepts.values() if c.is_chapter]
+        if not chapters:
+            used: Set[str] = {child for c in self.concepts.values() for child, _ in c.children}
+            for c in self.concepts.values():
+                if c.children and c.codigo not in used:
+                    yield c.codigo, ()
+            return
+        
+        nested = {child for c in chapters for child, _ in c.children}
+        roots = [c for c in chapters if c.is_root] or [c for c in chapters if c.codigo not in nested]
+        seen: Set[str] = set()
+        
+        def walk(chapter: Concept, path: Tuple[str, ...]):
+            if chapter.codigo in seen:
+                return
+            seen.add(chapter.codigo)
+            path = path + (chapter.codigo,)
+            self.chapters[chapter.codigo] = chapter.resumen
+            for child_code, _ in chapter.children:
+                child = self.concepts.get(child_code)
+                if child is None:
+                    continue
+                if child.is_chapter:
+                    yield from walk(child, path)
+                else:
+                    yield child_code, path
+        
+        for root in roots:
+            yield from walk(root, ())
+    
+    def iter_materials(self) -> Iterator[MainMaterial]:
+        """Yield the partidas of the loaded file in chapter order"""
+        self.chapters = {}
+        row_index = 0
+        found = 0
+        with self.progress.phase('extract') as phase:
+            for codigo, capitulos in self._partida_codes():
+                c = self.concepts[codigo]
+                rows = self._sub_material_rows(c) if self.wants_sub_materials else []
+                material = MainMaterial(
+                    codigo=codigo,
+                    tipo=self._tipo(c) or 'Partida',
+                    ud=c.ud or '',
+                    resumen=c.resumen,
+                    precio=self.price_of(codigo),
+                    row_index=row_index,
+                    sub_materials=[
+                        SubMaterial(*row[:3], row[3] or '', *row[4:], row_index=row_index + 1 + i)
+                        for i, row in enumerate(rows)
+                    ],
+                    capitulos=capitulos
+                )
+                row_index += 1 + len(rows)
+                found += 1
+                phase.advance(row_index, found)
+                yield material
+    
+    def parse_materials(self):
+        """Parse all partidas and their decompositions"""
+        self.materials = list(self.iter_materials())
+        print(f"\nTotal main materials extracted: {len(self.materials)}")
+    
+    def get_chapter_index(self) -> ChapterIndex:
+        """Build the chapter tree of the parsed materials"""
+        return ChapterIndex.from_materials(self.materials, self.chapters)
+    
+    def get_materials(self) -> List[MainMaterial]:
+        """Return list of all parsed materials"""
+        return self.materials
+    
+    def save_to_json(self, output_path: str):
+        """Save parsed materials to compact JSON, written one material at a time"""
+        write_json(self.materials, output_path)
+        print(f"Saved parsed materials to {output_path}")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark excel_parser.py on synthetic workbooks of growing size
+Reports wall time per phase, rows/sec and peak RSS for each workbook size
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from excel_parser import ExcelDatabaseParser
+from parse_progress import ParseProgress
+from synthetic_workbook import generate_workbook
+
+DEFAULT_SIZES = [1000, 10000, 50000, 200000]
+
+
+def workbook_path(workdir: str, num_partidas: int, seed: int) -> str:
+    """Generate the synthetic workbook once and reuse it across runs"""
+    path = os.path.join(workdir, f"synthetic_{num_partidas}_{seed}.xlsx")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate_workbook(path + '.tmp', num_partidas, seed=seed)
+        os.replace(path + '.tmp', path)
+        print(f"Generated {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return path
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_parser(path: str, reader: Optional[str], vectorized: bool,
+               fields: Optional[List[str]] = None) -> Dict:
+    """
+    Load and parse every sheet of a workbook, timing each phase
+    
+    Runs in a fresh process (see benchmark) so peak RSS belongs to this workbook only.
+    """
+    from workbook_readers import select_reader
+    
+    result = {'load_excel': 0.0, 'parse_materials': 0.0, 'rows': 0, 'materials': 0}
+    progress = ParseProgress()
+    # Keep the parser's summary lines out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for sheet in select_reader(path, reader).sheet_names():
+            parser = ExcelDatabaseParser(path, fields=fields, sheet=sheet, progress=progress)
+            
+            start = time.perf_counter()
+            parser.load_excel(reader)
+            loaded = time.perf_counter()
+            parser.parse_materials(vectorized=vectorized)
+            parsed = time.perf_counter()
+            
+            result['load_excel'] += loaded - start
+            result['parse_materials'] += parsed - loaded
+            result['rows'] += len(parser.df)
+            result['materials'] += len(parser.materials)
+            del parser
+    
+    # Breakdown of both timings: read/header, then classify/extract
+    result['phases'] = progress.summary()
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def benchmark(sizes: List[int], workdir: str, reader: Optional[str] = None,
+              vectorized: bool = True, fields: Optional[List[str]] = None,
+              seed: int = 0) -> List[Dict]:
+    """
+    Run the parser on one synthetic workbook per size
+    
+    Args:
+        sizes: Numbers of partidas
+        workdir: Directory where generated workbooks are kept
+        reader: Workbook reader name, None picks one based on file size
+        vectorized: Use the vectorized parse instead of the row-wise one
+        fields: Field projection passed to the parser
+        seed: Random seed of the generated workbooks
+    
+    Returns:
+        One result dictionary per size
+    
+    Raises:
+        ValueError: If fields are given for the row-wise parse, which has no projection
+    """
+    if fields is not None and not vectorized:
+        raise ValueError("Field projection requires the vectorized parse")
+    
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        path = workbook_path(workdir, size, seed)
+        with context.Pool(1) as pool:
+            result = pool.apply(run_parser, (path, reader, vectorized, fields))
+        total = result['load_excel'] + result['parse_materials']
+        result.update({
+            'partidas': size,
+            'file_mb': os.path.getsize(path) / (1024 * 1024),
+            'total': total,
+            'rows_per_sec': result['rows'] / total if total else 0.0,
+        })
+        results.append(result)
+        print(format_result(result), file=sys.stderr)
+    return results
+
+
+def format_result(result: Dict) -> str:
+    return (f"{result['partidas']:>8} partidas {result['rows']:>9} rows {result['file_mb']:7.1f} MB | "
+            f"load_excel {result['load_excel']:7.2f}s  parse_materials {result['parse_materials']:7.2f}s | "
+            f"{result['rows_per_sec']:>9,.0f} rows/s | peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help='Numbers of partidas to benchmark')
+    arg_parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'iresmat_benchmark'),
+                            help='Where generated workbooks are kept between runs')
+    arg_parser.add_argument('--reader', choices=['openpyxl', 'calamine', 'pandas'],
+                            help='Workbook reader (default: picked from file size)')
+    arg_parser.add_argument('--row-wise', action='store_true',
+                            help='Benchmark the row-wise parse instead of the vectorized one')
+    arg_parser.add_argument('--fields', nargs='+', help="Field projection, e.g. 'codigo resumen'")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = arg_parser.parse_args()
+    if args.row_wise and args.fields:
+        arg_parser.error('--fields needs the vectorized parse, it cannot be combined with --row-wise')
+    
+    os.makedirs(args.workdir, exist_ok=True)
+    results = benchmark(args.sizes, args.workdir, reader=args.reader, vectorized=not args.row_wise,
+                        fields=args.fields, seed=args.seed)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.json}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Chapter hierarchy built from the 'Capítulo' rows of the materials database
+Lets search and API endpoints restrict candidates to one chapter
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+class ChapterTracker:
+    """
+    Follows the 'Capítulo' rows of a sheet and gives the chapter path of each material
+    
+    The Excel export has no explicit chapter levels, so nesting is inferred
+    from runs of consecutive chapter rows: the first run opens a chain
+    (BASE DE DATOS > PRELIMINARES > LIMPIEZAS > ...), and a later run of k
+    chapter rows replaces the k deepest levels of the current path. When the
+    first run has several chapters, its first one is the database title and
+    stays the root.
+    """
+    
+    def __init__(self):
+        self.titles: Dict[str, str] = {}
+        self._stack: List[str] = []
+        self._run: List[str] = []
+        self._path: Tuple[str, ...] = ()
+        self._root_depth: Optional[int] = None
+    
+    def chapter(self, codigo: str, titulo: str):
+        """Record a 'Capítulo' row"""
+        if codigo in self.titles:
+            # Keep repeated chapter códigos apart
+            codigo = f"{codigo}@{len(self.titles)}"
+        self.titles[codigo] = titulo
+        self._run.append(codigo)
+    
+    def path(self) -> Tuple[str, ...]:
+        """Return the chapter path (root first) for a material at the current position"""
+        if self._run:
+            if self._root_depth is None:
+                self._root_depth = 1 if len(self._run) > 1 else 0
+            base = max(len(self._stack) - len(self._run), self._root_depth)
+            self._stack = self._stack[:base] + self._run
+            self._run = []
+            # One shared tuple per chapter keeps per-material memory flat
+            self._path = tuple(self._stack)
+        return self._path
+
+
+@dataclass
+class Chapter:
+    """One node of the chapter tree"""
+    codigo: str
+    resumen: str
+    parent: Optional[str]
+    children: List[str] = field(default_factory=list)
+    material_indices: List[int] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'codigo': self.codigo,
+            'resumen': self.resumen,
+            'parent': self.parent,
+            'children': self.children,
+            'num_materials': len(self.material_indices),
+        }
+
+
+class ChapterIndex:
+    """Chapter tree with chapter -> material index lookups"""
+    
+    def __init__(self):
+        self.chapters: Dict[str, Chapter] = {}
+        self.roots: List[str] = []
+    
+    @classmethod
+    def from_materials(cls, materials, titles: Optional[Dict[str, str]] = None) -> 'ChapterIndex':
+        """
+        Build the tree from the chapter paths stored on each material
+        
+        Args:
+            materials: Parsed materials (anything with a 'capitulos' path)
+            titles: Optional chapter código -> resumen mapping
+        """
+        index = cls()
+        titles = titles or {}
+        
+        for i, material in enumerate(materials):
+            parent = None
+            for codigo in material.capitulos:
+                chapter = index.chapters.get(codigo)
+                if chapter is None:
+                    chapter = Chapter(codigo=codigo, resumen=titles.get(codigo, ''), parent=parent)
+                    index.chapters[codigo] = chapter
+                    if parent is None:
+                        index.roots.append(codigo)
+                    else:
+                        index.chapters[parent].children.append(codigo)
+                parent = codigo
+            
+            if parent is not None:
+                index.chapters[parent].material_indices.append(i)
+        
+        return index
+    
+    def __contains__(self, codigo: str) -> bool:
+        return codigo in self.chapters
+    
+    def get(self, codigo: str) -> Chapter:
+        """Return a chapter by código"""
+        if codigo not in self.chapters:
+            raise ValueError(f"Unknown chapter: {codigo}")
+        return self.chapters[codigo]
+    
+    def path(self, codigo: str) -> List[str]:
+        """Return the chapter códigos from the root down to codigo"""
+        path = []
+        chapter = self.get(codigo)
+        while chapter is not None:
+            path.append(chapter.codigo)
+            chapter = self.chapters.get(chapter.parent) if chapter.parent else None
+        return path[::-1]
+    
+    def materials_in(self, codigo: str, recursive: bool = True) -> List[int]:
+        """
+        Return the indices of the materials in a chapter
+        
+        Args:
+            codigo: Chapter código
+            recursive: Include materials of all sub-chapters
+        """
+        chapter = self.get(codigo)
+        if not recursive:
+            return list(chapter.material_indices)
+        
+        indices = []
+        stack = [chapter]
+        while stack:
+            current = stack.pop()
+            indices.extend(current.material_indices)
+            stack.extend(self.chapters[child] for child in current.children)
+        return sorted(indices)
+    
+    def to_tree(self) -> List[Dict]:
+        """Nested dictionaries for JSON serialization"""
+        def node(codigo: str) -> Dict:
+            chapter = self.chapters[codigo]
+            return {
+                'codigo': chapter.codigo,
+                'resumen': chapter.resumen,
+                'num_materials': len(self.materials_in(codigo)),
+                'children': [node(child) for child in chapter.children],
+            }
+        return [node(root) for root in self.roots]
@@ -3,9 +3,14 @@ Excel Parser for Construction Materials Database
 Extracts hierarchical structure of main materials and their sub-materials
 """
 import pandas as pd
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
-import json
+import numpy as np
+from typing import List, Dict, Any, Callable, Optional, Iterator, Iterable, Tuple
+from dataclasses import dataclass, asdict, astuple
+import functools
+from chapter_index import ChapterIndex, ChapterTracker
+from material_export import write_json
+from parse_progress import ParseProgress
+from workbook_readers import ArrowReader, CalamineReader, Source, WorkbookReader, select_reader
 
 
 @dataclass
@@ -31,6 +36,16 @@ class MainMaterial:
     precio: float
     row_index: int
     sub_materials: List[SubMaterial]
+    capitulos: Tuple[str, ...] = ()  # chapter path, root first
+    
+    @property
+    def capitulo(self) -> Optional[str]:
+        """Código of the chapter the material belongs to"""
+        return self.capitulos[-1] if self.capitulos else None
+    
+    @property
+    def num_sub_materials(self) -> int:
+        return len(self.sub_materials)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -41,42 +56,199 @@ class MainMaterial:
             'resumen': self.resumen,
             'precio': self.precio,
             'row_index': self.row_index,
-            'sub_materials': [asdict(sm) for sm in self.sub_materials]
+            'sub_materials': [asdict(sm) for sm in self.sub_materials],
+            'capitulos': list(self.capitulos)
         }
 
 
+class LazyMainMaterial(MainMaterial):
+    """
+    MainMaterial whose sub-materials are built on first access
+    
+    The parse only records which rows belong to the material. The first read
+    of sub_materials builds them from the column data of the parsed sheet
+    (kept alive until then) and keeps the result. Until then their plain
+    values can be read with sub_material_records, without building objects.
+    """
+    
+    def __init__(self, *args, loader: Callable[[], List[Tuple]], num_sub_materials: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loader = loader
+        self._num_sub_materials = num_sub_materials
+    
+    @property
+    def sub_materials(self) -> List[SubMaterial]:
+        if self._loader is not None:
+            self._sub_materials = [SubMaterial(*record) for record in self._loader()]
+            self._loader = None
+        return self._sub_materials
+    
+    @sub_materials.setter
+    def sub_materials(self, value: List[SubMaterial]):
+        self._sub_materials = value
+        self._loader = None
+    
+    @property
+    def is_hydrated(self) -> bool:
+        """True once the sub-materials have been built"""
+        return self._loader is None
+    
+    @property
+    def num_sub_materials(self) -> int:
+        return len(self._sub_materials) if self._loader is None else self._num_sub_materials
+    
+    def sub_material_records(self) -> List[Tuple]:
+        """SubMaterial field values of each sub-material, in field order, without hydrating them"""
+        if self._loader is not None:
+            return self._loader()
+        return [astuple(sm) for sm in self._sub_materials]
+    
+    def __getstate__(self):
+        # Loaders reference the parser, pickle the built sub-materials instead
+        state = dict(self.__dict__, _sub_materials=self.sub_materials)
+        state['_loader'] = None
+        return state
+
+
+# Bump whenever parsing output changes, this invalidates cached snapshots
+PARSER_VERSION = 2
+
+# Column names of the database layout, in sheet order
+COLUMNS = ['Código', 'Tipo', 'Ud', 'Resumen', 'Cantidad', 'Precio (€)', 'Importe (€)']
+
+# Sheet columns needed to fill each MainMaterial field. Código, Tipo and Precio
+# are always read because classifying a row as a main material depends on them
+FIELD_COLUMNS = {
+    'codigo': ['Código'],
+    'tipo': ['Tipo'],
+    'ud': ['Ud'],
+    'resumen': ['Resumen'],
+    'precio': ['Precio (€)'],
+    'row_index': [],
+    'sub_materials': COLUMNS,
+}
+CLASSIFICATION_COLUMNS = ['Código', 'Tipo', 'Precio (€)']
+
+
+def columns_for_fields(fields: Optional[Iterable[str]]) -> List[str]:
+    """
+    Return the sheet columns (in sheet order) needed to fill the given fields
+    
+    Args:
+        fields: MainMaterial field names, None means all fields
+    """
+    if fields is None:
+        return list(COLUMNS)
+    
+    needed = set(CLASSIFICATION_COLUMNS)
+    for field in fields:
+        if field not in FIELD_COLUMNS:
+            raise ValueError(f"Unknown material field: {field}")
+        needed.update(FIELD_COLUMNS[field])
+    
+    return [column for column in COLUMNS if column in needed]
+
+
+# Crew/labour codes that are typed 'Partida' but only ever appear as sub-materials
+EXCLUDED_MAIN_PREFIXES = ('moc-', 'mo-salarial', 'alq-', 'm.o.')
+
+
 class ExcelDatabaseParser:
     """Parser for construction materials Excel database"""
     
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: Source, fields: Optional[Iterable[str]] = None, sheet=0,
+                 progress: Optional[ParseProgress] = None, verbose: bool = False):
+        """
+        Args:
+            excel_path: Path to the Excel database file, or a seekable binary file
+                object such as an upload stream (see workbook_readers.Source)
+            fields: MainMaterial fields the caller needs (e.g. ['codigo', 'resumen']).
+                Only the matching columns are read, and sub-materials are only
+                built when 'sub_materials' is requested. None reads everything.
+            sheet: Sheet index or name to parse (first sheet by default)
+            progress: Receives phase timings and row progress (see parse_progress)
+            verbose: Print a line for every main material found
+        """
         self.excel_path = excel_path
+        self.sheet = sheet
+        self.progress = progress or ParseProgress()
+        self.verbose = verbose
+        self.fields = set(fields) if fields is not None else None
+        self.columns = columns_for_fields(self.fields)
         self.df = None
         self.materials: List[MainMaterial] = []
+        self.chapters: Dict[str, str] = {}  # chapter código -> resumen
+    
+    @property
+    def wants_sub_materials(self) -> bool:
+        """True if sub-materials have to be built"""
+        return self.fields is None or 'sub_materials' in self.fields
         
-    def load_excel(self):
-        """Load Excel file and prepare dataframe"""
-        # Read Excel without header, we'll identify columns manually
-        self.df = pd.read_excel(self.excel_path, sheet_name=0, header=None)
+    def _select_reader(self, reader: Optional[str] = None, streaming: bool = False) -> WorkbookReader:
+        usecols = None if self.fields is None else [COLUMNS.index(c) for c in self.columns]
+        return select_reader(self.excel_path, reader, sheet=self.sheet, usecols=usecols,
+                             streaming=streaming)
+    
+    def iter_data_rows(self, reader: Optional[str] = None, streaming: bool = False) -> Iterator[Tuple]:
+        """
+        Stream the rows below the 'Código'/'Tipo' header row
+        
+        Args:
+            reader: Workbook reader name ('openpyxl', 'calamine', 'pandas'),
+                None picks one (see select_reader)
+            streaming: Rows are not kept by the caller, large workbooks are
+                then read with the streaming reader
+        """
+        rows = self._select_reader(reader, streaming).iter_rows()
         
         # Find the header row (contains "Código", "Tipo", "Ud", etc.)
-        header_row_idx = None
-        for idx, row in self.df.iterrows():
-            if row[0] == 'Código' and row[1] == 'Tipo':
-                header_row_idx = idx
-                break
+        with self.progress.phase('header') as phase:
+            for skipped, row in enumerate(rows):
+                if row[0] == 'Código' and row[1] == 'Tipo':
+                    phase.advance(skipped + 1)
+                    break
+            else:
+                raise ValueError("Could not find header row in Excel file")
         
-        if header_row_idx is None:
-            raise ValueError("Could not find header row in Excel file")
+        yield from rows
         
-        # Set proper column names
-        self.df.columns = self.df.iloc[header_row_idx].values
-        # Drop rows before and including header
-        self.df = self.df.iloc[header_row_idx + 1:].reset_index(drop=True)
+    def load_excel(self, reader: Optional[str] = None):
+        """
+        Load Excel file and prepare dataframe
         
-        # Clean up column names
-        self.df.columns = ['Código', 'Tipo', 'Ud', 'Resumen', 'Cantidad', 'Precio (€)', 'Importe (€)']
+        Args:
+            reader: Workbook reader name, None uses calamine whatever the file size,
+                since the whole sheet becomes the dataframe anyway (openpyxl if
+                calamine is missing; CSV and Parquet exports are read with pyarrow)
+        """
+        source = self._select_reader(reader)
+        with self.progress.phase('read') as phase:
+            if isinstance(source, (ArrowReader, CalamineReader)):
+                # Columnar exports, and sheets read whole by calamine, become the
+                # dataframe directly, without row tuples
+                self.df = source.read_frame()
+                self.df.columns = self.columns
+            else:
+                self.load_rows(self._count_rows(self.iter_data_rows(reader), phase))
+            phase.advance(len(self.df))
         
         print(f"Loaded Excel with {len(self.df)} rows")
+    
+    def load_rows(self, rows: Iterable[Tuple]):
+        """
+        Prepare the dataframe from data rows that were already read
+        
+        Args:
+            rows: Row tuples below the header, holding self.columns in order
+        """
+        self.df = pd.DataFrame(list(rows), columns=self.columns, dtype=object)
+    
+    @staticmethod
+    def _count_rows(rows: Iterable[Tuple], phase) -> Iterator[Tuple]:
+        """Pass rows through, reporting how many were read to a progress phase"""
+        for count, row in enumerate(rows, 1):
+            phase.advance(count)
+            yield row
         
     def is_main_material(self, row: pd.Series, idx: int) -> bool:
         """
@@ -101,14 +273,78 @@ class ExcelDatabaseParser:
             
             # Exclude common sub-material codes that also have Tipo='Partida'
             # These are crew/labor codes that appear as sub-materials
-            excluded_prefixes = ('moc-', 'mo-salarial', 'alq-', 'm.o.')
-            
-            if not codigo_str.startswith(excluded_prefixes):
+            if not codigo_str.startswith(EXCLUDED_MAIN_PREFIXES):
                 # This is likely a main material
                 return True
                 
         return False
     
+    @staticmethod
+    def _chapter_from_row(row) -> Tuple[str, str]:
+        """Return (código, resumen) of a 'Capítulo' row"""
+        resumen = row.get('Resumen')
+        titulo = '' if pd.isna(resumen) else str(resumen).strip()
+        codigo = row['Código']
+        return (titulo if pd.isna(codigo) else str(codigo).strip()), titulo
+    
+    @staticmethod
+    def _is_empty_row(row) -> bool:
+        """Check if a row has no Código, Tipo or Resumen"""
+        return pd.isna(row['Código']) and pd.isna(row['Tipo']) and pd.isna(row['Resumen'])
+    
+    @staticmethod
+    def _sub_material_from_row(row, idx: int) -> SubMaterial:
+        """Build a SubMaterial from a row (Series or dict keyed by column name)"""
+        codigo = row['Código']
+        tipo = row['Tipo']
+        resumen = row['Resumen']
+        
+        # Create sub-material entry with error handling for numeric fields
+        try:
+            cantidad = None if pd.isna(row['Cantidad']) else float(row['Cantidad'])
+        except (ValueError, TypeError):
+            cantidad = None
+            
+        try:
+            precio = None if pd.isna(row['Precio (€)']) else float(row['Precio (€)'])
+        except (ValueError, TypeError):
+            precio = None
+            
+        try:
+            importe = None if pd.isna(row['Importe (€)']) else float(row['Importe (€)'])
+        except (ValueError, TypeError):
+            importe = None
+        
+        return SubMaterial(
+            codigo=None if pd.isna(codigo) else str(codigo),
+            tipo=None if pd.isna(tipo) else str(tipo),
+            ud=None if pd.isna(row['Ud']) else str(row['Ud']),
+            resumen='' if pd.isna(resumen) else str(resumen),
+            cantidad=cantidad,
+            precio=precio,
+            importe=importe,
+            row_index=idx
+        )
+    
+    @staticmethod
+    def _main_material_from_row(row, idx: int) -> MainMaterial:
+        """Build a MainMaterial (without sub-materials) from a row"""
+        # Extract main material info with error handling
+        try:
+            precio = float(row['Precio (€)'])
+        except (ValueError, TypeError):
+            precio = 0.0  # Default to 0 if price can't be parsed
+        
+        return MainMaterial(
+            codigo=str(row['Código']).strip(),
+            tipo=str(row['Tipo']),
+            ud=str(row['Ud']) if not pd.isna(row['Ud']) else '',
+            resumen=str(row['Resumen']).strip() if not pd.isna(row['Resumen']) else '',
+            precio=precio,
+            row_index=idx,
+            sub_materials=[]
+        )
+    
     def extract_sub_materials(self, start_idx: int) -> List[SubMaterial]:
         """
         Extract all sub-materials following a main material
@@ -128,87 +364,291 @@ class ExcelDatabaseParser:
             if row['Tipo'] == 'Capítulo':
                 break
             
-            codigo = row['Código']
-            tipo = row['Tipo']
-            resumen = row['Resumen']
-            
             # Skip completely empty rows
-            if pd.isna(codigo) and pd.isna(tipo) and pd.isna(resumen):
+            if self._is_empty_row(row):
                 current_idx += 1
                 continue
             
-            # Create sub-material entry with error handling for numeric fields
-            try:
-                cantidad = None if pd.isna(row['Cantidad']) else float(row['Cantidad'])
-            except (ValueError, TypeError):
-                cantidad = None
-                
-            try:
-                precio = None if pd.isna(row['Precio (€)']) else float(row['Precio (€)'])
-            except (ValueError, TypeError):
-                precio = None
-                
-            try:
-                importe = None if pd.isna(row['Importe (€)']) else float(row['Importe (€)'])
-            except (ValueError, TypeError):
-                importe = None
-            
-            sub_material = SubMaterial(
-                codigo=None if pd.isna(codigo) else str(codigo),
-                tipo=None if pd.isna(tipo) else str(tipo),
-                ud=None if pd.isna(row['Ud']) else str(row['Ud']),
-                resumen='' if pd.isna(resumen) else str(resumen),
-                cantidad=cantidad,
-                precio=precio,
-                importe=importe,
-                row_index=current_idx
-            )
-            
+            sub_material = self._sub_material_from_row(row, current_idx)
             sub_materials.append(sub_material)
             current_idx += 1
         
         return sub_materials
     
-    def parse_materials(self):
-        """Parse all main materials and their sub-materials"""
+    def build_row_masks(self) -> Dict[str, np.ndarray]:
+        """
+        Classify every row of the sheet in one column-wise pass
+        
+        Returns:
+            Dictionary of per-row arrays:
+            - 'main': True for main materials (same rule as is_main_material)
+            - 'chapter': True for 'Capítulo' rows
+            - 'owner': row index of the main material a row belongs to, -1 if none
+            - 'sub': True for rows that become sub-materials of their owner
+        """
+        codigo = self.df['Código']
+        tipo = self.df['Tipo']
+        
+        codigo_lower = codigo.astype(str).str.strip().str.lower()
+        main = (
+            codigo.notna() & tipo.notna() & (tipo == 'Partida')
+            & self.df['Precio (€)'].notna()
+            & ~codigo_lower.str.startswith(EXCLUDED_MAIN_PREFIXES)
+        ).to_numpy()
+        chapter = (tipo == 'Capítulo').to_numpy() & ~main
+        
+        # Group id: every main material or chapter row opens a new group,
+        # the group owner is the main material row (or -1 for a chapter)
+        positions = np.arange(len(self.df))
+        boundary = main | chapter
+        group = np.cumsum(boundary) - 1
+        group_owner = np.where(main[boundary], positions[boundary], -1)
+        owner = np.full(len(self.df), -1)
+        in_group = group >= 0
+        owner[in_group] = group_owner[group[in_group]]
+        
+        empty = codigo.isna() & tipo.isna()
+        if 'Resumen' in self.df:
+            empty &= self.df['Resumen'].isna()
+        empty = empty.to_numpy()
+        sub = (owner >= 0) & ~boundary & ~empty
+        
+        return {'main': main, 'chapter': chapter, 'owner': owner, 'sub': sub}
+    
+    def parse_materials(self, vectorized: bool = False, lazy: bool = False):
+        """
+        Parse all main materials and their sub-materials
+        
+        Args:
+            vectorized: Classify the whole sheet with column-wise operations
+                instead of walking it row by row. Produces the same materials.
+            lazy: Return LazyMainMaterial objects that build their sub-materials
+                on first access (requires vectorized=True)
+        """
+        if vectorized:
+            self._parse_materials_vectorized(lazy)
+            return
+        
+        if self.fields is not None:
+            raise ValueError("Field projection requires vectorized=True")
+        if lazy:
+            raise ValueError("Lazy sub-materials require vectorized=True")
+        
         self.materials = []
+        tracker = ChapterTracker()
         
-        for idx, row in self.df.iterrows():
-            if self.is_main_material(row, idx):
-                # Extract main material info with error handling
-                try:
-                    precio = float(row['Precio (€)'])
-                except (ValueError, TypeError):
-                    precio = 0.0  # Default to 0 if price can't be parsed
-                
-                main_material = MainMaterial(
-                    codigo=str(row['Código']).strip(),
-                    tipo=str(row['Tipo']),
-                    ud=str(row['Ud']) if not pd.isna(row['Ud']) else '',
-                    resumen=str(row['Resumen']).strip() if not pd.isna(row['Resumen']) else '',
-                    precio=precio,
-                    row_index=idx,
-                    sub_materials=[]
+        with self.progress.phase('extract', total_rows=len(self.df)) as phase:
+            for idx, row in self.df.iterrows():
+                if row['Tipo'] == 'Capítulo':
+                    tracker.chapter(*self._chapter_from_row(row))
+                elif self.is_main_material(row, idx):
+                    main_material = self._main_material_from_row(row, idx)
+                    main_material.capitulos = tracker.path()
+                    
+                    # Extract sub-materials
+                    main_material.sub_materials = self.extract_sub_materials(idx)
+                    
+                    self.materials.append(main_material)
+                    
+                    if self.verbose:
+                        print(f"Found main material: {main_material.codigo} with {len(main_material.sub_materials)} sub-materials")
+                phase.advance(idx + 1, len(self.materials))
+        
+        self.chapters = tracker.titles
+        print(f"\nTotal main materials extracted: {len(self.materials)}")
+        
+    def _column_lists(self) -> Dict[str, list]:
+        """Columns as Python lists (numeric columns coerced), built once per loaded sheet"""
+        if getattr(self, '_columns_df', None) is not self.df:
+            lists = {}
+            for name in COLUMNS:
+                if name not in self.df:
+                    lists[name] = [None] * len(self.df)
+                elif name in ('Cantidad', 'Precio (€)', 'Importe (€)'):
+                    lists[name] = pd.to_numeric(self.df[name], errors='coerce').tolist()
+                else:
+                    lists[name] = self.df[name].tolist()
+            self._columns = lists
+            self._columns_df = self.df
+        return self._columns
+        
+    def _build_sub_materials(self, positions: Iterable[int],
+                             columns: Optional[Dict[str, list]] = None) -> List[SubMaterial]:
+        """Build the SubMaterials of the given row positions (of columns, the loaded sheet by default)"""
+        return [SubMaterial(*record) for record in self._sub_material_records(positions, columns)]
+    
+    def _sub_material_records(self, positions: Iterable[int],
+                              columns: Optional[Dict[str, list]] = None) -> List[Tuple]:
+        """SubMaterial field values (in field order) of the given row positions"""
+        columns = columns or self._column_lists()
+        codigos = columns['Código']
+        tipos = columns['Tipo']
+        uds = columns['Ud']
+        resumenes = columns['Resumen']
+        cantidades = columns['Cantidad']
+        precios = columns['Precio (€)']
+        importes = columns['Importe (€)']
+        
+        def clean(value):
+            return None if pd.isna(value) else value
+        
+        records = []
+        for idx in positions:
+            codigo = codigos[idx]
+            tipo = tipos[idx]
+            ud = uds[idx]
+            resumen = resumenes[idx]
+            records.append((
+                None if pd.isna(codigo) else str(codigo),
+                None if pd.isna(tipo) else str(tipo),
+                None if pd.isna(ud) else str(ud),
+                '' if pd.isna(resumen) else str(resumen),
+                clean(cantidades[idx]),
+                clean(precios[idx]),
+                clean(importes[idx]),
+                idx
+            ))
+        return records
+    
+    def _parse_materials_vectorized(self, lazy: bool = False):
+        """Single-pass parse built on build_row_masks"""
+        self.materials = []
+        with self.progress.phase('classify', total_rows=len(self.df)) as phase:
+            masks = self.build_row_masks()
+            phase.advance(len(self.df))
+        
+        with self.progress.phase('extract', total_rows=len(self.df)) as phase:
+            self._extract_materials(masks, lazy, phase)
+            phase.advance(len(self.df), len(self.materials))
+        
+        print(f"\nTotal main materials extracted: {len(self.materials)}")
+    
+    def _extract_materials(self, masks: Dict[str, np.ndarray], lazy: bool, phase):
+        """Build the materials of the rows classified by build_row_masks"""
+        columns = self._column_lists()
+        codigos = columns['Código']
+        tipos = columns['Tipo']
+        uds = columns['Ud']
+        resumenes = columns['Resumen']
+        precios = columns['Precio (€)']
+        
+        # Sub-material rows sorted by owner, so each owner's rows are one slice
+        sub_positions = np.flatnonzero(masks['sub'])
+        sub_owners = masks['owner'][masks['sub']]
+        main_positions = np.flatnonzero(masks['main'])
+        sub_start = np.searchsorted(sub_owners, main_positions, side='left').tolist()
+        sub_end = np.searchsorted(sub_owners, main_positions, side='right').tolist()
+        
+        sub_materials_by_owner: Dict[int, List[SubMaterial]] = {}
+        if self.wants_sub_materials and not lazy:
+            sub_materials = self._build_sub_materials(sub_positions.tolist())
+            for idx, start, end in zip(main_positions.tolist(), sub_start, sub_end):
+                sub_materials_by_owner[idx] = sub_materials[start:end]
+        
+        # Chapter paths only depend on the (few) chapter and main material rows
+        tracker = ChapterTracker()
+        chapter_paths: Dict[int, Tuple[str, ...]] = {}
+        for idx in np.flatnonzero(masks['main'] | masks['chapter']).tolist():
+            if masks['chapter'][idx]:
+                tracker.chapter(*self._chapter_from_row({
+                    'Código': codigos[idx], 'Resumen': resumenes[idx]
+                }))
+            else:
+                chapter_paths[idx] = tracker.path()
+        self.chapters = tracker.titles
+        
+        for idx, start, end in zip(main_positions.tolist(), sub_start, sub_end):
+            precio = precios[idx]
+            ud = uds[idx]
+            resumen = resumenes[idx]
+            values = dict(
+                codigo=str(codigos[idx]).strip(),
+                tipo=str(tipos[idx]),
+                ud=str(ud) if not pd.isna(ud) else '',
+                resumen=str(resumen).strip() if not pd.isna(resumen) else '',
+                precio=0.0 if pd.isna(precio) else precio,
+                row_index=idx,
+                sub_materials=sub_materials_by_owner.get(idx, []),
+                capitulos=chapter_paths[idx]
+            )
+            if lazy and self.wants_sub_materials:
+                main_material = LazyMainMaterial(
+                    **values,
+                    loader=functools.partial(self._sub_material_records, sub_positions[start:end].tolist(), columns),
+                    num_sub_materials=end - start
                 )
+            else:
+                main_material = MainMaterial(**values)
+            self.materials.append(main_material)
+            phase.advance(idx + 1, len(self.materials))
+            
+            if self.verbose:
+                print(f"Found main material: {main_material.codigo} with {main_material.num_sub_materials} sub-materials")
+        
+    def iter_materials(self, reader: Optional[str] = None) -> Iterator[MainMaterial]:
+        """
+        Stream main materials straight from the workbook without building a dataframe
+        
+        Only the material currently being assembled is held in memory, so this
+        works for workbooks of any size. Yields the same materials as parse_materials.
+        
+        Args:
+            reader: Workbook reader name, None picks one based on file size
+        """
+        current = None
+        found = 0
+        tracker = ChapterTracker()
+        self.chapters = tracker.titles
+        
+        # Reading and classification happen row by row, all within 'extract'
+        with self.progress.phase('extract') as phase:
+            for idx, values in enumerate(self.iter_data_rows(reader, streaming=True)):
+                row = dict.fromkeys(COLUMNS)
+                row.update(zip(self.columns, values))
                 
-                # Extract sub-materials
-                main_material.sub_materials = self.extract_sub_materials(idx)
-                
-                self.materials.append(main_material)
-                
-                print(f"Found main material: {main_material.codigo} with {len(main_material.sub_materials)} sub-materials")
+                if row['Tipo'] == 'Capítulo':
+                    # A chapter closes the current material
+                    tracker.chapter(*self._chapter_from_row(row))
+                    if current is not None:
+                        yield current
+                        current = None
+                elif self.is_main_material(row, idx):
+                    if current is not None:
+                        yield current
+                    current = self._main_material_from_row(row, idx)
+                    current.capitulos = tracker.path()
+                    found += 1
+                elif current is not None and self.wants_sub_materials and not self._is_empty_row(row):
+                    current.sub_materials.append(self._sub_material_from_row(row, idx))
+                phase.advance(idx + 1, found)
+            
+            if current is not None:
+                yield current
         
-        print(f"\nTotal main materials extracted: {len(self.materials)}")
+    def diff_against(self, previous: List[MainMaterial]):
+        """
+        Diff the parsed materials against a previous version of the database
         
+        Args:
+            previous: Materials parsed from the previous workbook
+            
+        Returns:
+            material_diff.MaterialDiff with added, removed and changed materials
+        """
+        from material_diff import diff_materials
+        return diff_materials(previous, self.materials)
+    
+    def get_chapter_index(self) -> ChapterIndex:
+        """Build the chapter tree of the parsed materials"""
+        return ChapterIndex.from_materials(self.materials, self.chapters)
+    
     def get_materials(self) -> List[MainMaterial]:
         """Return list of all parsed materials"""
         return self.materials
     
     def save_to_json(self, output_path: str):
-        """Save parsed materials to JSON for inspection"""
-        materials_dict = [m.to_dict() for m in self.materials]
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(materials_dict, f, ensure_ascii=False, indent=2)
+        """Save parsed materials to compact JSON, written one material at a time"""
+        write_json(self.materials, output_path)
         print(f"Saved parsed materials to {output_path}")
 
 
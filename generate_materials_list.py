@@ -3,38 +3,118 @@
 Generate a formatted text file of all materials for use with GPT matcher
 """
 
-from get_all_resumen import get_all_resumen
+from get_all_resumen import get_all_resumen, RESUMEN_FIELDS
+from material_diff import diff_materials, MaterialDiff
+from parse_cache import ParseCache
+from parse_progress import ParseProgress
+from typing import Dict, List, Optional
 import os
+import re
 
-def generate_materials_text_file(database_path: str, output_path: str):
+
+def format_material_entry(number: int, codigo: str, resumen: str) -> str:
+    """Format one numbered entry of the materials text file"""
+    return f"{number}. {codigo}\n   {resumen}\n\n"
+
+
+def write_materials_text(materials: List[Dict[str, str]], output_path: str):
+    """Write the materials text file from a list of {'codigo', 'resumen'} dicts"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(f"Total Materials: {len(materials)}\n")
+        f.write("=" * 100 + "\n\n")
+        
+        for i, material in enumerate(materials, 1):
+            f.write(format_material_entry(i, material['codigo'], material['resumen']))
+
+
+def generate_materials_text_file(database_path: str, output_path: str,
+                                 progress: Optional[ParseProgress] = None):
     """
     Generate a formatted text file from the database for GPT matcher
     
     Args:
         database_path: Path to the Excel database file
         output_path: Path where to save the text file
+        progress: Receives parse progress of the database (optional)
     """
     print("Loading materials from database...")
-    materials = get_all_resumen(database_path)
+    materials = get_all_resumen(database_path, progress=progress)
     
     print(f"Found {len(materials)} materials")
     print(f"Generating text file at: {output_path}")
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(f"Total Materials: {len(materials)}\n")
-        f.write("=" * 100 + "\n\n")
-        
-        for i, material in enumerate(materials, 1):
-            f.write(f"{i}. {material['codigo']}\n")
-            f.write(f"   {material['resumen']}\n\n")
+    write_materials_text(materials, output_path)
     
     print(f"✅ Successfully generated {output_path}")
     print(f"   File size: {os.path.getsize(output_path) / 1024:.2f} KB")
 
 
+def update_materials_text_file(database_path: str, output_path: str,
+                               progress: Optional[ParseProgress] = None) -> Optional[MaterialDiff]:
+    """
+    Bring the materials text file up to date with a new version of the database
+    
+    The new workbook is diffed against the version the file was last built from:
+    - no código/resumen changed: the file is left untouched
+    - only descriptions changed: just those entries are rewritten
+    - materials added/removed/reordered: the file is regenerated
+    
+    Args:
+        database_path: Path to the Excel database file
+        output_path: Path of the materials text file
+        progress: Receives parse progress when the database has to be parsed (optional)
+    
+    Returns:
+        The MaterialDiff that was applied, or None if the file was built from scratch
+    """
+    previous, materials = ParseCache().load_with_previous(database_path, fields=RESUMEN_FIELDS,
+                                                          progress=progress)
+    current = [{'codigo': m.codigo, 'resumen': m.resumen} for m in materials]
+    
+    if previous is None or not os.path.exists(output_path):
+        write_materials_text(current, output_path)
+        print(f"✅ Generated {output_path} ({len(current)} materials)")
+        return None
+    
+    diff = diff_materials(previous, materials)
+    
+    # The text file only shows código and resumen, price changes don't touch it
+    text_changes = [c for c in diff.changed if 'resumen' in c.changed_fields]
+    if not (diff.added or diff.removed or text_changes):
+        print(f"✅ {output_path} is up to date")
+        return diff
+    
+    same_order = [m.codigo for m in previous] == [m.codigo for m in materials]
+    if diff.added or diff.removed or not same_order:
+        write_materials_text(current, output_path)
+        print(f"✅ Regenerated {output_path}: {diff.summary()}")
+        return diff
+    
+    # Same materials in the same order, patch only the entries that changed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    header, *entries = re.split(r'(?m)^(?=\d+\. )', content)
+    
+    if len(entries) != len(materials):
+        write_materials_text(current, output_path)
+        print(f"✅ Regenerated {output_path}: {diff.summary()}")
+        return diff
+    
+    # Same códigos in the same order: entries line up with both versions
+    for i, (old, material) in enumerate(zip(previous, materials)):
+        if old.resumen != material.resumen:
+            entries[i] = format_material_entry(i + 1, material.codigo, material.resumen)
+    
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(header + ''.join(entries))
+    
+    print(f"✅ Patched {len(text_changes)} entries in {output_path}")
+    return diff
+
+
 if __name__ == '__main__':
     database_path = '/Users/danielsamuel/PycharmProjects/RAG/correct_sample/DATABSE.xlsx'
     output_path = '/Users/danielsamuel/PycharmProjects/RAG/materials_list.txt'
     
-    generate_materials_text_file(database_path, output_path)
-
+    # Only rewrites what changed since the database version the file was built from
+    update_materials_text_file(database_path, output_path)
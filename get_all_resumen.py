@@ -3,16 +3,58 @@
 Simple function to get all "Resumen" (descriptions) from the database
 """
 
-from excel_parser import ExcelDatabaseParser
-from typing import List, Dict
+from parse_cache import load_materials_cached
+from parse_progress import ParseProgress
+from typing import List, Dict, Optional
 
+# Fields each projection needs (see ExcelDatabaseParser's field projection)
+RESUMEN_FIELDS = ['codigo', 'resumen']
+TEXT_ONLY_FIELDS = ['resumen']
+DETAILS_FIELDS = None  # everything
 
-def get_all_resumen(database_path: str) -> List[Dict[str, str]]:
+
+def resumen_items(materials) -> List[Dict[str, str]]:
+    """'codigo' and 'resumen' of each material"""
+    all_resumen = []
+    
+    for material in materials:
+        all_resumen.append({
+            'codigo': material.codigo,
+            'resumen': material.resumen
+        })
+    
+    return all_resumen
+
+
+def resumen_text_items(materials) -> List[str]:
+    """Resumen of each material as plain text"""
+    return [material.resumen for material in materials]
+
+
+def resumen_detail_items(materials) -> List[Dict[str, any]]:
+    """Código, tipo, unit, resumen, price and sub-material count of each material"""
+    all_resumen = []
+    
+    for material in materials:
+        all_resumen.append({
+            'codigo': material.codigo,
+            'tipo': material.tipo,
+            'ud': material.ud,
+            'resumen': material.resumen,
+            'precio': material.precio,
+            'num_sub_materials': material.num_sub_materials
+        })
+    
+    return all_resumen
+
+
+def get_all_resumen(database_path: str, progress: Optional[ParseProgress] = None) -> List[Dict[str, str]]:
     """
     Get all "Resumen" (descriptions) from the construction materials database
     
     Args:
         database_path: Path to the Excel database file
+        progress: Receives parse progress on a parse cache miss (optional)
         
     Returns:
         List of dictionaries with 'codigo' and 'resumen' for each material
@@ -22,21 +64,11 @@ def get_all_resumen(database_path: str) -> List[Dict[str, str]]:
         >>> for item in resumenes:
         >>>     print(f"{item['codigo']}: {item['resumen']}")
     """
-    # Parse the database
-    parser = ExcelDatabaseParser(database_path)
-    parser.load_excel()
-    parser.parse_materials()
+    # Parse the database (served from the parse cache when unchanged)
+    materials = load_materials_cached(database_path, fields=RESUMEN_FIELDS, progress=progress)
     
     # Extract all resumen
-    all_resumen = []
-    
-    for material in parser.get_materials():
-        all_resumen.append({
-            'codigo': material.codigo,
-            'resumen': material.resumen
-        })
-    
-    return all_resumen
+    return resumen_items(materials)
 
 
 def get_all_resumen_text_only(database_path: str) -> List[str]:
@@ -54,13 +86,11 @@ def get_all_resumen_text_only(database_path: str) -> List[str]:
         >>> for resumen in resumenes:
         >>>     print(resumen)
     """
-    # Parse the database
-    parser = ExcelDatabaseParser(database_path)
-    parser.load_excel()
-    parser.parse_materials()
+    # Parse the database (served from the parse cache when unchanged)
+    materials = load_materials_cached(database_path, fields=TEXT_ONLY_FIELDS)
     
     # Extract all resumen as text only
-    return [material.resumen for material in parser.get_materials()]
+    return resumen_text_items(materials)
 
 
 def get_all_resumen_with_details(database_path: str) -> List[Dict[str, any]]:
@@ -78,25 +108,11 @@ def get_all_resumen_with_details(database_path: str) -> List[Dict[str, any]]:
         >>> for item in resumenes:
         >>>     print(f"{item['codigo']}: {item['resumen']} - {item['precio']}€")
     """
-    # Parse the database
-    parser = ExcelDatabaseParser(database_path)
-    parser.load_excel()
-    parser.parse_materials()
+    # Parse the database (served from the parse cache when unchanged)
+    materials = load_materials_cached(database_path, fields=DETAILS_FIELDS)
     
     # Extract all resumen with details
-    all_resumen = []
-    
-    for material in parser.get_materials():
-        all_resumen.append({
-            'codigo': material.codigo,
-            'tipo': material.tipo,
-            'ud': material.ud,
-            'resumen': material.resumen,
-            'precio': material.precio,
-            'num_sub_materials': len(material.sub_materials)
-        })
-    
-    return all_resumen
+    return resumen_detail_items(materials)
 
 
 # Example usage
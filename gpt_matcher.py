@@ -1,5 +1,7 @@
 import os
-from typing import List, Dict, Optional
+import socket
+import threading
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import json
 from openai import OpenAI
@@ -9,6 +11,41 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Seconds between two checks of the cancel event while a streamed answer is awaited
+CANCEL_POLL_SECONDS = 0.1
+
+
+class SearchCancelled(Exception):
+    """Raised by find_best_match when its cancel event is set"""
+
+
+def _abort_stream(stream):
+    """
+    Close a streamed response from another thread
+    
+    The socket is shut down first: closing it alone does not wake the thread
+    blocked reading it (e.g. while the first token is awaited).
+    """
+    network_stream = stream.response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    else:
+        stream.response.close()
+
+
+def _close_on_cancel(stream, cancel: threading.Event, finished: threading.Event):
+    """Watcher thread: abort stream as soon as cancel is set, until finished is"""
+    while not finished.is_set():
+        if cancel.wait(CANCEL_POLL_SECONDS):
+            if not finished.is_set():
+                _abort_stream(stream)
+            return
+
+
 @dataclass
 class ConstructionItem:
     """Represents a construction work item"""
@@ -23,17 +60,20 @@ class GPTConstructionMatcher:
     This uses the LLM's reasoning capabilities instead of embeddings.
     """
     
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(self, api_key: str, model: str = "gpt-4o", client: Optional[OpenAI] = None):
         """
         Initialize the GPT matcher.
         
         Args:
             api_key: OpenAI API key
+            client: OpenAI client to reuse (optional, a new one is created by default)
    
         """
-        self.client = OpenAI(api_key=api_key)
+        self.client = client or OpenAI(api_key=api_key)
         self.model = model
         self.items: List[ConstructionItem] = []
+        # (items, prompt text) of the last items_text() call, one tuple so threads never see half of it
+        self._items_text = (None, "")
     
     def parse_list(self, list_text: str) -> List[ConstructionItem]:
         """
@@ -104,25 +144,133 @@ class GPTConstructionMatcher:
         self.items = items
         return items
     
-    def find_best_match(self, user_description: str, top_k: int = 5) -> Dict:
+    @staticmethod
+    def format_items(items: List[ConstructionItem]) -> str:
+        """
+        Format items for the prompt.
+        
+        Args:
+            items: Items to list
+            
+        Returns:
+            One numbered entry per item
+        """
+        return "\n".join([
+            f"{item.number}. Code: {item.code}\n   Description: {item.description}"
+            for item in items
+        ])
+    
+    def items_text(self) -> str:
+        """
+        Prompt text of all loaded items, formatted once and reused by every search.
+        
+        Returns:
+            format_items(self.items)
+        """
+        items = self.items
+        cached_items, text = self._items_text
+        if cached_items is not items:
+            text = self.format_items(items)
+            self._items_text = (items, text)
+        return text
+    
+    def _complete(self, messages: List[Dict], cancel: Optional[threading.Event] = None) -> Tuple[str, int]:
+        """
+        Run the chat completion.
+        
+        With a cancel event the completion is streamed, and a watcher thread
+        closes the stream's connection as soon as the event is set, even while
+        no chunk arrives (e.g. before the first token). That stops the
+        generation (and its billing) upstream.
+        
+        Args:
+            messages: Chat messages
+            cancel: Event set when the answer is no longer wanted (optional)
+            
+        Returns:
+            Tuple of (response text, total tokens)
+        
+        Raises:
+            SearchCancelled: If cancel was set before the answer was complete
+        """
+        if cancel is None:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.3  # Lower temperature for more consistent results
+                # Note: response_format may not work with fine-tuned models
+            )
+            return response.choices[0].message.content, response.usage.total_tokens
+        
+        if cancel.is_set():
+            raise SearchCancelled()
+        
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+            # Usage comes in a last chunk (passed raw, older SDKs lack the parameter)
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        parts = []
+        total_tokens = 0
+        finished = threading.Event()
+        threading.Thread(target=_close_on_cancel, args=(stream, cancel, finished), daemon=True,
+                         name="completion-cancel").start()
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    raise SearchCancelled()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    total_tokens = usage["total_tokens"] if isinstance(usage, dict) else usage.total_tokens
+        except SearchCancelled:
+            raise
+        except Exception:
+            # The watcher cut the connection under the read
+            if cancel.is_set():
+                raise SearchCancelled()
+            raise
+        finally:
+            finished.set()
+            stream.close()
+        if cancel.is_set():
+            # Cut before the stream's last event, the answer may be incomplete
+            raise SearchCancelled()
+        return "".join(parts), total_tokens
+    
+    def find_best_match(self, user_description: str, top_k: int = 5,
+                        items: Optional[List[ConstructionItem]] = None,
+                        items_text: Optional[str] = None,
+                        cancel: Optional[threading.Event] = None) -> Dict:
         """
         Use GPT to find the best matching construction item.
         
         Args:
             user_description: The construction work description from the user
             top_k: Number of top matches to return
+            items: Candidate items to search (defaults to all loaded items)
+            items_text: format_items(items), to reuse it across searches of the same items
+            cancel: Event to set from another thread to abort the call (optional)
             
         Returns:
             Dictionary with matching results
+        
+        Raises:
+            SearchCancelled: If cancel was set before GPT answered
         """
         if not self.items:
             raise ValueError("No items loaded. Call parse_list() first.")
         
+        if items is None:
+            items = self.items
+        
         # Create a formatted list of items for the prompt
-        items_text = "\n".join([
-            f"{item.number}. Code: {item.code}\n   Description: {item.description}"
-            for item in self.items
-        ])
+        if items_text is None:
+            items_text = self.items_text() if items is self.items else self.format_items(items)
         
         # Create the prompt for GPT
         prompt = f"""You are a senior construction estimator and materials expert with over 20 years of field experience.
@@ -176,18 +324,10 @@ INSTRUCCIONES DE RESPUESTA:
 
         try:
             # Call GPT
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert construction work classification assistant. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3  # Lower temperature for more consistent results
-                # Note: response_format may not work with fine-tuned models
-            )
-            
-            # Parse the response
-            result_text = response.choices[0].message.content
+            result_text, total_tokens = self._complete([
+                {"role": "system", "content": "You are an expert construction work classification assistant. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ], cancel)
             
             # Strip markdown code blocks if present
             if result_text.startswith('```'):
@@ -203,10 +343,12 @@ INSTRUCCIONES DE RESPUESTA:
             # Add metadata
             result["input"] = user_description
             result["model_used"] = self.model
-            result["total_tokens"] = response.usage.total_tokens
+            result["total_tokens"] = total_tokens
             
             return result
             
+        except SearchCancelled:
+            raise
         except Exception as e:
             return {
                 "error": str(e),
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings of the production server
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+# Worker processes, each with a pool of request threads (searches mostly
+# wait on the LLM, so threads keep a worker busy cheaply)
+workers = int(os.getenv('WEB_WORKERS', '4'))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '8'))
+
+# Import wsgi.py (which preloads the catalog) in the master before forking
+preload_app = True
+
+# Searches stream until the LLM has answered
+timeout = int(os.getenv('WEB_TIMEOUT', '180'))
+
+
+def when_ready(server):
+    if workers > 1 and os.getenv('SESSION_BACKEND', 'local') == 'local':
+        server.log.warning("SESSION_BACKEND is 'local' with %d workers: uploaded lists only work "
+                           "on the worker that received them, set a sqlite:// or redis:// backend", workers)
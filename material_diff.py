@@ -0,0 +1,134 @@
+"""
+Diff two versions of the construction materials database by Código
+Used to update downstream artifacts (materials_list.txt, ...) incrementally
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from excel_parser import MainMaterial, SubMaterial
+
+# Main material fields compared between versions (row_index is ignored,
+# it shifts whenever rows are inserted above a material)
+COMPARED_FIELDS = ('tipo', 'ud', 'resumen', 'precio', 'capitulos')
+
+# A material is identified by its código plus its occurrence number, because
+# the same código can appear more than once in a workbook
+MaterialKey = Tuple[str, int]
+
+
+def _sub_material_key(sm: SubMaterial) -> Tuple:
+    return (sm.codigo, sm.tipo, sm.ud, sm.resumen, sm.cantidad, sm.precio, sm.importe)
+
+
+def _keyed(materials: List[MainMaterial]) -> Dict[MaterialKey, MainMaterial]:
+    seen: Counter = Counter()
+    keyed = {}
+    for material in materials:
+        keyed[(material.codigo, seen[material.codigo])] = material
+        seen[material.codigo] += 1
+    return keyed
+
+
+@dataclass
+class MaterialChange:
+    """A material present in both versions whose content changed"""
+    codigo: str
+    old: MainMaterial
+    new: MainMaterial
+    changed_fields: List[str]
+    sub_materials_added: List[SubMaterial] = field(default_factory=list)
+    sub_materials_removed: List[SubMaterial] = field(default_factory=list)
+    
+    @property
+    def price_delta(self) -> float:
+        """New price minus old price"""
+        return self.new.precio - self.old.precio
+
+
+@dataclass
+class MaterialDiff:
+    """Added, removed and changed materials between two database versions"""
+    added: List[MainMaterial] = field(default_factory=list)
+    removed: List[MainMaterial] = field(default_factory=list)
+    changed: List[MaterialChange] = field(default_factory=list)
+    
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+    
+    def summary(self) -> Dict[str, int]:
+        """Counts per change type"""
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'changed': len(self.changed),
+            'price_changes': sum(1 for c in self.changed if 'precio' in c.changed_fields),
+            'sub_material_changes': sum(1 for c in self.changed if 'sub_materials' in c.changed_fields),
+        }
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'summary': self.summary(),
+            'added': [m.codigo for m in self.added],
+            'removed': [m.codigo for m in self.removed],
+            'changed': [
+                {
+                    'codigo': c.codigo,
+                    'changed_fields': c.changed_fields,
+                    'old_precio': c.old.precio,
+                    'new_precio': c.new.precio,
+                    'sub_materials_added': len(c.sub_materials_added),
+                    'sub_materials_removed': len(c.sub_materials_removed),
+                }
+                for c in self.changed
+            ],
+        }
+
+
+def diff_materials(old: List[MainMaterial], new: List[MainMaterial]) -> MaterialDiff:
+    """
+    Compare two parsed versions of the database by código
+    
+    Args:
+        old: Materials of the previous version
+        new: Materials of the new version
+    
+    Returns:
+        MaterialDiff (lists follow the order of the new version, removals the old one)
+    """
+    old_keyed = _keyed(old)
+    new_keyed = _keyed(new)
+    diff = MaterialDiff()
+    
+    for key, material in new_keyed.items():
+        previous = old_keyed.get(key)
+        if previous is None:
+            diff.added.append(material)
+            continue
+        
+        changed_fields = [f for f in COMPARED_FIELDS if getattr(previous, f) != getattr(material, f)]
+        
+        old_subs = Counter(_sub_material_key(sm) for sm in previous.sub_materials)
+        new_subs = Counter(_sub_material_key(sm) for sm in material.sub_materials)
+        added_keys = new_subs - old_subs
+        removed_keys = old_subs - new_subs
+        if added_keys or removed_keys:
+            changed_fields.append('sub_materials')
+        
+        if changed_fields:
+            diff.changed.append(MaterialChange(
+                codigo=material.codigo,
+                old=previous,
+                new=material,
+                changed_fields=changed_fields,
+                sub_materials_added=[sm for sm in material.sub_materials
+                                     if added_keys.get(_sub_material_key(sm))],
+                sub_materials_removed=[sm for sm in previous.sub_materials
+                                       if removed_keys.get(_sub_material_key(sm))],
+            ))
+    
+    diff.removed = [material for key, material in old_keyed.items() if key not in new_keyed]
+    
+    return diff
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Streaming exports of parsed materials: NDJSON, compact JSON and Parquet
+Materials are written one record (or one small batch) at a time, to a file,
+an open stream, or stdout
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+FORMATS = ('ndjson', 'json', 'parquet')
+
+# File extension -> export format
+EXTENSIONS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'json',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+
+# Materials per Parquet row group
+PARQUET_BATCH_SIZE = 1000
+
+SUB_MATERIAL_FIELDS = ('codigo', 'tipo', 'ud', 'resumen', 'cantidad', 'precio', 'importe', 'row_index')
+
+
+def material_record(material) -> Dict[str, Any]:
+    """
+    Plain dictionary of a material, same content as MainMaterial.to_dict()
+    
+    Works for MainMaterial and MaterialTable views, and avoids the recursive
+    copy dataclasses.asdict makes of every sub-material.
+    """
+    return {
+        'codigo': material.codigo,
+        'tipo': material.tipo,
+        'ud': material.ud,
+        'resumen': material.resumen,
+        'precio': material.precio,
+        'row_index': material.row_index,
+        'sub_materials': [
+            {name: getattr(sm, name) for name in SUB_MATERIAL_FIELDS}
+            for sm in material.sub_materials
+        ],
+        'capitulos': list(material.capitulos),
+    }
+
+
+def format_for(path: str) -> str:
+    """Export format matching a file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Cannot tell the export format of {path}, expected one of {sorted(EXTENSIONS)}")
+    return EXTENSIONS[extension]
+
+
+@contextlib.contextmanager
+def open_output(output):
+    """
+    Binary stream for an output target
+    
+    Args:
+        output: File path, '-' or None for stdout, or an open stream
+            (text streams are written through their binary buffer)
+    """
+    if output is None or output == '-':
+        yield sys.stdout.buffer
+    elif isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as f:
+            yield f
+    elif isinstance(output, io.TextIOBase):
+        output.flush()
+        yield output.buffer
+    else:
+        yield output
+
+
+def _dumps(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), check_circular=False).encode('utf-8')
+
+
+def write_ndjson(materials: Iterable, output=None) -> int:
+    """
+    Write one JSON object per line
+    
+    Returns:
+        Number of materials written
+    """
+    count = 0
+    with open_output(output) as out:
+        for material in materials:
+            out.write(_dumps(material_record(material)) + b'\n')
+            count += 1
+        out.flush()
+    return count
+
+
+def write_json(materials: Iterable, output=None) -> int:
+    """
+    Write a compact JSON array (no indentation), one material at a time
+    
+    Returns:
+        Number of materials written
+    """
+    count = 0
+    with open_output(output) as out:
+        out.write(b'[')
+        for material in materials:
+            if count:
+                out.write(b',')
+            out.write(_dumps(material_record(material)))
+            count += 1
+        out.write(b']\n')
+        out.flush()
+    return count
+
+
+def parquet_schema():
+    """Parquet schema: one row per material, sub-materials as a nested list column"""
+    import pyarrow as pa
+    
+    sub_material = pa.struct([
+        ('codigo', pa.string()),
+        ('tipo', pa.string()),
+        ('ud', pa.string()),
+        ('resumen', pa.string()),
+        ('cantidad', pa.float64()),
+        ('precio', pa.float64()),
+        ('importe', pa.float64()),
+        ('row_index', pa.int64()),
+    ])
+    return pa.schema([
+        ('codigo', pa.string()),
+        ('tipo', pa.string()),
+        ('ud', pa.string()),
+        ('resumen', pa.string()),
+        ('precio', pa.float64()),
+        ('row_index', pa.int64()),
+        ('sub_materials', pa.list_(sub_material)),
+        ('capitulos', pa.list_(pa.string())),
+    ])
+
+
+def _batches(records: Iterator[Dict[str, Any]], size: int) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_parquet(materials: Iterable, output=None, batch_size: int = PARQUET_BATCH_SIZE) -> int:
+    """
+    Write a Parquet file with a nested sub_materials column
+    
+    Only batch_size materials are held at a time, each batch is one row group.
+    Parquet is written sequentially, so pipes and stdout work too.
+    
+    Returns:
+        Number of materials written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = parquet_schema()
+    count = 0
+    with open_output(output) as out:
+        with pq.ParquetWriter(out, schema) as writer:
+            for batch in _batches((material_record(m) for m in materials), batch_size):
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        out.flush()
+    return count
+
+
+WRITERS = {
+    'ndjson': write_ndjson,
+    'json': write_json,
+    'parquet': write_parquet,
+}
+
+
+def export_materials(materials: Iterable, output=None, fmt: Optional[str] = None) -> int:
+    """
+    Stream materials to a file, an open stream or stdout
+    
+    Args:
+        materials: Materials (a list or a generator such as parser.iter_materials())
+        output: File path, '-' or None for stdout, or an open stream
+        fmt: 'ndjson', 'json' or 'parquet', taken from the file extension if omitted
+    
+    Returns:
+        Number of materials written
+    """
+    if fmt is None:
+        if not isinstance(output, (str, os.PathLike)) or output == '-':
+            raise ValueError("An export format is needed when writing to a stream")
+        fmt = format_for(output)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return WRITERS[fmt](materials, output)
+
+
+def iter_database(path: str, reader: Optional[str] = None, sheet=0) -> Iterator:
+    """Stream the materials of a database file (.bc3, or a workbook/CSV/Parquet export)"""
+    if path.lower().endswith('.bc3'):
+        from bc3_parser import Bc3DatabaseParser
+        parser = Bc3DatabaseParser(path)
+        parser.load_bc3()
+        return parser.iter_materials()
+    
+    from excel_parser import ExcelDatabaseParser
+    return ExcelDatabaseParser(path, sheet=sheet).iter_materials(reader)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export the materials of a database file")
+    arg_parser.add_argument('database', help='.xlsx, .csv, .parquet or .bc3 database')
+    arg_parser.add_argument('-o', '--output', default='-', help="Output file, '-' for stdout (default)")
+    arg_parser.add_argument('-f', '--format', choices=FORMATS,
+                            help='Export format (default: from the output extension, ndjson for stdout)')
+    arg_parser.add_argument('--reader', choices=['openpyxl', 'calamine', 'pandas'],
+                            help='Workbook reader (default: picked from file size)')
+    arg_parser.add_argument('--sheet', default=0, help='Sheet index or name')
+    args = arg_parser.parse_args()
+    
+    fmt = args.format or ('ndjson' if args.output == '-' else format_for(args.output))
+    sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+    
+    # Resolve stdout before parser progress is redirected to stderr,
+    # so progress lines never mix with exported data
+    output = sys.stdout.buffer if args.output == '-' else args.output
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            materials = iter_database(args.database, args.reader, sheet)
+            count = export_materials(materials, output, fmt)
+    except BrokenPipeError:
+        # The reading end closed early (e.g. piped into head)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    
+    print(f"Exported {count} materials as {fmt}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""
+Compact columnar representation of parsed materials
+A MaterialTable stores materials as a struct of NumPy arrays with interned
+string pools, and hands out lightweight views with the same attributes as
+MainMaterial / SubMaterial
+"""
+import sys
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from excel_parser import LazyMainMaterial, MainMaterial, SubMaterial
+
+# A main material as plain values: (codigo, tipo, ud, resumen, precio, row_index,
+# sub-material records, capitulos), each sub-material record holding the
+# SubMaterial fields in order (codigo, tipo, ud, resumen, cantidad, precio, importe, row_index)
+MaterialRecord = Tuple
+
+
+def material_records(materials: Iterable) -> Iterator[MaterialRecord]:
+    """
+    Plain-value records of materials (MainMaterial objects or MaterialTable views)
+    
+    Sub-materials of a lazy parse that were never accessed are read as plain
+    values, without building their SubMaterial objects.
+    """
+    for m in materials:
+        if isinstance(m, LazyMainMaterial) and not m.is_hydrated:
+            subs = m.sub_material_records()
+        else:
+            subs = [(s.codigo, s.tipo, s.ud, s.resumen, s.cantidad, s.precio, s.importe, s.row_index)
+                    for s in m.sub_materials]
+        yield (m.codigo, m.tipo, m.ud, m.resumen, m.precio, m.row_index, subs, m.capitulos)
+
+
+class StringPool:
+    """Interns strings and maps them to int32 ids (-1 stands for None)"""
+    
+    __slots__ = ('strings', '_ids')
+    
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Optional[Dict[str, int]] = {}
+    
+    def __getstate__(self):
+        # Only the strings are sent to other processes, the lookup is rebuilt on the next add
+        return self.strings
+    
+    def __setstate__(self, strings: List[str]):
+        self.strings = strings
+        self._ids = None
+    
+    def add(self, value: Optional[str]) -> int:
+        """Return the id of a string, adding it to the pool if needed"""
+        if value is None:
+            return -1
+        if self._ids is None:
+            self._ids = {string: i for i, string in enumerate(self.strings)}
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+    
+    def get(self, string_id: int) -> Optional[str]:
+        """Return the string for an id"""
+        return None if string_id < 0 else self.strings[string_id]
+    
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+class SubMaterialView:
+    """Read-only view of one sub-material row of a MaterialTable"""
+    
+    __slots__ = ('_table', '_i')
+    
+    def __init__(self, table: 'MaterialTable', i: int):
+        self._table = table
+        self._i = i
+    
+    @property
+    def _resource(self) -> Tuple[int, int, int, int]:
+        return self._table.resources[self._table.sub_resource[self._i]]
+    
+    @property
+    def codigo(self) -> Optional[str]:
+        return self._table.strings.get(self._resource[0])
+    
+    @property
+    def tipo(self) -> Optional[str]:
+        return self._table.strings.get(self._resource[1])
+    
+    @property
+    def ud(self) -> Optional[str]:
+        return self._table.strings.get(self._resource[2])
+    
+    @property
+    def resumen(self) -> str:
+        return self._table.strings.get(self._resource[3])
+    
+    @property
+    def cantidad(self) -> Optional[float]:
+        return _optional_float(self._table.sub_cantidad[self._i])
+    
+    @property
+    def precio(self) -> Optional[float]:
+        return _optional_float(self._table.sub_precio[self._i])
+    
+    @property
+    def importe(self) -> Optional[float]:
+        return _optional_float(self._table.sub_importe[self._i])
+    
+    @property
+    def row_index(self) -> int:
+        return int(self._table.sub_row_index[self._i])
+    
+    def to_sub_material(self) -> SubMaterial:
+        """Materialize as a SubMaterial dataclass"""
+        return SubMaterial(
+            codigo=self.codigo,
+            tipo=self.tipo,
+            ud=self.ud,
+            resumen=self.resumen,
+            cantidad=self.cantidad,
+            precio=self.precio,
+            importe=self.importe,
+            row_index=self.row_index
+        )
+
+
+class MainMaterialView:
+    """Read-only view of one main material of a MaterialTable"""
+    
+    __slots__ = ('_table', '_i')
+    
+    def __init__(self, table: 'MaterialTable', i: int):
+        self._table = table
+        self._i = i
+    
+    @property
+    def codigo(self) -> str:
+        return self._table.strings.get(self._table.codigo[self._i])
+    
+    @property
+    def tipo(self) -> str:
+        return self._table.strings.get(self._table.tipo[self._i])
+    
+    @property
+    def ud(self) -> str:
+        return self._table.strings.get(self._table.ud[self._i])
+    
+    @property
+    def resumen(self) -> str:
+        return self._table.strings.get(self._table.resumen[self._i])
+    
+    @property
+    def precio(self) -> float:
+        return float(self._table.precio[self._i])
+    
+    @property
+    def row_index(self) -> int:
+        return int(self._table.row_index[self._i])
+    
+    @property
+    def capitulos(self) -> Tuple[str, ...]:
+        return self._table.chapter_paths[self._table.capitulos[self._i]]
+    
+    @property
+    def capitulo(self) -> Optional[str]:
+        capitulos = self.capitulos
+        return capitulos[-1] if capitulos else None
+    
+    @property
+    def sub_materials(self) -> List[SubMaterialView]:
+        start, end = self._table.sub_offsets[self._i:self._i + 2]
+        return [SubMaterialView(self._table, j) for j in range(start, end)]
+    
+    @property
+    def num_sub_materials(self) -> int:
+        return int(self._table.sub_offsets[self._i + 1] - self._table.sub_offsets[self._i])
+    
+    def to_material(self) -> MainMaterial:
+        """Materialize as a MainMaterial dataclass"""
+        return MainMaterial(
+            codigo=self.codigo,
+            tipo=self.tipo,
+            ud=self.ud,
+            resumen=self.resumen,
+            precio=self.precio,
+            row_index=self.row_index,
+            sub_materials=[sm.to_sub_material() for sm in self.sub_materials],
+            capitulos=self.capitulos
+        )
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return self.to_material().to_dict()
+
+
+class MaterialTable:
+    """
+    Struct-of-arrays storage for main materials and their sub-materials
+    
+    - Strings live once in a shared StringPool, columns hold int32 ids
+    - Prices and quantities are float64 arrays (NaN for missing values)
+    - Sub-materials of material i are rows sub_offsets[i]:sub_offsets[i + 1] (CSR)
+    - Repeated components (same codigo/tipo/ud/resumen) share one resource entry
+    - Chapter paths are stored once in chapter_paths, materials hold their id
+    """
+    
+    def __init__(self):
+        self.strings = StringPool()
+        self.resources: List[Tuple[int, int, int, int]] = []
+        self.chapter_paths: List[Tuple[str, ...]] = []
+        self.codigo = np.empty(0, dtype=np.int32)
+        self.tipo = np.empty(0, dtype=np.int32)
+        self.ud = np.empty(0, dtype=np.int32)
+        self.resumen = np.empty(0, dtype=np.int32)
+        self.precio = np.empty(0, dtype=np.float64)
+        self.row_index = np.empty(0, dtype=np.int32)
+        self.capitulos = np.empty(0, dtype=np.int32)
+        self.sub_offsets = np.zeros(1, dtype=np.int64)
+        self.sub_resource = np.empty(0, dtype=np.int32)
+        self.sub_cantidad = np.empty(0, dtype=np.float64)
+        self.sub_precio = np.empty(0, dtype=np.float64)
+        self.sub_importe = np.empty(0, dtype=np.float64)
+        self.sub_row_index = np.empty(0, dtype=np.int32)
+    
+    @classmethod
+    def from_materials(cls, materials: List[MainMaterial]) -> 'MaterialTable':
+        """Build a table from parsed MainMaterial objects"""
+        return cls.from_records(material_records(materials))
+    
+    @classmethod
+    def from_records(cls, records: Iterable[MaterialRecord]) -> 'MaterialTable':
+        """
+        Build a table from plain-value records (see material_records)
+        
+        Sub-material rows go straight into the arrays, no SubMaterial object is built.
+        """
+        table = cls()
+        strings = table.strings
+        resource_ids: Dict[Tuple[int, int, int, int], int] = {}
+        path_ids: Dict[Tuple[str, ...], int] = {}
+        
+        codigo, tipo, ud, resumen, precio, row_index, capitulos = [], [], [], [], [], [], []
+        offsets = [0]
+        sub_resource, sub_cantidad, sub_precio, sub_importe, sub_row_index = [], [], [], [], []
+        
+        def as_float(value: Optional[float]) -> float:
+            return np.nan if value is None else value
+        
+        for m_codigo, m_tipo, m_ud, m_resumen, m_precio, m_row_index, subs, m_capitulos in records:
+            codigo.append(strings.add(m_codigo))
+            tipo.append(strings.add(m_tipo))
+            ud.append(strings.add(m_ud))
+            resumen.append(strings.add(m_resumen))
+            precio.append(m_precio)
+            row_index.append(m_row_index)
+            
+            path = tuple(m_capitulos)
+            if path not in path_ids:
+                path_ids[path] = len(table.chapter_paths)
+                table.chapter_paths.append(path)
+            capitulos.append(path_ids[path])
+            
+            for s_codigo, s_tipo, s_ud, s_resumen, s_cantidad, s_precio, s_importe, s_row_index in subs:
+                resource = (strings.add(s_codigo), strings.add(s_tipo),
+                            strings.add(s_ud), strings.add(s_resumen))
+                resource_id = resource_ids.get(resource)
+                if resource_id is None:
+                    resource_id = len(table.resources)
+                    resource_ids[resource] = resource_id
+                    table.resources.append(resource)
+                
+                sub_resource.append(resource_id)
+                sub_cantidad.append(as_float(s_cantidad))
+                sub_precio.append(as_float(s_precio))
+                sub_importe.append(as_float(s_importe))
+                sub_row_index.append(s_row_index)
+            
+            offsets.append(len(sub_resource))
+        
+        table.codigo = np.array(codigo, dtype=np.int32)
+        table.tipo = np.array(tipo, dtype=np.int32)
+        table.ud = np.array(ud, dtype=np.int32)
+        table.resumen = np.array(resumen, dtype=np.int32)
+        table.precio = np.array(precio, dtype=np.float64)
+        table.row_index = np.array(row_index, dtype=np.int32)
+        table.capitulos = np.array(capitulos, dtype=np.int32)
+        table.sub_offsets = np.array(offsets, dtype=np.int64)
+        table.sub_resource = np.array(sub_resource, dtype=np.int32)
+        table.sub_cantidad = np.array(sub_cantidad, dtype=np.float64)
+        table.sub_precio = np.array(sub_precio, dtype=np.float64)
+        table.sub_importe = np.array(sub_importe, dtype=np.float64)
+        table.sub_row_index = np.array(sub_row_index, dtype=np.int32)
+        
+        return table
+    
+    def __len__(self) -> int:
+        return len(self.codigo)
+    
+    def __getitem__(self, i: Union[int, slice]) -> Union[MainMaterialView, List[MainMaterialView]]:
+        if isinstance(i, slice):
+            return [MainMaterialView(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("MaterialTable index out of range")
+        return MainMaterialView(self, i)
+    
+    def __iter__(self) -> Iterator[MainMaterialView]:
+        for i in range(len(self)):
+            yield MainMaterialView(self, i)
+    
+    @property
+    def num_sub_materials(self) -> int:
+        """Total number of sub-material rows"""
+        return len(self.sub_resource)
+    
+    def to_materials(self) -> List[MainMaterial]:
+        """Materialize the whole table as MainMaterial dataclasses"""
+        return [view.to_material() for view in self]
+    
+    def nbytes(self) -> int:
+        """Approximate memory used by the table (arrays + string pool)"""
+        arrays = (self.codigo, self.tipo, self.ud, self.resumen, self.precio, self.row_index, self.capitulos,
+                  self.sub_offsets, self.sub_resource, self.sub_cantidad, self.sub_precio,
+                  self.sub_importe, self.sub_row_index)
+        strings = sum(sys.getsizeof(s) for s in self.strings.strings)
+        resources = sys.getsizeof(self.resources) + sum(sys.getsizeof(r) for r in self.resources)
+        return sum(a.nbytes for a in arrays) + strings + resources
@@ -0,0 +1,141 @@
+"""
+Parallel parsing of several sheets and workbooks with a process pool
+Each worker reads and parses one whole sheet, and sends back only its
+materials as a compact snapshot
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from excel_parser import ExcelDatabaseParser
+from parse_cache import materials_to_snapshot, read_snapshot
+from workbook_readers import Source, is_path, select_reader
+
+
+@dataclass
+class SheetResult:
+    """Materials parsed from one sheet of one workbook"""
+    excel_path: Source
+    sheet: Union[int, str]
+    materials: Sequence = field(default_factory=list)  # MaterialTable once parsed
+    chapters: Dict[str, str] = field(default_factory=dict)
+
+
+def _parse_sheet(excel_path: Source, sheet, fields, reader: Optional[str]) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Worker task: read and parse one sheet
+    
+    Sheets are parsed where they were read: only the materials travel back,
+    as a snapshot, never the rows of the sheet. A sheet's read can't be split
+    (workbook XML is streamed from its start), so a sheet is never chunked.
+    
+    Returns:
+        Tuple of (snapshot, None), or (None, reason) for sheets without the database header
+    """
+    parser = ExcelDatabaseParser(excel_path, fields=fields, sheet=sheet)
+    try:
+        parser.load_excel(reader)
+    except ValueError as e:
+        return None, str(e)
+    # Sub-rows go straight from the sheet's columns into the snapshot
+    parser.parse_materials(vectorized=True, lazy=True)
+    return materials_to_snapshot(parser.get_materials(), parser.chapters), None
+
+
+def list_sheets(excel_paths: Iterable[Source], sheets: Optional[List[Union[int, str]]] = None,
+                reader: Optional[str] = None) -> List[Tuple[Source, Union[int, str]]]:
+    """(workbook, sheet) pairs to parse, in workbook order then sheet order"""
+    tasks = []
+    for excel_path in excel_paths:
+        sheet_list = sheets if sheets is not None else select_reader(excel_path, reader).sheet_names()
+        tasks.extend((excel_path, sheet) for sheet in sheet_list)
+    return tasks
+
+
+def parse_sheets_parallel(tasks: List[Tuple[Source, Union[int, str]]],
+                          fields: Optional[Iterable[str]] = None,
+                          reader: Optional[str] = None,
+                          max_workers: Optional[int] = None) -> List[SheetResult]:
+    """
+    Parse sheets concurrently
+    
+    Workers only start when there is more than one sheet and every workbook
+    is a path; a single sheet, or an upload stream, is parsed in this process.
+    
+    Args:
+        tasks: (workbook, sheet) pairs (see list_sheets)
+        fields: MainMaterial fields needed (see ExcelDatabaseParser)
+        reader: Workbook reader name, None picks one based on file size
+        max_workers: Number of worker processes (defaults to the CPU count)
+    
+    Returns:
+        One SheetResult per parsed sheet, in task order
+        (sheets without a 'Código'/'Tipo' header are skipped)
+    
+    Raises:
+        ValueError: If no sheet has the header
+    """
+    fields = list(fields) if fields is not None else None
+    
+    if len(tasks) > 1 and all(is_path(excel_path) for excel_path, _ in tasks):
+        with ProcessPoolExecutor(max_workers=min(len(tasks), max_workers or os.cpu_count())) as pool:
+            futures = [pool.submit(_parse_sheet, excel_path, sheet, fields, reader) for excel_path, sheet in tasks]
+            outcomes = [future.result() for future in futures]
+    else:
+        outcomes = [_parse_sheet(excel_path, sheet, fields, reader) for excel_path, sheet in tasks]
+    
+    results = []
+    for (excel_path, sheet), (snapshot, skipped) in zip(tasks, outcomes):
+        if snapshot is None:
+            print(f"Skipping sheet {sheet!r} of {excel_path}: {skipped}")
+            continue
+        materials, chapters = read_snapshot(snapshot)
+        results.append(SheetResult(excel_path, sheet, materials, chapters))
+    
+    if tasks and not results:
+        # Same error as a single-sheet parse, rather than an empty database
+        raise ValueError(outcomes[0][1])
+    
+    print(f"Parsed {sum(len(r.materials) for r in results)} main materials "
+          f"from {len(results)} sheets")
+    return results
+
+
+def parse_workbooks_parallel(excel_paths: Iterable[Source],
+                             sheets: Optional[List[Union[int, str]]] = None,
+                             fields: Optional[Iterable[str]] = None,
+                             reader: Optional[str] = None,
+                             max_workers: Optional[int] = None) -> List[SheetResult]:
+    """
+    Parse every sheet of every workbook concurrently
+    
+    Args:
+        excel_paths: Workbooks to parse (paths, or seekable binary file objects)
+        sheets: Sheets to parse in each workbook, None parses all of them
+        fields, reader, max_workers: See parse_sheets_parallel
+    
+    Returns:
+        One SheetResult per parsed sheet, in workbook order then sheet order
+    """
+    return parse_sheets_parallel(list_sheets(excel_paths, sheets, reader), fields, reader, max_workers)
+
+
+def merge_sheets(results: List[SheetResult]) -> Tuple[List, Dict[str, str]]:
+    """Materials (in stable order) and chapter titles of parsed sheets"""
+    materials = []
+    chapters = {}
+    for result in results:
+        materials.extend(result.materials)
+        chapters.update(result.chapters)
+    return materials, chapters
+
+
+def parse_all_materials_parallel(excel_paths: Iterable[Source], **kwargs) -> Tuple[List, Dict[str, str]]:
+    """
+    Parse workbooks in parallel and merge their sheets in stable order
+    
+    Returns:
+        Tuple of (materials, chapter titles) of all sheets
+    """
+    return merge_sheets(parse_workbooks_parallel(excel_paths, **kwargs))
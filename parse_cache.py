@@ -0,0 +1,300 @@
+"""
+Persistent parse cache for the construction materials database
+Snapshots are keyed by the workbook's SHA-256 and the parser version,
+so a warm load skips Excel entirely
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from chapter_index import ChapterIndex
+from excel_parser import ExcelDatabaseParser, MainMaterial, PARSER_VERSION
+from material_table import MaterialRecord, MaterialTable, material_records
+from parse_progress import ParseProgress
+from workbook_readers import Source, open_binary, source_name
+
+# Default location of the snapshots, override with PARSE_CACHE_DIR
+# (one directory per user, the cache directory must be private)
+DEFAULT_CACHE_DIR = os.getenv('PARSE_CACHE_DIR', os.path.join(
+    tempfile.gettempdir(), f"iresmat_parse_cache-{os.getuid() if hasattr(os, 'getuid') else 'user'}"))
+
+SNAPSHOT_MAGIC = b'IRESMAT2'
+
+# A database: one workbook path, or several workbooks (e.g. regional ones) parsed as one
+DatabasePath = Union[str, List[str]]
+
+
+def file_sha256(path: Source, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file (path or seekable file object) in chunks and return the hex digest"""
+    digest = hashlib.sha256()
+    with open_binary(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def materials_to_snapshot(materials: List[MainMaterial],
+                          chapters: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Serialize materials (and chapter titles) as plain records into a compact binary snapshot
+    
+    Compressed JSON rather than pickle: loading a snapshot must never run code.
+    """
+    return records_to_snapshot(list(material_records(materials)), chapters)
+
+
+def records_to_snapshot(records: List[MaterialRecord], chapters: Optional[Dict[str, str]] = None) -> bytes:
+    """Serialize plain material records (see material_records) into a snapshot"""
+    payload = json.dumps([records, chapters or {}], ensure_ascii=False, separators=(',', ':'))
+    return SNAPSHOT_MAGIC + zlib.compress(payload.encode('utf-8'))
+
+
+def read_snapshot(data: bytes) -> Tuple[MaterialTable, Dict[str, str]]:
+    """
+    Load the materials and chapter titles of a snapshot created by materials_to_snapshot
+    
+    Materials come back as a MaterialTable: its rows are read through views,
+    and no SubMaterial object is built unless a caller asks for one.
+    """
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a parse cache snapshot")
+    
+    records, chapters = json.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+    return MaterialTable.from_records(records), chapters
+
+
+def materials_from_snapshot(data: bytes) -> MaterialTable:
+    """Rebuild materials from a snapshot created by materials_to_snapshot"""
+    return read_snapshot(data)[0]
+
+
+def parse_source(source: Union[Source, List[str]], fields: Optional[Iterable[str]] = None,
+                 progress: Optional[ParseProgress] = None,
+                 lazy: bool = False) -> Tuple[List[MainMaterial], Dict[str, str]]:
+    """
+    Parse a database without going through the cache
+    
+    Every sheet with the database header is parsed. Workbooks split across
+    several sheets, and lists of workbooks, are parsed a sheet per worker
+    process (see parallel_parser) and merged in order.
+    
+    Args:
+        source: Path or seekable binary file object (e.g. an upload stream),
+            '.bc3' names are read as FIEBDC-3, anything else as a workbook export;
+            or a list of workbook paths parsed as one database
+        fields: MainMaterial fields needed (see ExcelDatabaseParser), None for all
+        progress: Receives phase timings and row progress (single-sheet parses only)
+        lazy: Build sub-materials on first access (LazyMainMaterial). Databases
+            parsed by several workers always come back as a MaterialTable,
+            whose sub-materials are read on access; BC3 files are parsed eagerly
+    
+    Returns:
+        Tuple of (materials, chapter titles)
+    """
+    sources = list(source) if isinstance(source, (list, tuple)) else [source]
+    if len(sources) == 1 and source_name(sources[0]).lower().endswith('.bc3'):
+        from bc3_parser import Bc3DatabaseParser
+        parser = Bc3DatabaseParser(sources[0], fields=fields, progress=progress)
+        parser.load_bc3()
+        parser.parse_materials()
+        return parser.get_materials(), parser.chapters
+    
+    from parallel_parser import list_sheets, merge_sheets, parse_sheets_parallel
+    sheets = list_sheets(sources)
+    if len(sheets) > 1:
+        return merge_sheets(parse_sheets_parallel(sheets, fields))
+    
+    parser = ExcelDatabaseParser(sources[0], fields=fields, sheet=sheets[0][1] if sheets else 0,
+                                 progress=progress)
+    parser.load_excel()
+    parser.parse_materials(vectorized=True, lazy=lazy)
+    return parser.get_materials(), parser.chapters
+
+
+class ParseCache:
+    """Directory of parse snapshots keyed by workbook hash and parser version"""
+    
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    
+    def key_for(self, excel_path: DatabasePath, fields: Optional[Iterable[str]] = None) -> str:
+        """Return the cache key of a workbook, or list of workbooks (and field projection)"""
+        if isinstance(excel_path, (list, tuple)):
+            digest = hashlib.sha256('+'.join(file_sha256(path) for path in excel_path).encode('ascii'))
+            key = f"{digest.hexdigest()}-v{PARSER_VERSION}"
+        else:
+            key = f"{file_sha256(excel_path)}-v{PARSER_VERSION}"
+        if fields is not None:
+            key += '-' + '+'.join(sorted(fields))
+        return key
+    
+    def _snapshot_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
+    
+    def _ensure_dir(self):
+        """
+        Create the cache directory, private to this user, and check nobody else can write to it
+        
+        Raises:
+            PermissionError: If the directory belongs to another user or others can write to it
+        """
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        info = os.stat(self.cache_dir)
+        if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            raise PermissionError(f"Parse cache directory {self.cache_dir} belongs to another user")
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"Parse cache directory {self.cache_dir} is writable by other users")
+    
+    def _read(self, key: str) -> Optional[Tuple[MaterialTable, Dict[str, str]]]:
+        try:
+            self._ensure_dir()
+        except OSError as e:
+            print(f"Parse cache disabled: {e}")
+            return None
+        try:
+            with open(self._snapshot_path(key), 'rb') as f:
+                return read_snapshot(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Corrupt or incompatible snapshot, treat as a miss
+            print(f"Ignoring unreadable parse cache entry {key}: {e}")
+            return None
+    
+    def get(self, key: str) -> Optional[MaterialTable]:
+        """Return the cached materials for a key, or None on a miss"""
+        entry = self._read(key)
+        return entry[0] if entry is not None else None
+    
+    def put(self, key: str, materials: List[MainMaterial], chapters: Optional[Dict[str, str]] = None):
+        """Store materials (and chapter titles) under a key (atomic replace)"""
+        self._write(key, materials_to_snapshot(materials, chapters))
+    
+    def _write(self, key: str, snapshot: bytes):
+        self._ensure_dir()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self._snapshot_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    def _latest_path(self, excel_path: DatabasePath, fields: Optional[Iterable[str]]) -> str:
+        """Pointer file holding the key last loaded through load_with_previous"""
+        paths = excel_path if isinstance(excel_path, (list, tuple)) else [excel_path]
+        source = os.pathsep.join(os.path.abspath(path) for path in paths)
+        if fields is not None:
+            source += '|' + '+'.join(sorted(fields))
+        return os.path.join(self.cache_dir, hashlib.sha1(source.encode('utf-8')).hexdigest() + '.latest')
+    
+    def load_with_previous(self, excel_path: DatabasePath, fields: Optional[Iterable[str]] = None,
+                           progress: Optional[ParseProgress] = None
+                           ) -> Tuple[Optional[MaterialTable], MaterialTable]:
+        """
+        Load a workbook together with the snapshot that was current for the same path
+        
+        The previous snapshot is whatever this method returned last time for
+        excel_path, so calling it after a new workbook version lands gives
+        (old materials, new materials) ready for diffing.
+        
+        Args:
+            excel_path: Path to the Excel database file, or list of workbook paths
+            fields: MainMaterial fields needed (see ExcelDatabaseParser), None for all
+            progress: Receives phase timings and row progress of a parse
+        
+        Returns:
+            Tuple of (previous materials or None, current materials)
+        """
+        latest_path = self._latest_path(excel_path, fields)
+        previous = None
+        previous_key = None
+        try:
+            self._ensure_dir()
+            with open(latest_path, 'r', encoding='utf-8') as f:
+                previous_key = f.read().strip()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Parse cache disabled: {e}")
+        
+        key = self.key_for(excel_path, fields)
+        materials = self.load_materials(excel_path, fields=fields, progress=progress)
+        
+        if previous_key == key:
+            previous = materials
+        elif previous_key:
+            previous = self.get(previous_key)
+        
+        try:
+            self._ensure_dir()
+            with open(latest_path, 'w', encoding='utf-8') as f:
+                f.write(key)
+        except OSError as e:
+            print(f"Could not record latest parse cache entry {key}: {e}")
+        
+        return previous, materials
+    
+    def load_materials(self, excel_path: DatabasePath, fields: Optional[Iterable[str]] = None,
+                       progress: Optional[ParseProgress] = None) -> MaterialTable:
+        """
+        Return the parsed materials of a workbook, parsing it only on a cache miss
+        
+        Args:
+            excel_path: Path to the Excel database file, or list of workbook paths
+                parsed concurrently as one database
+            fields: MainMaterial fields needed (see ExcelDatabaseParser), None for all
+            progress: Receives phase timings and row progress of a parse
+        
+        Returns:
+            MaterialTable of the materials (read-only views with the MainMaterial attributes)
+        """
+        return self._load(excel_path, fields, progress)[0]
+    
+    def load_chapter_index(self, excel_path: DatabasePath, progress: Optional[ParseProgress] = None) -> ChapterIndex:
+        """Return the chapter tree of a workbook, parsing it only on a cache miss"""
+        return self.load_indexed_materials(excel_path, progress)[1]
+    
+    def load_indexed_materials(self, excel_path: DatabasePath, progress: Optional[ParseProgress] = None
+                               ) -> Tuple[MaterialTable, ChapterIndex]:
+        """
+        Return the materials of a workbook (código and resumen) and its chapter tree
+        
+        Both come from one snapshot load, and the tree's material indices
+        are positions in the returned materials.
+        """
+        materials, chapters = self._load(excel_path, ['codigo', 'resumen'], progress)
+        return materials, ChapterIndex.from_materials(materials, chapters)
+    
+    def _load(self, excel_path: DatabasePath, fields: Optional[Iterable[str]],
+              progress: Optional[ParseProgress] = None) -> Tuple[MaterialTable, Dict[str, str]]:
+        key = self.key_for(excel_path, fields)
+        entry = self._read(key)
+        if entry is not None:
+            return entry
+        
+        # Lazy: sub-rows go from the sheet's columns to the snapshot and the
+        # table as plain records, no SubMaterial object is built
+        materials, chapters = parse_source(excel_path, fields, progress, lazy=True)
+        records = list(material_records(materials))
+        
+        try:
+            self._write(key, records_to_snapshot(records, chapters))
+        except OSError as e:
+            print(f"Could not write parse cache entry {key}: {e}")
+        
+        # Served as a table like a warm load, the parsed objects are dropped
+        return MaterialTable.from_records(records), chapters
+
+
+def load_materials_cached(excel_path: DatabasePath, cache_dir: Optional[str] = None,
+                          fields: Optional[Iterable[str]] = None,
+                          progress: Optional[ParseProgress] = None) -> MaterialTable:
+    """Convenience wrapper around ParseCache.load_materials"""
+    return ParseCache(cache_dir).load_materials(excel_path, fields=fields, progress=progress)
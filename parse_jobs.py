@@ -0,0 +1,299 @@
+"""
+Asynchronous parse jobs for uploaded databases
+Uploads are parsed in a process pool, so a large workbook never holds the
+GIL of the API process; clients poll the job for progress and fetch the
+materials once it is done
+"""
+import atexit
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+from excel_parser import MainMaterial
+from material_table import MaterialTable
+from parse_cache import parse_source
+from parse_progress import ParseProgress
+from upload_cache import UploadCache
+from workbook_readers import is_path, open_binary
+
+# Worker processes, override with PARSE_WORKERS
+DEFAULT_MAX_WORKERS = int(os.getenv('PARSE_WORKERS', '2'))
+
+# Finished jobs kept for status and result requests, override with PARSE_JOBS_KEPT
+DEFAULT_MAX_JOBS = int(os.getenv('PARSE_JOBS_KEPT', '32'))
+
+# Rows between two progress reports of a worker
+PROGRESS_EVERY_ROWS = 2000
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _report(job_id: str, event):
+    _progress_queue.put((job_id, event.to_dict()))
+
+
+def _run_job(job_id: str, path: str) -> MaterialTable:
+    """
+    Worker task: parse a saved upload and return its materials as a MaterialTable
+    
+    The table pickles as a few flat arrays and a list of strings, so loading
+    it on the API process's side costs a few milliseconds, unlike the
+    MainMaterial objects or a parse snapshot.
+    """
+    progress = ParseProgress([lambda event: _report(job_id, event)], every_rows=PROGRESS_EVERY_ROWS)
+    _progress_queue.put((job_id, {'kind': 'running'}))
+    materials = parse_source(path, progress=progress, lazy=True)[0]
+    if isinstance(materials, MaterialTable):
+        return materials
+    return MaterialTable.from_materials(materials)
+
+
+@dataclass
+class ParseJob:
+    """State of one upload parse"""
+    id: str
+    filename: str
+    key: Optional[str] = None
+    path: Optional[str] = None  # upload copy read by the worker, removed when the job ends
+    status: str = QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    count: Optional[int] = None  # materials parsed, they are kept in the manager's results cache
+    
+    @property
+    def ready(self) -> bool:
+        return self.status in (DONE, FAILED)
+    
+    def to_dict(self) -> Dict:
+        end = self.finished or time.time()
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'progress': self.progress,
+            'count': self.count,
+            'error': self.error,
+            'elapsed': round(end - (self.started or self.created), 3),
+        }
+
+
+class ParseJobManager:
+    """
+    Runs parse jobs in a process pool and tracks their state
+    
+    The pool and the progress listener start with the first job, and are
+    started again if a worker dies (the jobs it was running fail). Workers
+    report progress through a queue drained by a listener thread.
+    
+    Parsed materials are kept in an UploadCache under the upload's key, so
+    results follow its LRU bound rather than living as long as their job.
+    With upload_cache given, a later synchronous upload of the same file is
+    a cache hit.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, max_jobs: Optional[int] = None,
+                 upload_cache=None):
+        """
+        Args:
+            max_workers: Worker processes (PARSE_WORKERS, 2 by default)
+            max_jobs: Jobs kept; the oldest finished ones are forgotten first
+            upload_cache: UploadCache to read and fill, optional (results
+                then go to a private one of the same default size)
+        """
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.max_jobs = max_jobs or DEFAULT_MAX_JOBS
+        self.upload_cache = upload_cache
+        self.results = upload_cache if upload_cache is not None else UploadCache()
+        self.jobs: Dict[str, ParseJob] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue = None
+        atexit.register(self.shutdown)
+    
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that runs request threads is unsafe
+                context = multiprocessing.get_context('spawn')
+                self._queue = context.Queue()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=context,
+                    initializer=_init_worker, initargs=(self._queue,)
+                )
+                threading.Thread(target=self._listen, args=(self._queue,), daemon=True,
+                                 name='parse-job-progress').start()
+            return self._pool
+    
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """
+        Drop a broken pool (a worker died, e.g. killed by the OOM killer)
+        
+        The next job starts a new pool and listener. Only the pool that broke
+        is dropped, in case another thread already replaced it.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            queue = self._queue
+            self._pool = self._queue = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        queue.put(None)
+    
+    def _listen(self, queue):
+        """Apply worker progress reports to their jobs"""
+        while True:
+            try:
+                message = queue.get()
+            except (EOFError, OSError):
+                # Queue closed at interpreter shutdown
+                return
+            if message is None:
+                return
+            job_id, event = message
+            job = self.jobs.get(job_id)
+            if job is None or job.ready:
+                continue
+            if event.get('kind') == 'running':
+                job.status = RUNNING
+                job.started = time.time()
+            else:
+                job.progress = event
+    
+    def _add(self, job: ParseJob):
+        with self._lock:
+            self.jobs[job.id] = job
+            if len(self.jobs) > self.max_jobs:
+                for old in [j for j in self.jobs.values() if j.ready]:
+                    if len(self.jobs) <= self.max_jobs:
+                        break
+                    del self.jobs[old.id]
+    
+    def submit(self, source, filename: str) -> ParseJob:
+        """
+        Start parsing an upload
+        
+        Args:
+            source: Seekable binary upload stream (or path)
+            filename: Original file name, its extension picks the parser
+        
+        Returns:
+            The new job, already done when the upload is in the upload cache
+        """
+        job = ParseJob(id=str(uuid.uuid4()), filename=filename)
+        job.key = self.results.key_for(source)
+        
+        materials = self.results.get(job.key)
+        if materials is not None:
+            job.status = DONE
+            job.count = len(materials)
+            job.started = job.finished = time.time()
+            self._add(job)
+            return job
+        
+        # Workers read the upload from disk, the stream only lives in this process
+        if is_path(source):
+            path = source
+        else:
+            path = job.path = self._save_upload(source, filename)
+        self._add(job)
+        
+        # A pool found broken is replaced once, a second failure fails the job
+        for attempt in range(2):
+            pool = self._ensure_pool()
+            try:
+                future = pool.submit(_run_job, job.id, path)
+            except BrokenProcessPool as e:
+                self._discard_pool(pool)
+                if attempt:
+                    self._fail(job, f"Parse workers unavailable: {e}")
+                    return job
+                continue
+            future.add_done_callback(lambda done: self._finish(job, pool, done))
+            return job
+    
+    @staticmethod
+    def _save_upload(source, filename: str) -> str:
+        """Copy an upload stream to a temporary file named with its extension (which picks the parser)"""
+        fd, path = tempfile.mkstemp(prefix='parse-job-', suffix=os.path.splitext(filename)[1].lower())
+        try:
+            with os.fdopen(fd, 'wb') as out, open_binary(source) as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path
+    
+    @staticmethod
+    def _remove_upload(job: ParseJob):
+        if job.path is None:
+            return
+        try:
+            os.unlink(job.path)
+        except OSError:
+            pass
+        job.path = None
+    
+    def _fail(self, job: ParseJob, error: str):
+        self._remove_upload(job)
+        job.finished = time.time()
+        job.status = FAILED
+        job.error = error
+    
+    def _finish(self, job: ParseJob, pool: ProcessPoolExecutor, future: Future):
+        self._remove_upload(job)
+        try:
+            materials = future.result()
+        except BrokenProcessPool as e:
+            # Every job of the pool ends here, the next submit starts a new one
+            self._discard_pool(pool)
+            self._fail(job, f"Parse worker stopped unexpectedly: {e}")
+            return
+        except Exception as e:
+            self._fail(job, str(e))
+            return
+        
+        self.results.put(job.key, materials)
+        job.count = len(materials)
+        job.finished = time.time()
+        job.status = DONE
+        job.progress = dict(job.progress, kind='end')
+    
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        return self.jobs.get(job_id)
+    
+    def result(self, job: ParseJob) -> Optional[Sequence[MainMaterial]]:
+        """Materials of a finished job, None if not done or no longer cached"""
+        if job.status != DONE:
+            return None
+        return self.results.get(job.key)
+    
+    def shutdown(self):
+        """Stop the workers (running jobs are cancelled)"""
+        with self._lock:
+            pool, queue = self._pool, self._queue
+            self._pool = self._queue = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            queue.put(None)
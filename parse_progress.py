@@ -0,0 +1,150 @@
+"""
+Progress and phase timings of a database parse
+Parsers report their phases and the rows they processed to a ParseProgress,
+which forwards them as ParseEvents to any number of callbacks
+"""
+import contextlib
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Phases reported by the parsers, in order. 'header' (finding the header row)
+# runs inside 'read'; the row-wise parse and iter_materials classify rows
+# while extracting them, so they only report 'extract'.
+PHASES = ('read', 'header', 'classify', 'extract')
+
+# Rows between two 'progress' events of a phase
+DEFAULT_EVERY_ROWS = 5000
+
+
+@dataclass
+class ParseEvent:
+    """One progress report: a phase started, advanced or ended"""
+    kind: str  # 'start', 'progress' or 'end'
+    phase: str
+    rows: int
+    elapsed: float
+    total_rows: Optional[int] = None
+    materials: int = 0
+    
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+    
+    @property
+    def fraction(self) -> Optional[float]:
+        """Share of the phase done, None when the total is unknown"""
+        if not self.total_rows:
+            return None
+        return min(1.0, self.rows / self.total_rows)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'phase': self.phase,
+            'rows': self.rows,
+            'total_rows': self.total_rows,
+            'materials': self.materials,
+            'elapsed': round(self.elapsed, 4),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+        }
+
+
+class PhaseProgress:
+    """Row counter of one running phase, see ParseProgress.phase"""
+    
+    def __init__(self, owner: 'ParseProgress', name: str, total_rows: Optional[int]):
+        self.owner = owner
+        self.name = name
+        self.total_rows = total_rows
+        self.rows = 0
+        self.materials = 0
+        self.start = time.perf_counter()
+        self._next_report = owner.every_rows
+    
+    def event(self, kind: str) -> ParseEvent:
+        return ParseEvent(kind, self.name, self.rows, time.perf_counter() - self.start,
+                          self.total_rows, self.materials)
+    
+    def advance(self, rows: int, materials: Optional[int] = None):
+        """
+        Record the rows processed so far (an absolute count, not an increment)
+        
+        Emits a 'progress' event every owner.every_rows rows.
+        """
+        self.rows = rows
+        if materials is not None:
+            self.materials = materials
+        if rows >= self._next_report and self.owner.callbacks:
+            self._next_report = rows + self.owner.every_rows
+            self.owner.emit(self.event('progress'))
+
+
+class ParseProgress:
+    """
+    Collects phase timings of a parse and reports progress to callbacks
+    
+    Usage:
+        progress = ParseProgress([lambda event: print(event.to_dict())])
+        parser = ExcelDatabaseParser(path, progress=progress)
+        parser.load_excel()
+        parser.parse_materials(vectorized=True)
+        progress.timings  # {'header': 0.01, 'read': 1.9, 'classify': 0.05, 'extract': 0.2}
+    """
+    
+    def __init__(self, callbacks: Optional[List[Callable[[ParseEvent], None]]] = None,
+                 every_rows: int = DEFAULT_EVERY_ROWS):
+        """
+        Args:
+            callbacks: Functions called with every ParseEvent
+            every_rows: Rows between two 'progress' events of a phase
+        """
+        self.callbacks = list(callbacks or [])
+        self.every_rows = every_rows
+        self.timings: Dict[str, float] = {}
+        self.rows: Dict[str, int] = {}
+    
+    def subscribe(self, callback: Callable[[ParseEvent], None]):
+        """Add a callback"""
+        self.callbacks.append(callback)
+    
+    def emit(self, event: ParseEvent):
+        for callback in self.callbacks:
+            callback(event)
+    
+    @contextlib.contextmanager
+    def phase(self, name: str, total_rows: Optional[int] = None) -> Iterator[PhaseProgress]:
+        """
+        Time a phase, emitting 'start' and 'end' events around it
+        
+        Timings of a phase that runs several times (e.g. one 'read' per sheet) add up.
+        """
+        current = PhaseProgress(self, name, total_rows)
+        if self.callbacks:
+            self.emit(current.event('start'))
+        try:
+            yield current
+        finally:
+            event = current.event('end')
+            self.timings[name] = self.timings.get(name, 0.0) + event.elapsed
+            self.rows[name] = self.rows.get(name, 0) + event.rows
+            if self.callbacks:
+                self.emit(event)
+    
+    def summary(self) -> Dict:
+        """Timings and rows/sec of every phase seen so far"""
+        return {
+            name: {
+                'seconds': round(seconds, 4),
+                'rows': self.rows[name],
+                'rows_per_sec': round(self.rows[name] / seconds, 1) if seconds > 0 else 0.0,
+            }
+            for name, seconds in self.timings.items()
+        }
+
+
+def print_progress(event: ParseEvent):
+    """Callback printing one line per event"""
+    done = f" ({event.fraction:.0%})" if event.fraction is not None else ''
+    print(f"[{event.phase}] {event.kind}: {event.rows} rows{done}, {event.materials} materials, "
+          f"{event.elapsed:.2f}s, {event.rows_per_sec:,.0f} rows/s")
@@ -0,0 +1,408 @@
+"""
+Price roll-up of partidas from their sub-materials
+Partida -> resource quantities are kept as a sparse matrix, so every price can be
+recomputed at once and resource prices can be overridden for what-if studies
+"""
+import fnmatch
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Resource códigos of labour crews and labour rates (crews are typed 'Partida')
+LABOUR_PREFIXES = ('moc-', 'mo-')
+
+# Line kinds, percentage lines say which kinds they are computed on
+OTHER, LABOUR, MATERIAL, PERCENT = 0, 1, 2, 3
+
+
+@dataclass
+class Line:
+    """One line of a decomposition: cantidad of a resource, or a percentage"""
+    codigo: str
+    kind: int
+    cantidad: float
+    precio: Optional[float]
+
+
+@dataclass
+class PriceChange:
+    """A partida whose rolled-up price differs from a reference price"""
+    index: int
+    codigo: str
+    old: float
+    new: float
+    
+    @property
+    def delta(self) -> float:
+        return self.new - self.old
+    
+    def to_dict(self) -> Dict:
+        return {
+            'codigo': self.codigo,
+            'old_precio': self.old,
+            'new_precio': self.new,
+            'delta': round(self.delta, 2),
+        }
+
+
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """Round half away from zero to cents, like the importes in the workbook"""
+    return np.sign(values) * np.floor(np.abs(values) * 100 + 0.5 + 1e-9) / 100
+
+
+def line_kind(sm) -> int:
+    """Classify a sub-material line"""
+    if sm.ud == '%':
+        return PERCENT
+    if sm.tipo == 'Mano de obra' or sm.codigo.startswith(LABOUR_PREFIXES):
+        return LABOUR
+    if sm.tipo == 'Material':
+        return MATERIAL
+    return OTHER
+
+
+def percent_base(codigo: str) -> Optional[int]:
+    """
+    Line kind a percentage line is computed on, None for all lines above it
+    
+    'mo%' (herramientas menores) applies to labour, 'ma%' to materials and
+    '%' (costes directos complementarios) to everything above it.
+    """
+    code = codigo.lower()
+    if code.startswith(('mo', 'm.o.')):
+        return LABOUR
+    if code.startswith('ma'):
+        return MATERIAL
+    return None
+
+
+def decompose(codigo: str, sub_materials) -> Tuple[List[Line], Dict[str, List[Line]], bool]:
+    """
+    Split the sub-materials of a partida into its own lines and nested decompositions
+    
+    A resource with its own decomposition (a crew such as moc-std1-generico)
+    is followed by its lines and closed by a row without código whose resumen
+    is the resource código. The partida itself is closed the same way; rows
+    after its closing row belong to other partidas and are ignored.
+    
+    Returns:
+        (lines of the partida, {resource código: lines} of nested decompositions,
+        whether the closing row of the partida was found)
+    """
+    sub_materials = list(sub_materials)
+    closers = {sm.resumen for sm in sub_materials if sm.codigo is None}
+    stack: List[Tuple[str, List[Line]]] = [(codigo, [])]
+    definitions: Dict[str, List[Line]] = {}
+    
+    def opens_decomposition(i: int, code: str) -> bool:
+        # Its closing row must come before the one of any open decomposition
+        open_codes = {c for c, _ in stack}
+        for sm in sub_materials[i + 1:]:
+            if sm.codigo is None and sm.resumen == code:
+                return True
+            if sm.codigo is None and sm.resumen in open_codes:
+                return False
+        return False
+    
+    for i, sm in enumerate(sub_materials):
+        if sm.codigo is None:
+            open_codes = [code for code, _ in stack]
+            if sm.resumen not in open_codes:
+                continue  # description row
+            while stack[-1][0] != sm.resumen:
+                stack.pop()
+            code, lines = stack.pop()
+            if not stack:
+                return lines, definitions, True
+            if lines:
+                definitions.setdefault(code, lines)
+            continue
+        
+        kind = line_kind(sm)
+        stack[-1][1].append(Line(sm.codigo, kind, sm.cantidad or 0.0, sm.precio))
+        if kind != PERCENT and sm.codigo in closers and opens_decomposition(i, sm.codigo):
+            stack.append((sm.codigo, []))
+    
+    return stack[0][1], definitions, False
+
+
+class PriceRollup:
+    """
+    Recompute partida prices from resource prices
+    
+    Resources (labour rates, materials, rentals, crews) are the columns and
+    decompositions (crews first, then partidas) the rows of a CSR matrix of
+    cantidades. Crews can be made of other crews, so decompositions are
+    grouped in levels and each level is one sparse multiply whose totals
+    become resource prices for the next level; the partidas are the last one.
+    As in the workbook, every importe is rounded to cents before summing, and
+    percentage lines apply to the rounded importes above them.
+    """
+    
+    def __init__(self, materials):
+        """
+        Args:
+            materials: Parsed main materials with their sub-materials
+        """
+        self.materials = list(materials)
+        self.codes: List[str] = []
+        self.resource_index: Dict[str, int] = {}
+        base_prices: List[float] = []
+        
+        def resource(line: Line) -> int:
+            i = self.resource_index.get(line.codigo)
+            if i is None:
+                i = self.resource_index[line.codigo] = len(self.codes)
+                self.codes.append(line.codigo)
+                base_prices.append(np.nan)
+            if np.isnan(base_prices[i]) and line.precio is not None:
+                base_prices[i] = line.precio
+            return i
+        
+        partida_lines = []
+        crews: Dict[str, List[Line]] = {}
+        # Partidas without a closing row, their decomposition was cut short
+        # (typically by a nested partida parsed as a main material)
+        self.incomplete: List[int] = []
+        for i, material in enumerate(self.materials):
+            lines, definitions, closed = decompose(material.codigo, material.sub_materials)
+            partida_lines.append(lines)
+            if not closed:
+                self.incomplete.append(i)
+            for code, crew_lines in definitions.items():
+                crews.setdefault(code, crew_lines)
+        
+        # Level of a crew = 1 + deepest crew it is made of
+        levels: Dict[str, int] = {}
+        
+        def level(code: str, visiting=()) -> int:
+            if code not in levels:
+                children = [l.codigo for l in crews[code]
+                            if l.codigo in crews and l.codigo not in visiting and l.codigo != code]
+                levels[code] = 1 + max((level(c, visiting + (code,)) for c in children), default=-1)
+            return levels[code]
+        
+        for code in crews:
+            level(code)
+        
+        # Decompositions ordered by level, partidas last
+        depth = max(levels.values(), default=-1) + 1
+        rows: List[Tuple[Optional[str], List[Line]]] = []
+        self.level_rows: List[Tuple[int, int]] = []
+        for lvl in range(depth):
+            start = len(rows)
+            rows.extend((code, crews[code]) for code in crews if levels[code] == lvl)
+            self.level_rows.append((start, len(rows)))
+        self.partida_start = len(rows)
+        rows.extend((None, lines) for lines in partida_lines)
+        self.level_rows.append((self.partida_start, len(rows)))
+        
+        # CSR matrix of cantidades, percentage lines have no resource (-1)
+        offsets = [0]
+        line_resource, line_cantidad, kinds = [], [], []
+        pct_line, pct_rate, pct_rank, base_row, base_col = [], [], [], [], []
+        self.row_resource = np.full(len(rows), -1, dtype=np.int64)
+        
+        for r, (code, lines) in enumerate(rows):
+            if code is not None:
+                self.row_resource[r] = resource(Line(code, OTHER, 0.0, None))
+            first = offsets[-1]
+            rank = 0
+            for j, line in enumerate(lines):
+                k = first + j
+                kinds.append(line.kind)
+                line_cantidad.append(line.cantidad)
+                if line.kind != PERCENT:
+                    line_resource.append(resource(line))
+                    continue
+                line_resource.append(-1)
+                applies_to = percent_base(line.codigo)
+                for prev in range(first, k):
+                    if applies_to is None or kinds[prev] == applies_to:
+                        base_row.append(len(pct_line))
+                        base_col.append(prev)
+                pct_line.append(k)
+                pct_rate.append(line.cantidad / 100)
+                pct_rank.append(rank)
+                rank += 1
+            offsets.append(first + len(lines))
+        
+        self.row_offsets = np.asarray(offsets, dtype=np.int64)
+        self.line_row = np.repeat(np.arange(len(rows)), np.diff(self.row_offsets))
+        self.line_resource = np.asarray(line_resource, dtype=np.int64)
+        self.line_cantidad = np.asarray(line_cantidad, dtype=np.float64)
+        self.base_prices = np.asarray(base_prices, dtype=np.float64)
+        self.crew_mask = np.zeros(len(self.codes), dtype=bool)
+        self.crew_mask[self.row_resource[self.row_resource >= 0]] = True
+        
+        # Percentage lines, grouped by rank: the second percentage line of a
+        # decomposition may be computed on the first one
+        pct_line = np.asarray(pct_line, dtype=np.int64)
+        pct_rate = np.asarray(pct_rate, dtype=np.float64)
+        pct_rank = np.asarray(pct_rank, dtype=np.int64)
+        base_row = np.asarray(base_row, dtype=np.int64)
+        base_col = np.asarray(base_col, dtype=np.int64)
+        self.percent_groups = []
+        for rank in range(int(pct_rank.max()) + 1 if len(pct_rank) else 0):
+            selected = np.flatnonzero(pct_rank == rank)
+            position = np.full(len(pct_line), -1, dtype=np.int64)
+            position[selected] = np.arange(len(selected))
+            in_group = position[base_row] >= 0
+            self.percent_groups.append((
+                pct_line[selected], pct_rate[selected],
+                position[base_row[in_group]], base_col[in_group],
+            ))
+        
+        # Resources without any price in the workbook count as 0
+        self.unpriced = [self.codes[i] for i in np.flatnonzero(np.isnan(self.base_prices))
+                         if not self.crew_mask[i]]
+        self.base_prices = np.nan_to_num(self.base_prices)
+        
+        self._baseline: Optional[np.ndarray] = None
+    
+    @property
+    def num_partidas(self) -> int:
+        return len(self.materials)
+    
+    @property
+    def num_resources(self) -> int:
+        return len(self.codes)
+    
+    def resolve_overrides(self, overrides: Dict[str, float]) -> Dict[int, float]:
+        """
+        Map resource códigos or glob patterns ('mo-salarial-*', 'alq-*') to resource indices
+        
+        Raises:
+            ValueError: If a código or pattern matches no resource
+        """
+        resolved = {}
+        for pattern, precio in overrides.items():
+            if pattern in self.resource_index:
+                matches = [self.resource_index[pattern]]
+            else:
+                matches = [i for i, code in enumerate(self.codes) if fnmatch.fnmatchcase(code, pattern)]
+            if not matches:
+                raise ValueError(f"Unknown resource: {pattern}")
+            for i in matches:
+                resolved[i] = float(precio)
+        return resolved
+    
+    def resource_prices(self, overrides: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Price of every resource (crews rolled up) with the overrides applied"""
+        return self._rollup(overrides)[0]
+    
+    def compute_prices(self, overrides: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Roll up the price of every partida
+        
+        Args:
+            overrides: Resource código (or glob pattern) -> new price. Overriding
+                a labour rate changes every crew using it; overriding a crew
+                fixes its price regardless of its lines.
+        
+        Returns:
+            Prices aligned with the materials the roll-up was built from
+        """
+        return self._rollup(overrides)[1]
+    
+    def _rollup(self, overrides: Optional[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        prices = self.base_prices.copy()
+        fixed = np.zeros(len(prices), dtype=bool)
+        for i, precio in self.resolve_overrides(overrides or {}).items():
+            prices[i] = precio
+            fixed[i] = True
+        
+        importes = np.zeros(len(self.line_cantidad))
+        totals = np.zeros(len(self.row_resource))
+        for start, end in self.level_rows:
+            lo, hi = self.row_offsets[start], self.row_offsets[end]
+            resource = self.line_resource[lo:hi]
+            direct = resource >= 0
+            importes[lo:hi][direct] = round_cents(self.line_cantidad[lo:hi][direct] * prices[resource[direct]])
+            
+            for lines, rates, base_row, base_col in self.percent_groups:
+                in_level = (lines >= lo) & (lines < hi)
+                if not in_level.any():
+                    continue
+                bases = np.bincount(base_row, weights=importes[base_col], minlength=len(lines))
+                importes[lines[in_level]] = round_cents(rates[in_level] * bases[in_level])
+            
+            totals[start:end] = np.bincount(self.line_row[lo:hi] - start, weights=importes[lo:hi],
+                                            minlength=end - start)
+            crews = self.row_resource[start:end]
+            is_crew = crews >= 0
+            update = is_crew.copy()
+            update[is_crew] = ~fixed[crews[is_crew]]
+            prices[crews[update]] = totals[start:end][update]
+        
+        return prices, totals[self.partida_start:]
+    
+    def baseline(self) -> np.ndarray:
+        """Rolled-up prices without overrides (cached)"""
+        if self._baseline is None:
+            self._baseline = self.compute_prices()
+        return self._baseline
+    
+    def what_if(self, overrides: Dict[str, float], tolerance: float = 0.005) -> List[PriceChange]:
+        """
+        Partidas whose rolled-up price changes with the given resource prices
+        
+        Args:
+            overrides: Resource código (or glob pattern) -> new price
+            tolerance: Smallest price difference reported
+        
+        Returns:
+            One PriceChange per affected partida, old is the price without overrides
+        """
+        old = self.baseline()
+        new = self.compute_prices(overrides)
+        changed = np.flatnonzero(np.abs(new - old) > tolerance)
+        return [
+            PriceChange(int(i), self.materials[i].codigo, float(old[i]), float(new[i]))
+            for i in changed
+        ]
+    
+    def validate(self, tolerance: float = 0.01, include_incomplete: bool = False) -> List[PriceChange]:
+        """
+        Compare the rolled-up prices with the prices stored in the workbook
+        
+        Args:
+            tolerance: Largest accepted difference
+            include_incomplete: Also check partidas whose decomposition has no closing row
+        
+        Returns:
+            One PriceChange (old = stored, new = rolled up) per mismatching partida
+        """
+        stored = np.array([m.precio if m.precio is not None else np.nan for m in self.materials],
+                          dtype=np.float64)
+        computed = self.baseline()
+        mismatched = ~(np.abs(computed - stored) <= tolerance)
+        if not include_incomplete:
+            mismatched[self.incomplete] = False
+        mismatched = np.flatnonzero(mismatched)
+        return [
+            PriceChange(int(i), self.materials[i].codigo, float(stored[i]), float(computed[i]))
+            for i in mismatched
+        ]
+
+
+def main():
+    """Check the roll-up against the sample database"""
+    from parse_cache import load_materials_cached
+    
+    materials = load_materials_cached('/Users/danielsamuel/PycharmProjects/RAG/correct_sample/DATABSE.xlsx')
+    rollup = PriceRollup(materials)
+    mismatches = rollup.validate()
+    print(f"{rollup.num_partidas} partidas, {rollup.num_resources} resources, "
+          f"{len(mismatches)} prices differ from the workbook "
+          f"({len(rollup.incomplete)} incomplete decompositions not checked)")
+    for change in mismatches[:10]:
+        print(f"  {change.codigo}: stored {change.old}€, rolled up {change.new:.2f}€")
+    
+    changes = rollup.what_if({'mo-salarial-*': 22.0})
+    print(f"Labour at 22€/h changes {len(changes)} partida prices")
+
+
+if __name__ == '__main__':
+    main()
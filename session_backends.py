@@ -0,0 +1,280 @@
+"""
+Shared backends of the session store
+Sessions are kept there as compact serialized catalogs, so any API worker
+(or host) using the same backend can serve a session created by another one
+"""
+import contextlib
+import json
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from typing import List, Optional
+
+from gpt_matcher import ConstructionItem
+
+CATALOG_MAGIC = b'IRESCAT1'
+
+# Key prefix of the sessions in Redis
+REDIS_KEY_PREFIX = 'resumen:session:'
+
+# Idle Redis connections kept for reuse
+REDIS_POOL_SIZE = 8
+
+
+def catalog_to_bytes(items: List[ConstructionItem]) -> bytes:
+    """
+    Serialize parsed items into a compact catalog
+    
+    JSON rather than pickle: the bytes come back from a shared server,
+    and loading them must never run code.
+    """
+    records = [[item.number, item.code, item.description] for item in items]
+    payload = json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return CATALOG_MAGIC + zlib.compress(payload)
+
+
+def read_catalog(data: bytes) -> List[ConstructionItem]:
+    """Rebuild parsed items from a catalog created by catalog_to_bytes"""
+    if not data.startswith(CATALOG_MAGIC):
+        raise ValueError("Not a session catalog")
+    records = json.loads(zlib.decompress(data[len(CATALOG_MAGIC):]))
+    return [ConstructionItem(number, code, description) for number, code, description in records]
+
+
+class SessionBackend:
+    """Base class for stores of serialized session catalogs with a TTL"""
+    
+    name = 'base'
+    
+    def get(self, session_id: str) -> Optional[bytes]:
+        """Return the catalog of a session, None if unknown or expired"""
+        raise NotImplementedError
+    
+    def set(self, session_id: str, data: bytes, ttl: float):
+        """Store a catalog for ttl seconds"""
+        raise NotImplementedError
+    
+    def touch(self, session_id: str, ttl: float) -> bool:
+        """Restart the TTL of a session, False if it is unknown or expired"""
+        raise NotImplementedError
+    
+    def delete(self, session_id: str):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Catalogs in a SQLite file, shared by the processes of one host"""
+    
+    name = 'sqlite'
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file, created if missing
+        """
+        self.path = path
+        self._local = threading.local()
+        # A throwaway connection: one kept from here could be inherited by forked workers
+        with contextlib.closing(sqlite3.connect(path, timeout=10)) as db, db:
+            db.execute('CREATE TABLE IF NOT EXISTS sessions '
+                       '(id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)')
+    
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, sqlite3 connections are not shared between threads
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+    
+    def get(self, session_id: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            'SELECT data FROM sessions WHERE id = ? AND expires > ?', (session_id, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+    
+    def set(self, session_id: str, data: bytes, ttl: float):
+        now = time.time()
+        with self._connection() as db:
+            db.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)', (session_id, data, now + ttl))
+            # Expired sessions are purged as new ones come in
+            db.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+    
+    def touch(self, session_id: str, ttl: float) -> bool:
+        now = time.time()
+        with self._connection() as db:
+            cursor = db.execute('UPDATE sessions SET expires = ? WHERE id = ? AND expires > ?',
+                                (now + ttl, session_id, now))
+        return cursor.rowcount > 0
+    
+    def delete(self, session_id: str):
+        with self._connection() as db:
+            db.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+    
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Catalogs in Redis (or any server speaking its protocol), shared by every host
+    
+    Only GET, SET, PEXPIRE and DEL are needed, so a minimal RESP client is
+    built in rather than requiring a client library. Keys expire in the server.
+    """
+    
+    name = 'redis'
+    
+    def __init__(self, url: str, timeout: float = 5.0, prefix: str = REDIS_KEY_PREFIX):
+        """
+        Args:
+            url: redis://[[user]:password@]host[:port][/db]
+            timeout: Connect and read timeout in seconds
+            prefix: Prefix of the session keys
+        """
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.username = urllib.parse.unquote(parsed.username) if parsed.username else None
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self.prefix = prefix
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        connection = (sock, sock.makefile('rb'))
+        try:
+            if self.password:
+                credentials = (self.username, self.password) if self.username else (self.password,)
+                self._send(connection, 'AUTH', *credentials)
+            if self.db:
+                self._send(connection, 'SELECT', self.db)
+        except Exception:
+            sock.close()
+            raise
+        return connection
+    
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+    
+    @classmethod
+    def _read_reply(cls, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Connection closed by the session server")
+        kind, value = line[:1], line[1:-2]
+        if kind == b'+':
+            return value.decode('utf-8')
+        if kind == b'-':
+            raise RuntimeError(f"Session server error: {value.decode('utf-8', 'replace')}")
+        if kind == b':':
+            return int(value)
+        if kind == b'$':
+            length = int(value)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the session server")
+            return data[:-2]
+        if kind == b'*':
+            length = int(value)
+            return None if length < 0 else [cls._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the session server: {line[:32]!r}")
+    
+    def _send(self, connection, *args):
+        sock, reader = connection
+        sock.sendall(self._encode(args))
+        return self._read_reply(reader)
+    
+    def _command(self, *args):
+        """Run one command on a pooled connection, retried on a fresh one if the pooled one broke"""
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            fresh = connection is None
+            try:
+                if fresh:
+                    connection = self._connect()
+                reply = self._send(connection, *args)
+            except (ConnectionError, OSError):
+                if connection is not None:
+                    connection[0].close()
+                if fresh:
+                    raise
+                # The server restarted or dropped idle clients: every pooled connection is stale
+                self.close()
+                continue
+            except RuntimeError:
+                # An error reply, the connection itself is still usable
+                if connection is not None:
+                    self._release(connection)
+                raise
+            self._release(connection)
+            return reply
+    
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < REDIS_POOL_SIZE:
+                self._idle.append(connection)
+                return
+        connection[0].close()
+    
+    def get(self, session_id: str) -> Optional[bytes]:
+        return self._command('GET', self.prefix + session_id)
+    
+    def set(self, session_id: str, data: bytes, ttl: float):
+        self._command('SET', self.prefix + session_id, data, 'PX', int(ttl * 1000))
+    
+    def touch(self, session_id: str, ttl: float) -> bool:
+        return self._command('PEXPIRE', self.prefix + session_id, int(ttl * 1000)) == 1
+    
+    def delete(self, session_id: str):
+        self._command('DEL', self.prefix + session_id)
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock, _ in idle:
+            sock.close()
+
+
+def open_backend(url: Optional[str]) -> Optional[SessionBackend]:
+    """
+    Open the session backend of a URL
+    
+    Args:
+        url: 'local' or None: sessions only live in this process
+            'sqlite:///path/sessions.db': shared by the processes of one host
+            'redis://host:6379/0': shared by every host using the server
+    
+    Returns:
+        SessionBackend instance, None for 'local'
+    """
+    if not url or url == 'local':
+        return None
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme == 'sqlite':
+        return SQLiteSessionBackend(url[len('sqlite://'):])
+    if scheme == 'redis':
+        return RedisSessionBackend(url)
+    raise ValueError(f"Unknown session backend: {url}")
@@ -0,0 +1,202 @@
+"""
+Bounded in-memory store of uploaded materials lists
+Each session keeps its list parsed into a ready GPT matcher, so searches on
+it skip the re-parse and the client setup; sessions expire after a TTL and
+the least recently used ones are evicted beyond a count or a memory budget
+With a shared backend (see session_backends) this store is a per-process
+cache in front of it, and any worker can serve any session
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from gpt_matcher import ConstructionItem, GPTConstructionMatcher
+from session_backends import SessionBackend, catalog_to_bytes, read_catalog
+
+# Sessions kept, override with SESSION_STORE_SIZE
+DEFAULT_MAX_SESSIONS = int(os.getenv('SESSION_STORE_SIZE', '64'))
+
+# Seconds a session lives after its last use, override with SESSION_TTL
+DEFAULT_TTL = int(os.getenv('SESSION_TTL', '3600'))
+
+# Memory budget of all sessions in MB, override with SESSION_STORE_MB
+DEFAULT_MAX_MB = int(os.getenv('SESSION_STORE_MB', '256'))
+
+
+def catalog_size(items: List[ConstructionItem]) -> int:
+    """Approximate memory of parsed items in bytes (objects, attribute dicts and strings)"""
+    size = sys.getsizeof(items)
+    for item in items:
+        size += (sys.getsizeof(item) + sys.getsizeof(item.__dict__) + sys.getsizeof(item.number)
+                 + sys.getsizeof(item.code) + sys.getsizeof(item.description))
+    return size
+
+
+@dataclass
+class SessionCatalog:
+    """A parsed materials list and the matcher searching it"""
+    id: str
+    matcher: GPTConstructionMatcher
+    size: int
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    
+    @property
+    def items(self) -> List[ConstructionItem]:
+        return self.matcher.items
+
+
+class SessionStore:
+    """
+    LRU of session catalogs with a TTL and a memory budget, safe to share between request threads
+    
+    Evicted or expired sessions are simply forgotten; a search still running
+    on one keeps its matcher until it finishes. With a backend, sessions are
+    also stored there serialized, and the limits only bound the parsed copies
+    kept by this process: a session missing here is loaded from the backend.
+    """
+    
+    def __init__(self, matcher_factory: Callable[[], GPTConstructionMatcher],
+                 max_sessions: Optional[int] = None, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None, backend: Optional[SessionBackend] = None):
+        """
+        Args:
+            matcher_factory: Returns a new, empty matcher for a session
+            max_sessions: Sessions kept (SESSION_STORE_SIZE, 64 by default)
+            ttl: Seconds a session lives after its last use (SESSION_TTL, 1 hour by default)
+            max_bytes: Memory budget of all sessions (SESSION_STORE_MB, 256 MB by default)
+            backend: Shared store of the sessions, None keeps them in this process only
+        """
+        self.matcher_factory = matcher_factory
+        self.backend = backend
+        self.max_sessions = DEFAULT_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.max_bytes = DEFAULT_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.total_bytes = 0
+        self.evicted = 0
+        self.expired = 0
+        self.loaded = 0
+        self._sessions: 'OrderedDict[str, SessionCatalog]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+    
+    def create(self, list_text: str) -> SessionCatalog:
+        """
+        Parse a materials list into a new session
+        
+        Raises:
+            ValueError: If the parsed list alone exceeds the memory budget
+        """
+        # Parse outside the lock, searches on other sessions keep being served meanwhile
+        matcher = self.matcher_factory()
+        matcher.parse_list(list_text)
+        size = catalog_size(matcher.items)
+        if size > self.max_bytes:
+            raise ValueError(f'Materials list too large: {size // (1024 * 1024)} MB parsed, '
+                             f'the session budget is {self.max_bytes // (1024 * 1024)} MB')
+        
+        catalog = SessionCatalog(id=str(uuid.uuid4()), matcher=matcher, size=size)
+        if self.backend is not None:
+            self.backend.set(catalog.id, catalog_to_bytes(matcher.items), self.ttl)
+        self._add(catalog)
+        return catalog
+    
+    def get(self, session_id: str) -> Optional[SessionCatalog]:
+        """Return a session and mark it as used, None if unknown or expired"""
+        now = time.time()
+        with self._lock:
+            catalog = self._sessions.get(session_id)
+            if catalog is not None and now - catalog.last_used > self.ttl:
+                # With a backend, other workers may have kept the session alive
+                self._remove(session_id)
+                self.expired += 1
+                catalog = None
+            if catalog is not None:
+                catalog.last_used = now
+                self._sessions.move_to_end(session_id)
+        
+        if self.backend is None:
+            return catalog
+        
+        if catalog is not None:
+            # Restart the shared TTL, which also tells whether the session still exists
+            if self.backend.touch(session_id, self.ttl):
+                return catalog
+            self._discard_local(session_id)
+            return None
+        
+        data = self.backend.get(session_id)
+        if data is None:
+            return None
+        self.backend.touch(session_id, self.ttl)
+        
+        # Created by another worker (or evicted here earlier): rebuild the matcher
+        matcher = self.matcher_factory()
+        matcher.items = read_catalog(data)
+        catalog = SessionCatalog(id=session_id, matcher=matcher, size=catalog_size(matcher.items))
+        self._add(catalog)
+        self.loaded += 1
+        return catalog
+    
+    def discard(self, session_id: str):
+        """Forget a session, in the backend too"""
+        self._discard_local(session_id)
+        if self.backend is not None:
+            self.backend.delete(session_id)
+    
+    def _discard_local(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+    
+    def _add(self, catalog: SessionCatalog):
+        with self._lock:
+            if catalog.id in self._sessions:
+                self._remove(catalog.id)
+            self._sessions[catalog.id] = catalog
+            self.total_bytes += catalog.size
+            self._evict(time.time())
+    
+    def _remove(self, session_id: str):
+        self.total_bytes -= self._sessions.pop(session_id).size
+    
+    def _evict(self, now: float):
+        """Drop expired sessions, then the least recently used ones while over a limit"""
+        for catalog in [c for c in self._sessions.values() if now - c.last_used > self.ttl]:
+            self._remove(catalog.id)
+            self.expired += 1
+        while self._sessions and (len(self._sessions) > self.max_sessions
+                                  or self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._sessions)))
+            self.evicted += 1
+    
+    def stats(self) -> dict:
+        """Session count, memory use and eviction counters"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'evicted': self.evicted,
+                'expired': self.expired,
+                'loaded': self.loaded,
+                'backend': self.backend.name if self.backend is not None else 'local',
+            }
+    
+    def clear(self):
+        """Drop the sessions kept by this process (the backend is left alone)"""
+        with self._lock:
+            self._sessions.clear()
+            self.total_bytes = 0
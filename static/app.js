@@ -1,8 +1,17 @@
 // ===== CONSTANTS =====
 const API_BASE_URL = window.location.origin;
+const UPLOAD_PAGE_SIZE = 200;
+
+// Upload endpoint -> view name used by /api/uploads/<upload_id>
+const UPLOAD_VIEWS = {
+    'upload': 'resumen',
+    'upload/text-only': 'text-only',
+    'upload/details': 'details'
+};
 
 // ===== GLOBAL STATE =====
 let currentResults = null;
+let searchController = null;
 let sessionId = null;
 let materialsCount = 0;
 
@@ -236,6 +245,13 @@ async function handleSearch() {
         return;
     }
     
+    // A new search replaces the running one: closing its stream cancels it on the server
+    if (searchController) {
+        searchController.abort();
+    }
+    const controller = new AbortController();
+    searchController = controller;
+    
     try {
         showLoadingWithProgress(true);
         
@@ -255,7 +271,8 @@ async function handleSearch() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(requestBody)
+            body: JSON.stringify(requestBody),
+            signal: controller.signal
         });
         
         if (!response.ok) {
@@ -300,9 +317,17 @@ async function handleSearch() {
         }
         
     } catch (error) {
+        if (error.name === 'AbortError') {
+            // Replaced by a newer search, which owns the loading state now
+            return;
+        }
         console.error('Search error:', error);
         showAlert('error', 'Error', error.message);
         showLoadingWithProgress(false);
+    } finally {
+        if (searchController === controller) {
+            searchController = null;
+        }
     }
 }
 
@@ -445,19 +470,19 @@ function handleFileSelect() {
     }
     
     // Validate file type
-    const validTypes = ['.xlsx', '.xls'];
+    const validTypes = ['.xlsx', '.xls', '.bc3'];
     const fileExtension = '.' + file.name.split('.').pop().toLowerCase();
     
     if (!validTypes.includes(fileExtension)) {
-        showAlert('error', 'Invalid File', 'Please select an Excel file (.xlsx or .xls)');
+        showAlert('error', 'Invalid File', 'Please select an Excel file (.xlsx or .xls) or a BC3 file (.bc3)');
         elements.fileInput.value = '';
         return;
     }
     
-    // Validate file size (16MB)
-    const maxSize = 16 * 1024 * 1024;
+    // Validate file size (128MB, MAX_UPLOAD_MB on the server)
+    const maxSize = 128 * 1024 * 1024;
     if (file.size > maxSize) {
-        showAlert('error', 'File Too Large', 'File size must be less than 16MB');
+        showAlert('error', 'File Too Large', 'File size must be less than 128MB');
         elements.fileInput.value = '';
         return;
     }
@@ -483,6 +508,9 @@ async function handleUpload() {
         
         const formData = new FormData();
         formData.append('file', file);
+        // First page only, the rest is loaded on demand
+        formData.append('limit', UPLOAD_PAGE_SIZE);
+        formData.append('text', '0');
         
         const response = await fetch(`${API_BASE_URL}/api/${uploadType}`, {
             method: 'POST',
@@ -495,6 +523,7 @@ async function handleUpload() {
             throw new Error(data.error || 'Failed to process file');
         }
         
+        data.view = UPLOAD_VIEWS[uploadType];
         currentResults = data;
         displayUploadResults(data);
         showAlert('success', 'Success', `Processed ${data.count} materials from file`);
@@ -507,27 +536,62 @@ async function handleUpload() {
     }
 }
 
-function displayUploadResults(data) {
-    // Show results section
-    elements.resultsSection.style.display = 'block';
+async function loadMoreUploadResults() {
+    if (!currentResults || !currentResults.next_cursor) {
+        return;
+    }
     
-    // Scroll to results
-    setTimeout(() => {
-        elements.resultsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
-    }, 100);
+    const params = new URLSearchParams({
+        view: currentResults.view,
+        limit: UPLOAD_PAGE_SIZE,
+        text: '0',
+        cursor: currentResults.next_cursor
+    });
     
-    // Display stats
-    elements.resultsStats.innerHTML = `
-        <div class="results-stats-content">
-            <div class="stat-item">
-                <span class="stat-label">Materials Found</span>
-                <span class="stat-value">${data.count}</span>
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/uploads/${currentResults.upload_id}?${params}`);
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to load more materials');
+        }
+        
+        currentResults.next_cursor = data.next_cursor;
+        currentResults.data = currentResults.data.concat(data.data);
+        displayUploadResults(data, true);
+        
+    } catch (error) {
+        console.error('Load more error:', error);
+        showAlert('error', 'Error', error.message);
+    }
+}
+
+function displayUploadResults(data, append = false) {
+    const offset = data.offset || 0;
+    
+    if (!append) {
+        // Show results section
+        elements.resultsSection.style.display = 'block';
+        
+        // Scroll to results
+        setTimeout(() => {
+            elements.resultsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
+        }, 100);
+        
+        // Display stats
+        elements.resultsStats.innerHTML = `
+            <div class="results-stats-content">
+                <div class="stat-item">
+                    <span class="stat-label">Materials Found</span>
+                    <span class="stat-value">${data.count}</span>
+                </div>
             </div>
-        </div>
-    `;
+        `;
+    }
     
     // Display materials
-    const materialsHTML = data.data.map((item, index) => {
+    const materialsHTML = data.data.map((item, i) => {
+        const index = offset + i;
         // Handle different data structures
         if (typeof item === 'string') {
             // Text-only format
@@ -583,7 +647,26 @@ function displayUploadResults(data) {
         }
     }).join('');
     
-    elements.resultsContent.innerHTML = materialsHTML;
+    const loadMore = document.getElementById('loadMoreResults');
+    if (loadMore) {
+        loadMore.remove();
+    }
+    
+    if (append) {
+        elements.resultsContent.insertAdjacentHTML('beforeend', materialsHTML);
+    } else {
+        elements.resultsContent.innerHTML = materialsHTML;
+    }
+    
+    if (data.next_cursor) {
+        const shown = offset + data.data.length;
+        elements.resultsContent.insertAdjacentHTML('beforeend', `
+            <button type="button" class="btn btn-secondary" id="loadMoreResults">
+                Load more (${shown} of ${data.count})
+            </button>
+        `);
+        document.getElementById('loadMoreResults').addEventListener('click', loadMoreUploadResults);
+    }
 }
 
 // ===== RESULTS FUNCTIONALITY =====
@@ -592,12 +675,30 @@ function initializeResults() {
     elements.clearResults.addEventListener('click', handleClearResults);
 }
 
-function handleDownload() {
+async function handleDownload() {
     if (!currentResults) {
         showAlert('error', 'Error', 'No results to download');
         return;
     }
     
+    if (currentResults.text === undefined && currentResults.upload_id) {
+        // Paged uploads come without text, fetch the text of all materials
+        try {
+            const params = new URLSearchParams({ view: currentResults.view });
+            const response = await fetch(`${API_BASE_URL}/api/uploads/${currentResults.upload_id}?${params}`);
+            const data = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to download results');
+            }
+            currentResults.text = data.text;
+        } catch (error) {
+            console.error('Download error:', error);
+            showAlert('error', 'Error', error.message);
+            return;
+        }
+    }
+    
     const text = currentResults.text;
     const blob = new Blob([text], { type: 'text/plain' });
     const url = URL.createObjectURL(blob);
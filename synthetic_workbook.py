@@ -0,0 +1,182 @@
+"""
+Synthetic construction materials workbooks for benchmarks
+Rows follow the layout of the real database export: title rows, header row,
+'Capítulo' rows, Partida rows and their crew/labour/material decompositions
+"""
+import functools
+import random
+from typing import Iterator, List, Tuple
+
+from excel_parser import COLUMNS
+from price_rollup import round_cents
+
+# Excel's hard row limit is 1,048,576, larger workbooks are split into sheets
+MAX_ROWS_PER_SHEET = 1_000_000
+
+LABOUR_RATES = [
+    ('mo-salarial-oficial1', 'Oficial de 1ª', 21.0),
+    ('mo-salarial-ayudante', 'Ayudante', 19.0),
+    ('mo-salarial-1/2ayudante', '1/5 Ayudante', 19.0),
+]
+
+# Crew código -> (resumen, [(labour index, cantidad)])
+CREWS = {
+    'moc-std1-generico': ('Cuadrilla Std1 - 1 Oficial de 1ª, 1 Ayudante y 1/5 Ayudante',
+                          [(0, 1.0), (1, 1.0), (2, 0.2)]),
+    'moc-std1-pintura': ('Cuadrilla Std1 Pintura - 1 Oficial de 1ª y 1/2 Ayudante',
+                         [(0, 1.0), (2, 0.5)]),
+    'moc-std2-generico': ('Cuadrilla Std2 - 2 Oficiales de 1ª y 1 Ayudante',
+                          [(0, 2.0), (1, 1.0)]),
+}
+
+RENTALS = [
+    ('alq-taladro-tq-01', 'Alquiler de Taladro Percutor', 2.0),
+    ('alq-amolador-mym-01', 'Alquiler de Amolador Radial Eléctrico', 1.75),
+    ('alq-martillo-mym-16kg', 'Alquiler de Martillo Eléctrico 16kg', 3.74),
+]
+
+# Size of the shared material catalog
+NUM_MATERIALS = 5000
+
+UNITS = ['m2', 'm', 'ud', 'm3', 'kg']
+MATERIAL_UNITS = ['und', 'saco', 'envase', 'kg', 'pza', 'rollo']
+WORDS = ['LIMPIEZA', 'REPARACIÓN', 'MORTERO', 'PINTURA', 'ALICATADO', 'FACHADA', 'CUBIERTA',
+         'IMPERMEABILIZACIÓN', 'ANDAMIO', 'ACERO', 'HORMIGÓN', 'LADRILLO', 'TABIQUE', 'SOLADO']
+
+
+def _cents(value: float) -> float:
+    # Same rounding as the workbook, so price_rollup validates the generated prices
+    return float(round_cents(value))
+
+
+def _crew_price(codigo: str) -> float:
+    return _cents(sum(_cents(q * LABOUR_RATES[i][2]) for i, q in CREWS[codigo][1]))
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+@functools.lru_cache(maxsize=None)
+def material_catalog() -> List[Tuple[str, str, str, float]]:
+    """(código, ud, resumen, precio) of the materials partidas pick from, one price per código"""
+    rng = random.Random('materials')
+    return [
+        (f"ma-syn-{i:05d}", rng.choice(MATERIAL_UNITS), _text(rng, 5), round(rng.uniform(0.1, 60), 2))
+        for i in range(NUM_MATERIALS)
+    ]
+
+
+def partida_rows(rng: random.Random, codigo: str, num_materials: int) -> List[Tuple]:
+    """
+    Rows of one partida: its own row, a description row, the decomposition
+    (materials, an optional rental, one crew with its labour rates and a
+    'mo%' line) and the closing total row
+    """
+    lines = [(None, None, None, _text(rng, 8), None, None, None)]
+    total = 0.0
+    
+    for _ in range(num_materials):
+        code, ud, resumen, precio = material_catalog()[rng.randrange(NUM_MATERIALS)]
+        cantidad = round(rng.uniform(0.01, 5), 5)
+        importe = _cents(cantidad * precio)
+        lines.append((code, 'Material', ud, resumen, cantidad, precio, importe))
+        total += importe
+    
+    if rng.random() < 0.3:
+        code, resumen, precio = rng.choice(RENTALS)
+        cantidad = round(rng.uniform(0.05, 1), 5)
+        importe = _cents(cantidad * precio)
+        lines.append((code, 'Maquinaria', 'h', resumen, cantidad, precio, importe))
+        total += importe
+    
+    crew = rng.choice(list(CREWS))
+    crew_resumen, composition = CREWS[crew]
+    crew_precio = _crew_price(crew)
+    cantidad = round(rng.uniform(0.05, 2), 5)
+    labour = _cents(cantidad * crew_precio)
+    lines.append((crew, 'Partida', 'h', crew_resumen, cantidad, crew_precio, labour))
+    for i, q in composition:
+        code, resumen, rate = LABOUR_RATES[i]
+        lines.append((code, 'Mano de obra', 'h', resumen, q, rate, _cents(q * rate)))
+    lines.append((None, None, None, crew, cantidad, crew_precio, labour))
+    total += labour
+    
+    herramientas = _cents(0.03 * labour)
+    lines.append(('mo%', None, '%', 'Herramientas Menores', 3, labour, herramientas))
+    total = _cents(total + herramientas)
+    
+    lines.append((None, None, None, codigo, None, total, None))
+    return [(codigo, 'Partida', rng.choice(UNITS), 'XXXX ' + _text(rng, 6), None, total, None)] + lines
+
+
+def iter_sheet_rows(num_partidas: int, seed: int = 0, partidas_per_chapter: int = 25,
+                    max_materials: int = 4, start: int = 0) -> Iterator[Tuple]:
+    """
+    Yield the data rows (below the header) of a synthetic sheet
+    
+    Args:
+        num_partidas: Number of partidas
+        seed: Random seed, the same arguments always give the same rows
+        partidas_per_chapter: Partidas between two chapter rows
+        max_materials: Largest number of material lines per partida
+        start: Number of the first partida (used to continue on another sheet)
+    """
+    rng = random.Random(f"{seed}-{start}")
+    yield ('BASE DE DATOS SINTÉTICA', 'Capítulo', None, None, None, None, None)
+    for n in range(start, start + num_partidas):
+        if (n - start) % partidas_per_chapter == 0:
+            group = n // partidas_per_chapter
+            if group % 10 == 0:
+                # Two chapter rows in a row open a section and its first chapter
+                yield (f"SEC{group // 10:04d}", 'Capítulo', None, f"o SECCIÓN {group // 10}",
+                       None, None, None)
+            yield (f"CAP{group:05d}", 'Capítulo', None, f"XXXXXXXX {_text(rng, 3)}",
+                   None, None, None)
+        yield from partida_rows(rng, f"SYN-{n:07d}", rng.randint(0, max_materials))
+
+
+def generate_workbook(path: str, num_partidas: int, seed: int = 0,
+                      max_rows_per_sheet: int = MAX_ROWS_PER_SHEET, **kwargs) -> List[str]:
+    """
+    Write a synthetic database workbook
+    
+    Partidas are split over as many sheets as needed to stay below
+    max_rows_per_sheet rows per sheet.
+    
+    Args:
+        path: Output .xlsx path
+        num_partidas: Total number of partidas
+        seed: Random seed
+        max_rows_per_sheet: Row limit per sheet
+        **kwargs: Passed to iter_sheet_rows
+    
+    Returns:
+        Names of the written sheets
+    """
+    from openpyxl import Workbook
+    
+    # ~12 rows per partida on average, keep some headroom
+    per_sheet = max(1, max_rows_per_sheet // 16)
+    workbook = Workbook(write_only=True)
+    sheets = []
+    for start in range(0, num_partidas, per_sheet):
+        sheet = workbook.create_sheet(f"Hoja{len(sheets) + 1}")
+        sheet.append(['Obra:', 'BASE DE DATOS SINTÉTICA'])
+        sheet.append(['Banco de precios'])
+        sheet.append(COLUMNS)
+        for row in iter_sheet_rows(min(per_sheet, num_partidas - start), seed=seed, start=start, **kwargs):
+            sheet.append(row)
+        sheets.append(sheet.title)
+    workbook.save(path)
+    return sheets
+
+
+def main():
+    """Write a small synthetic workbook"""
+    sheets = generate_workbook('synthetic_1000.xlsx', 1000)
+    print(f"Wrote synthetic_1000.xlsx ({len(sheets)} sheets)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Tests that the vectorized parse produces the same materials as the row-wise one
+"""
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from conftest import DATABASE_PATH
+from excel_parser import COLUMNS, ExcelDatabaseParser
+
+# Small sheet in the layout of the database export
+SHEET_ROWS = [
+    ('Obra:', 'BASE DE DATOS IRES', None, None, None, None, None),
+    ('Banco de precios', None, None, None, None, None, None),
+    tuple(COLUMNS),
+    ('BASE DE DATOS IRES', 'Capítulo', None, None, None, None, None),
+    ('LIMPIEZAS', 'Capítulo', None, 'XXXX LIMPIEZAS', None, None, None),
+    ('LMP-01', 'Partida', 'm2', 'LIMPIEZA DE ALICATADO', None, 7.22, None),
+    (None, None, None, 'LIMPIEZA A MANO DE ALICATADO', None, None, None),
+    ('moc-std1-generico', 'Partida', 'h', 'Cuadrilla Std1', 0.16, 43.8, 7.01),
+    ('mo-salarial-oficial1', 'Mano de obra', 'h', 'Oficial de 1ª', 1, 21, 21),
+    ('mat-detergente', 'Material', 'l', 'Detergente', None, 3.5, None),  # no cantidad
+    ('%', None, '%', 'Costes directos complementarios', 2, 7.01, 0.14),
+    (None, None, None, None, None, None, None),
+    # Repeated código, in another chapter and with other components
+    ('PINTURAS', 'Capítulo', None, 'XXXX PINTURAS', None, None, None),
+    ('LMP-01', 'Partida', 'm2', 'LIMPIEZA DE ALICATADO', None, 8.0, None),
+    ('mat-detergente', 'Material', 'l', 'Detergente', 2, 4, 8),
+    ('PNT-01', 'Partida', 'm2', 'PINTURA PLÁSTICA', None, 5.0, None),
+    ('mat-pintura', 'Material', 'kg', 'Pintura plástica', 0.3, None, None),
+    ('PNT-02', 'Partida', 'ud', 'PARTIDA SIN COMPONENTES', None, 1.0, None),
+    ('OTROS', 'Capítulo', None, 'XXXX OTROS', None, None, None),
+    ('OTR-01', 'Partida', 'ud', 'ÚLTIMA PARTIDA', None, 2.0, None),
+    ('mat-pintura', 'Material', 'kg', 'Pintura plástica', 1, 2, 2),
+    # Closing total rows of the export
+    (None, None, None, 'SEG03', None, 134.2, None),
+    (None, None, None, 'SEGYS', None, None, None),
+    (None, None, None, 'BASE DE DATOS IRES', None, None, None),
+]
+
+
+def parse(path, vectorized):
+    parser = ExcelDatabaseParser(path)
+    parser.load_excel()
+    parser.parse_materials(vectorized=vectorized)
+    return [m.to_dict() for m in parser.materials], parser.chapters
+
+
+@pytest.fixture(scope='module')
+def small_workbook(tmp_path_factory):
+    path = os.path.join(tmp_path_factory.mktemp('workbooks'), 'small.xlsx')
+    workbook = Workbook()
+    for row in SHEET_ROWS:
+        workbook.active.append(row)
+    workbook.save(path)
+    return path
+
+
+def test_vectorized_matches_row_wise_small_workbook(small_workbook):
+    row_wise = parse(small_workbook, vectorized=False)
+    assert parse(small_workbook, vectorized=True) == row_wise
+    
+    materials = row_wise[0]
+    assert [m['codigo'] for m in materials] == ['LMP-01', 'LMP-01', 'PNT-01', 'PNT-02', 'OTR-01']
+    assert materials[0]['capitulos'] != materials[1]['capitulos']
+    assert [sm['cantidad'] for sm in materials[0]['sub_materials']][-2] is None
+    assert materials[3]['sub_materials'] == []
+    # The closing total rows are read as rows of the last partida, by both parsers
+    assert [sm['resumen'] for sm in materials[4]['sub_materials']][1:] == [
+        'SEG03', 'SEGYS', 'BASE DE DATOS IRES']
+
+
+def test_vectorized_matches_row_wise_database():
+    assert parse(DATABASE_PATH, vectorized=True) == parse(DATABASE_PATH, vectorized=False)
@@ -0,0 +1,18 @@
+"""
+Tests for parsing workbooks split across several sheets
+"""
+import pytest
+from openpyxl import Workbook
+
+from parse_cache import parse_source
+
+
+def test_no_sheet_with_header(tmp_path):
+    path = str(tmp_path / 'no_header.xlsx')
+    workbook = Workbook()
+    workbook.active.append(('Obra:', 'SIN CABECERA'))
+    workbook.create_sheet('Notas').append(('Notas', 'de la obra'))
+    workbook.save(path)
+    
+    with pytest.raises(ValueError, match='Could not find header row'):
+        parse_source(path)
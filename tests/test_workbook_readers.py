@@ -0,0 +1,56 @@
+"""
+Tests for the CSV path of ArrowReader: exports of the database must parse
+to the same materials as the workbook itself
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import DATABASE_PATH
+from excel_parser import ExcelDatabaseParser
+from workbook_readers import ArrowReader
+
+
+def parse(path):
+    parser = ExcelDatabaseParser(path)
+    parser.load_excel()
+    parser.parse_materials(vectorized=True)
+    return [m.to_dict() for m in parser.materials]
+
+
+@pytest.fixture(scope='module')
+def workbook_materials():
+    return parse(DATABASE_PATH)
+
+
+@pytest.fixture(scope='module')
+def sheet():
+    return pd.read_excel(DATABASE_PATH)
+
+
+@pytest.mark.parametrize('encoding, sep', [('utf-8', ','), ('utf-8-sig', ';'), ('cp1252', ';')])
+def test_csv_export_round_trip(tmp_path, sheet, workbook_materials, encoding, sep):
+    # Plain pandas export: Resumen cells with line breaks are quoted over several lines
+    assert sheet.apply(lambda column: column.astype(str).str.contains('\n')).any().any()
+    path = os.path.join(tmp_path, 'export.csv')
+    sheet.to_csv(path, index=False, sep=sep, encoding=encoding)
+    
+    assert parse(path) == workbook_materials
+
+
+def test_csv_multiline_cells(tmp_path):
+    path = os.path.join(tmp_path, 'small.csv')
+    with open(path, 'w', encoding='cp1252', newline='') as f:
+        f.write('BASE DE DATOS;;;;;;\r\n'
+                'Código;Tipo;Ud;Resumen;Cantidad;Precio (€);Importe (€)\r\n'
+                'P-01;Partida;m2;"LIMPIEZA\r\n• Para un uso curativo";;10,5;\r\n'
+                'mat-01;Material;kg;"Árido;\r\nfino";2;5,25;10,5\r\n')
+    
+    assert ArrowReader(path)._detect_csv_encoding() == 'cp1252'
+    [material] = parse(path)
+    assert material['resumen'] == 'LIMPIEZA\r\n• Para un uso curativo'
+    assert material['precio'] == 10.5
+    [sub_material] = material['sub_materials']
+    assert sub_material['resumen'] == 'Árido;\r\nfino'
+    assert (sub_material['cantidad'], sub_material['precio'], sub_material['importe']) == (2, 5.25, 10.5)
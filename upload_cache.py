@@ -0,0 +1,113 @@
+"""
+In-memory cache of parsed uploads keyed by the SHA-256 of the uploaded bytes
+Repeat uploads of the same database, through any of the /api/upload
+endpoints, are answered from a single parse
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from excel_parser import MainMaterial, PARSER_VERSION
+from material_table import MaterialTable
+from parse_cache import file_sha256, parse_source
+from workbook_readers import Source, source_name
+
+# Parsed uploads kept, override with UPLOAD_CACHE_SIZE
+DEFAULT_MAX_ENTRIES = int(os.getenv('UPLOAD_CACHE_SIZE', '8'))
+
+
+class UploadCache:
+    """
+    Bounded LRU of parsed uploads, safe to share between request threads
+    
+    Entries are kept as MaterialTables: every field of the upload, but sub-materials
+    stay rows of its arrays until a caller reads them through a view.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, lazy: bool = True):
+        """
+        Args:
+            max_entries: Number of parsed uploads kept, 0 disables the cache
+            lazy: Parse uploads lazily into a MaterialTable, sub-materials are
+                only built when a caller reads them; False keeps MainMaterial objects
+        """
+        self.max_entries = DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.lazy = lazy
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Sequence[MainMaterial]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def key_for(self, source: Source) -> str:
+        """
+        Cache key of an upload: hash of its bytes, parser version and extension
+        (the extension picks the parser, so it is part of the content's meaning)
+        """
+        extension = os.path.splitext(source_name(source))[1].lower()
+        return f"{file_sha256(source)}-v{PARSER_VERSION}{extension}"
+    
+    def get(self, key: str) -> Optional[Sequence[MainMaterial]]:
+        """Return the materials of a key and mark it as recently used, None on a miss"""
+        with self._lock:
+            materials = self._entries.get(key)
+            if materials is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return materials
+    
+    def put(self, key: str, materials: Sequence[MainMaterial]):
+        """Store materials, evicting the least recently used entries beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = materials
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def load(self, source: Source) -> Tuple[str, Sequence[MainMaterial]]:
+        """
+        Return the cache key and all materials of an upload, parsing it only on a miss
+        
+        Every field is parsed, so the same entry serves any projection.
+        Callers must not modify the returned materials, they are shared.
+        The key can be used with get() to read the materials again later.
+        
+        Args:
+            source: Upload stream (seekable, named by its filename) or path
+        """
+        key = self.key_for(source)
+        materials = self.get(key)
+        if materials is None:
+            # Parse outside the lock, other uploads keep being served meanwhile
+            materials, _ = parse_source(source, lazy=self.lazy)
+            if self.lazy:
+                # Sub-rows go from the sheet into the table's arrays as plain values,
+                # the parsed sheet and its objects are dropped
+                materials = MaterialTable.from_materials(materials)
+            self.put(key, materials)
+        return key, materials
+    
+    def load_materials(self, source: Source) -> Sequence[MainMaterial]:
+        """Return all materials of an upload, parsing it only on a miss (see load)"""
+        return self.load(source)[1]
+    
+    def stats(self) -> dict:
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
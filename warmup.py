@@ -0,0 +1,122 @@
+"""
+Start-up warm-up of the API
+Builds the search catalog and its indexes once, in a background thread or
+inline, and reports which step is running and how far its parse got, so a
+readiness probe can keep traffic away until search is warm
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from parse_progress import ParseEvent, ParseProgress
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# A warm-up step: name and function called with the step's ParseProgress
+Step = Tuple[str, Callable[[ParseProgress], object]]
+
+
+class Warmup:
+    """
+    Runs warm-up steps once, in order
+    
+    Usage:
+        warmup = Warmup([('catalog', get_gpt_matcher), ('chapter_index', get_chapter_index)])
+        warmup.start()   # background thread
+        warmup.ready     # True once every step finished
+    """
+    
+    def __init__(self, steps: List[Step]):
+        """
+        Args:
+            steps: (name, function) pairs, each function gets a ParseProgress
+                for the parses it runs
+        """
+        self.steps = steps
+        self.status = PENDING
+        self.step: Optional[str] = None
+        self.progress: Dict = {}
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+    
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+    
+    def _begin(self) -> bool:
+        """Claim the warm-up, False if it already runs or ran successfully"""
+        with self._lock:
+            if self.status in (WARMING, READY):
+                return False
+            # A failed warm-up starts over, its error stays visible until one succeeds
+            self.status = WARMING
+            self.started = time.time()
+            self.finished = None
+            self._done.clear()
+            return True
+    
+    def start(self) -> bool:
+        """
+        Warm up in a background thread
+        
+        Returns:
+            False if the warm-up was already running or done
+        """
+        if not self._begin():
+            return False
+        threading.Thread(target=self._run, daemon=True, name='warmup').start()
+        return True
+    
+    def run(self) -> bool:
+        """
+        Warm up in the calling thread, or wait for the warm-up already running
+        
+        Returns:
+            True if search is warm
+        """
+        if self._begin():
+            self._run()
+        else:
+            self._done.wait()
+        return self.ready
+    
+    def _on_event(self, event: ParseEvent):
+        self.progress = event.to_dict()
+    
+    def _run(self):
+        try:
+            for name, function in self.steps:
+                self.step = name
+                self.progress = {}
+                start = time.perf_counter()
+                function(ParseProgress([self._on_event]))
+                self.timings[name] = round(time.perf_counter() - start, 3)
+            self.status = READY
+            self.step = None
+            self.error = None
+        except Exception as e:
+            self.error = f"{self.step}: {e}"
+            self.status = FAILED
+        finally:
+            self.finished = time.time()
+            self._done.set()
+    
+    def to_dict(self) -> Dict:
+        end = self.finished or time.time()
+        return {
+            'status': self.status,
+            'ready': self.ready,
+            'step': self.step,
+            'steps': [name for name, _ in self.steps],
+            'progress': self.progress,
+            'timings': self.timings,
+            'error': self.error,
+            'elapsed': round(end - self.started, 3) if self.started else None,
+        }
@@ -0,0 +1,393 @@
+"""
+Workbook readers for the construction materials database
+Each reader yields the rows of one sheet lazily as plain tuples
+Workbooks are read from a path or from a seekable binary file object (e.g. an upload stream)
+"""
+import contextlib
+import os
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
+
+# A workbook path, or a seekable binary file object holding the workbook
+Source = Union[str, BinaryIO]
+
+# Workbooks above this size are streamed with openpyxl when their rows are consumed
+# one at a time (see select_reader's streaming), so memory stays bounded
+STREAMING_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Number of columns in the database layout (Código ... Importe)
+NUM_COLUMNS = 7
+
+# Header row of the database layout
+HEADER = ('Código', 'Tipo', 'Ud', 'Resumen', 'Cantidad', 'Precio (€)', 'Importe (€)')
+
+
+def normalize_cell(value):
+    """
+    Normalize a raw cell value the way pandas.read_excel does
+    - Empty cells become None
+    - Integral floats become int (so numeric codes print as '12', not '12.0')
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def normalize_row(values, usecols: Optional[Sequence[int]] = None) -> Tuple:
+    """
+    Normalize a row and pad/trim it to the database column count
+    
+    Args:
+        values: Raw cell values of the row
+        usecols: Column positions to keep (in order), None keeps all columns
+    """
+    if usecols is None:
+        row = [normalize_cell(v) for v in values[:NUM_COLUMNS]]
+        if len(row) < NUM_COLUMNS:
+            row.extend([None] * (NUM_COLUMNS - len(row)))
+        return tuple(row)
+    
+    width = len(values)
+    return tuple(normalize_cell(values[i]) if i < width else None for i in usecols)
+
+
+def is_path(source: Source) -> bool:
+    """True if the source is a file path rather than a file object"""
+    return isinstance(source, (str, os.PathLike))
+
+
+def source_name(source: Source) -> str:
+    """
+    File name of a source, used to pick a reader by extension
+    
+    File objects are named by their 'filename' attribute (werkzeug uploads)
+    or their 'name' attribute (open files).
+    """
+    if is_path(source):
+        return os.fspath(source)
+    return str(getattr(source, 'filename', None) or getattr(source, 'name', None) or '')
+
+
+def source_size(source: Source) -> int:
+    """Size in bytes of a path or a seekable file object"""
+    if is_path(source):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def rewind(source: Source) -> Source:
+    """Return a path unchanged, or a file object moved back to its start"""
+    if not is_path(source):
+        source.seek(0)
+    return source
+
+
+def open_binary(source: Source):
+    """Context manager giving a binary file: the opened path, or the rewound file object (left open)"""
+    if is_path(source):
+        return open(source, 'rb')
+    return contextlib.nullcontext(rewind(source))
+
+
+class WorkbookReader:
+    """Base class for readers that yield the rows of one worksheet"""
+    
+    name = 'base'
+    
+    def __init__(self, path: Source, sheet: Union[int, str] = 0,
+                 usecols: Optional[Sequence[int]] = None):
+        """
+        Args:
+            path: Workbook path, or a seekable binary file object
+            sheet: Sheet index or name
+            usecols: Column positions to read, None reads all database columns
+        """
+        self.path = path
+        self.sheet = sheet
+        self.usecols = list(usecols) if usecols is not None else None
+    
+    def sheet_names(self) -> List[str]:
+        """Return the names of all sheets in the workbook"""
+        raise NotImplementedError
+    
+    def iter_rows(self) -> Iterator[Tuple]:
+        """Yield normalized rows of the sheet, one tuple per row (usecols only)"""
+        raise NotImplementedError
+
+
+class OpenpyxlStreamingReader(WorkbookReader):
+    """Streams rows with openpyxl in read_only mode (constant memory)"""
+    
+    name = 'openpyxl'
+    
+    def _open(self):
+        from openpyxl import load_workbook
+        return load_workbook(rewind(self.path), read_only=True, data_only=True)
+    
+    def sheet_names(self) -> List[str]:
+        workbook = self._open()
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    
+    def iter_rows(self) -> Iterator[Tuple]:
+        workbook = self._open()
+        try:
+            if isinstance(self.sheet, int):
+                worksheet = workbook.worksheets[self.sheet]
+            else:
+                worksheet = workbook[self.sheet]
+            max_col = max(self.usecols) + 1 if self.usecols else NUM_COLUMNS
+            for values in worksheet.iter_rows(max_col=max_col, values_only=True):
+                yield normalize_row(values, self.usecols)
+        finally:
+            workbook.close()
+
+
+class CalamineReader(WorkbookReader):
+    """Reads rows with the Rust-based calamine engine (python-calamine)"""
+    
+    name = 'calamine'
+    
+    def _open(self):
+        from python_calamine import CalamineWorkbook
+        if is_path(self.path):
+            return CalamineWorkbook.from_path(self.path)
+        return CalamineWorkbook.from_filelike(rewind(self.path))
+    
+    def sheet_names(self) -> List[str]:
+        return list(self._open().sheet_names)
+    
+    def _worksheet(self):
+        workbook = self._open()
+        if isinstance(self.sheet, int):
+            return workbook.get_sheet_by_index(self.sheet)
+        return workbook.get_sheet_by_name(self.sheet)
+    
+    def iter_rows(self) -> Iterator[Tuple]:
+        for values in self._worksheet().iter_rows():
+            yield normalize_row(values, self.usecols)
+    
+    def read_frame(self):
+        """
+        Rows below the 'Código'/'Tipo' header as a DataFrame of object columns
+        (the usecols ones, or all 7), normalized like iter_rows
+        
+        The sheet comes out of calamine as one list of rows that becomes the
+        frame as is, without copying each row into a normalized tuple first.
+        
+        Raises:
+            ValueError: If the sheet has no header row
+        """
+        import pandas as pd
+        
+        rows = self._worksheet().to_python()
+        for header, row in enumerate(rows):
+            if len(row) > 1 and row[0] == 'Código' and row[1] == 'Tipo':
+                break
+        else:
+            raise ValueError("Could not find header row in Excel file")
+        
+        # Column by column: only the needed columns are read and normalized
+        data = rows[header + 1:]
+        width = len(rows[0])
+        names = list(range(NUM_COLUMNS)) if self.usecols is None else list(self.usecols)
+        return pd.DataFrame({
+            i: [normalize_cell(row[i]) for row in data] if i < width else [None] * len(data)
+            for i in names
+        }, dtype=object)
+
+
+class PandasReader(WorkbookReader):
+    """Reads the whole sheet with pandas.read_excel (original behaviour)"""
+    
+    name = 'pandas'
+    
+    def sheet_names(self) -> List[str]:
+        import pandas as pd
+        return list(pd.ExcelFile(rewind(self.path)).sheet_names)
+    
+    def iter_rows(self) -> Iterator[Tuple]:
+        import pandas as pd
+        df = pd.read_excel(rewind(self.path), sheet_name=self.sheet, header=None, usecols=self.usecols)
+        for values in df.itertuples(index=False, name=None):
+            values = [None if pd.isna(v) else v for v in values]
+            if self.usecols is None:
+                yield normalize_row(values)
+            else:
+                # pandas already projected the columns
+                yield tuple(normalize_cell(v) for v in values)
+
+
+class ArrowReader(WorkbookReader):
+    """
+    Reads CSV and Parquet exports of the database layout with pyarrow
+    
+    CSV files are parsed by Arrow's multi-threaded reader. The file may start
+    with title rows, the header row ('Código', 'Tipo', ...) is looked up in the
+    first lines. Decimal commas are accepted in the numeric columns. CSV files
+    are read as UTF-8 (with or without BOM), or as cp1252 (Excel's "CSV" export
+    on Windows) when they are not valid UTF-8.
+    """
+    
+    name = 'arrow'
+    
+    # Lines searched for the header row of a CSV file
+    HEADER_SEARCH_LINES = 50
+    
+    # Encodings tried in order, the first one that decodes the start of the file is used
+    CSV_ENCODINGS = ('utf-8-sig', 'cp1252')
+    
+    # Bytes sniffed to detect the encoding
+    ENCODING_SNIFF_BYTES = 1024 * 1024
+    
+    def sheet_names(self) -> List[str]:
+        # CSV and Parquet files hold a single table
+        return [os.path.splitext(os.path.basename(source_name(self.path)))[0]]
+    
+    def _detect_csv_encoding(self) -> str:
+        """
+        Return the first of CSV_ENCODINGS that decodes the first ENCODING_SNIFF_BYTES
+        
+        Only a prefix is read: Arrow then decodes the file itself with the
+        encoding found (and reports any invalid byte further down).
+        """
+        import codecs
+        with open_binary(self.path) as f:
+            head = f.read(self.ENCODING_SNIFF_BYTES)
+        # A prefix may end in the middle of a character
+        final = len(head) < self.ENCODING_SNIFF_BYTES
+        for encoding in self.CSV_ENCODINGS:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(head, final=final)
+            except UnicodeDecodeError:
+                continue
+            return encoding
+        raise ValueError(f"CSV file is not in a supported encoding ({', '.join(self.CSV_ENCODINGS)})")
+    
+    def _find_csv_header(self, encoding: str = 'utf-8-sig') -> Tuple[int, str]:
+        """Return (line number, delimiter) of the CSV header row"""
+        import csv
+        with open_binary(self.path) as f:
+            for number, raw in enumerate(f):
+                if number >= self.HEADER_SEARCH_LINES:
+                    break
+                line = raw.decode(encoding, errors='replace')
+                for delimiter in (',', ';', '\t'):
+                    cells = next(csv.reader([line], delimiter=delimiter))
+                    if len(cells) > 1 and cells[0].strip() == 'Código' and cells[1].strip() == 'Tipo':
+                        return number, delimiter
+        raise ValueError("Could not find header row in CSV file")
+    
+    def read_table(self):
+        """
+        Read the rows below the header as a pyarrow Table with the 7 database
+        columns (or the usecols ones), in sheet order
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        
+        if source_name(self.path).lower().endswith('.csv'):
+            from pyarrow import csv
+            encoding = self._detect_csv_encoding()
+            header_line, delimiter = self._find_csv_header(encoding)
+            table = csv.read_csv(
+                rewind(self.path),
+                # Arrow skips a UTF-8 BOM itself, and only transcodes other encodings
+                read_options=csv.ReadOptions(skip_rows=header_line, use_threads=True,
+                                             encoding='utf8' if encoding == 'utf-8-sig' else encoding),
+                # Resumen cells span several lines (quoted) in plain exports
+                parse_options=csv.ParseOptions(delimiter=delimiter, newlines_in_values=True),
+                convert_options=csv.ConvertOptions(strings_can_be_null=True, null_values=['']),
+            )
+        else:
+            import pyarrow.parquet as pq
+            table = pq.read_table(rewind(self.path), use_threads=True)
+        
+        if table.num_columns < NUM_COLUMNS:
+            raise ValueError(f"Expected {NUM_COLUMNS} columns, found {table.num_columns}")
+        
+        columns = []
+        for i in range(NUM_COLUMNS):
+            column = table.column(i)
+            if i >= 4 and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+                # Numeric column with decimal commas (or stray text), coerced later
+                column = pc.replace_substring(column, ',', '.')
+            columns.append(column)
+        
+        names = list(range(NUM_COLUMNS)) if self.usecols is None else self.usecols
+        return pa.table([columns[i] for i in names], names=[str(i) for i in names])
+    
+    def read_frame(self):
+        """Rows below the header as a DataFrame of object columns with None for empty cells"""
+        frame = self.read_table().to_pandas()
+        return frame.astype(object).where(frame.notna(), None)
+    
+    def iter_rows(self) -> Iterator[Tuple]:
+        # The header was consumed by the CSV reader, put it back for iter_data_rows
+        yield tuple(HEADER[i] for i in (self.usecols or range(NUM_COLUMNS)))
+        for batch in self.read_table().to_batches():
+            for values in zip(*(column.to_pylist() for column in batch.columns)):
+                yield tuple(normalize_cell(v) for v in values)
+
+
+READERS = {
+    OpenpyxlStreamingReader.name: OpenpyxlStreamingReader,
+    CalamineReader.name: CalamineReader,
+    PandasReader.name: PandasReader,
+    ArrowReader.name: ArrowReader,
+}
+
+# Files read with ArrowReader, whatever reader is asked for
+ARROW_EXTENSIONS = ('.csv', '.parquet', '.pq')
+
+
+def calamine_available() -> bool:
+    """Check whether the optional python-calamine package is installed"""
+    try:
+        import python_calamine  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def select_reader(path: Source, reader: Optional[str] = None,
+                  sheet: Union[int, str] = 0,
+                  usecols: Optional[Sequence[int]] = None,
+                  streaming: bool = False) -> WorkbookReader:
+    """
+    Pick a workbook reader
+    
+    Args:
+        path: Path to the workbook, or a seekable binary file object
+            (named by its 'filename' or 'name' attribute)
+        reader: 'openpyxl', 'calamine', 'pandas' or None/'auto' for calamine
+            (openpyxl when it is not installed, or when streaming a large file);
+            CSV and Parquet files always use 'arrow'
+        sheet: Sheet index or name
+        usecols: Column positions to read, None reads all database columns
+        streaming: The caller consumes rows one at a time without keeping them,
+            so auto-selection streams workbooks above STREAMING_THRESHOLD_BYTES.
+            A caller holding the whole sheet anyway is better off with calamine,
+            which reads it many times faster.
+    
+    Returns:
+        WorkbookReader instance
+    """
+    if source_name(path).lower().endswith(ARROW_EXTENSIONS):
+        reader = ArrowReader.name
+    elif reader is None or reader == 'auto':
+        if not calamine_available() or (streaming and source_size(path) > STREAMING_THRESHOLD_BYTES):
+            reader = OpenpyxlStreamingReader.name
+        else:
+            reader = CalamineReader.name
+    
+    if reader not in READERS:
+        raise ValueError(f"Unknown workbook reader: {reader}")
+    
+    return READERS[reader](path, sheet=sheet, usecols=usecols)
@@ -0,0 +1,17 @@
+"""
+Production entry point for a pre-fork server (see gunicorn.conf.py)
+The default materials list, its matcher and the chapter index are built once
+here, in the master process, before the workers are forked: every worker
+starts warm and shares them copy-on-write instead of building its own copy
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import gc
+
+from api import app, preload  # noqa: F401
+
+preload()
+
+# Move everything loaded so far out of the collector's generations: its
+# passes in the workers would otherwise write to the shared objects and
+# copy their memory pages into every worker
+gc.freeze()